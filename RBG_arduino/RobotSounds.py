@@ -20,6 +20,7 @@
 #    select reversed track and reverse it back to normal order (select track, then Effect->Reverse)
 #    select both tracks (ctrl-A) then render (Tracks->Mix->MixAndRender)
 #    save as 22050Hz mono, "WAV (microsoft) signed 16-bit PCM"
+# robotVoice.py does these steps on all the raw_*.wav files at once, without Audacity.
 #
 # The following resources are available as shown; they are not included in the RBG repository.
 #
@@ -34,17 +35,44 @@
 #
 # Audacity: https://www.audacityteam.org/
 #
+# With --execute the espeak commands are run here instead of printed:
+#    jobs run in parallel (--jobs), through a backend: "espeak" (espeak or espeak-ng on the PATH)
+#       or "stub", a deterministic tone synthesizer so the pipeline can be tested without espeak
+#    results are cached by hash of (backend, voice, gap, text) in --cache, so when the Sounds sheet changes
+#       only new or edited phrases are rendered again
+#
 
 myPattern = "#define mEFCT_UNIQ_"
 COLTOINDEX =  {"usage": -1, "num": -1, "File Name": -1, "Description": -1, "all usage": -1, "License": -1, "Who": -1, "URL": -1, "Mnemonic": -1, "#define": -1}
 
 # import io
-# import sys
+import argparse
+import array
+import concurrent.futures
+import hashlib
+import math
+import os
+import shutil
+import subprocess
+import sys
+import time
+import wave
+
 import pandas as pd
 
-def readSounds():
+import rbgProfile
+
+XLSX_FNAME = r'd:/GitHub-Mark-MDO47/RubberBandGun/RBG_arduino/StateTable_minimal.xlsx'
+ESPEAK_VOICE = "en-us"
+ESPEAK_GAP = 5
+STUB_RATE = 22050
+
+def readSounds(xlsx=XLSX_FNAME, voice=ESPEAK_VOICE, gap=ESPEAK_GAP, doPrint=True):
+    # returns list of (output wav name, text) - the same jobs as the printed espeak lines
+    jobs = []
     # Import the excel file
-    xls_file = pd.ExcelFile(r'd:/GitHub-Mark-MDO47/RubberBandGun/RBG_arduino/StateTable_minimal.xlsx')
+    rbgProfile.lap("xlsx load")
+    xls_file = pd.ExcelFile(xlsx)
     idx = xls_file.sheet_names.index('Sounds')
     df = xls_file.parse(xls_file.sheet_names[idx])
 
@@ -53,6 +81,7 @@ def readSounds():
     for col in COLTOINDEX:
         COLTOINDEX[col] = df_col_names.index(col)
 
+    rbgProfile.lap("parse")
     totString = "Ah. Ah. Ah. "
     for row_num, row in df.iterrows():
         # the first row (row_num == 0) is the one after the column titles
@@ -72,10 +101,113 @@ def readSounds():
             totString += " Ah. Ah. Ah. "
         totString += row_index_Desc
         if len(row_index_fname) > 0:
-            print("espeak -g 5 -v en-us -w raw_%s \"%s\"" % (row_index_fname, row_index_Desc))
-    print("\nespeak -g 5 -v en-us -w totString.wav \"%s\"" % totString)
+            jobs.append(("raw_%s" % row_index_fname, row_index_Desc))
+            if doPrint:
+                print("espeak -g %d -v %s -w raw_%s \"%s\"" % (gap, voice, row_index_fname, row_index_Desc))
+    jobs.append(("totString.wav", totString))
+    if doPrint:
+        print("\nespeak -g %d -v %s -w totString.wav \"%s\"" % (gap, voice, totString))
+    rbgProfile.stop()
+    return jobs
+
+###################################################################################################
+# synthesis backends - each is backend(text, voice, gap, outfname) and writes a WAV file
+#
+def espeak_program():
+    for prog in ("espeak", "espeak-ng"):
+        if shutil.which(prog) is not None:
+            return prog
+    return None
+
+def backend_espeak(text, voice, gap, outfname):
+    subprocess.run([espeak_program(), "-g", str(gap), "-v", voice, "-w", outfname, text], check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def backend_stub(text, voice, gap, outfname):
+    # deterministic stand-in: one short tone per character (pitch from the character and voice), gap ms of silence per word
+    toneLen = STUB_RATE // 20
+    gapLen = STUB_RATE * gap * 10 // 1000
+    voiceShift = int(hashlib.sha256(voice.encode()).hexdigest()[:2], 16)
+    samples = array.array('h')
+    for char in text:
+        if char.isspace():
+            samples.extend([0] * gapLen)
+            continue
+        freq = 200 + 10 * ((ord(char) + voiceShift) % 64)
+        samples.extend(int(8000 * math.sin(2 * math.pi * freq * idx / STUB_RATE)) for idx in range(toneLen))
+    with wave.open(outfname, 'wb') as wobj:
+        wobj.setnchannels(1)
+        wobj.setsampwidth(2)
+        wobj.setframerate(STUB_RATE)
+        wobj.writeframes(samples.tobytes())
+
+BACKENDS = {"espeak": backend_espeak, "stub": backend_stub}
+
+def cache_key(backend, voice, gap, text):
+    return hashlib.sha256(("%s\n%s\n%d\n%s" % (backend, voice, gap, text)).encode('utf-8')).hexdigest()
+
+def _render_one(backend, voice, gap, text, cachefname):
+    # runs in a worker process; render to a temp name so a killed run never leaves a partial cache entry
+    tmpfname = "%s.%d.tmp" % (cachefname, os.getpid())
+    BACKENDS[backend](text, voice, gap, tmpfname)
+    os.replace(tmpfname, cachefname)
+    return cachefname
+
+###################################################################################################
+# renderSounds(jobs, outdir, cachedir, backend, voice, gap, numJobs) - make the WAV files, rendering only what is not cached
+#
+# returns (number rendered, number from cache)
+#
+def renderSounds(jobs, outdir, cachedir, backend, voice=ESPEAK_VOICE, gap=ESPEAK_GAP, numJobs=None):
+    rbgProfile.lap("render")
+    os.makedirs(outdir, exist_ok=True)
+    os.makedirs(cachedir, exist_ok=True)
+    todo = {} # cache file -> text; identical phrases are rendered once
+    for fname, text in jobs:
+        cachefname = os.path.join(cachedir, cache_key(backend, voice, gap, text) + ".wav")
+        if not os.path.exists(cachefname):
+            todo[cachefname] = text
+    with concurrent.futures.ProcessPoolExecutor(max_workers=numJobs) as executor:
+        futures = [executor.submit(_render_one, backend, voice, gap, text, cachefname) for cachefname, text in todo.items()]
+        for future in concurrent.futures.as_completed(futures):
+            future.result() # raise here if a job failed
+    for fname, text in jobs:
+        shutil.copyfile(os.path.join(cachedir, cache_key(backend, voice, gap, text) + ".wav"), os.path.join(outdir, fname))
+    rbgProfile.stop()
+    return len(todo), len(jobs) - len(todo)
 
 if __name__ == "__main__":
-    readSounds()
+    rbgProfile.setup("RobotSounds")
+    my_parser = argparse.ArgumentParser(prog='RobotSounds',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="read the Sounds sheet and print espeak commands for the mdo47 robot voice sounds,\n" +
+                    "   or with --execute render them in parallel with caching",
+        epilog="""Example:
+python RobotSounds.py > makeRobotSounds.sh
+python RobotSounds.py --xlsx StateTable_minimal.xlsx --execute --outdir raw --jobs 8
+python RobotSounds.py --xlsx StateTable_minimal.xlsx --execute --backend stub
+""",
+        usage='%(prog)s [--xlsx FILE] [--execute [--backend espeak|stub] [--outdir DIR] [--cache DIR] [--jobs N]]')
+    my_parser.add_argument('--xlsx', type=str, default=XLSX_FNAME, help='spreadsheet with the Sounds sheet')
+    my_parser.add_argument('--voice', type=str, default=ESPEAK_VOICE, help='espeak -v voice (default %s)' % ESPEAK_VOICE)
+    my_parser.add_argument('--gap', type=int, default=ESPEAK_GAP, help='espeak -g word gap (default %d)' % ESPEAK_GAP)
+    my_parser.add_argument('--execute', action='store_true', help='render the sounds instead of printing espeak commands')
+    my_parser.add_argument('--backend', type=str, default=None, choices=sorted(BACKENDS), help='synthesizer (default espeak if installed, else stub)')
+    my_parser.add_argument('--outdir', type=str, default=".", help='where raw_*.wav and totString.wav go (default .)')
+    my_parser.add_argument('--cache', type=str, default="robotSoundsCache", help='render cache directory (default robotSoundsCache)')
+    my_parser.add_argument('--jobs', type=int, default=None, help='parallel jobs (default number of CPUs)')
+    args = my_parser.parse_args()
+
+    jobs = readSounds(args.xlsx, args.voice, args.gap, doPrint=not args.execute)
+    if args.execute:
+        backend = args.backend
+        if backend is None:
+            backend = "espeak" if espeak_program() is not None else "stub"
+        elif ("espeak" == backend) and (espeak_program() is None):
+            sys.exit("RobotSounds: espeak or espeak-ng not found on PATH; try --backend stub")
+        startTime = time.time()
+        numRendered, numCached = renderSounds(jobs, args.outdir, args.cache, backend, args.voice, args.gap, args.jobs)
+        sys.stderr.write("%s backend: %d files, %d rendered, %d from cache in %.1f seconds\n" %
+                         (backend, len(jobs), numRendered, numCached, time.time() - startTime))
 
 
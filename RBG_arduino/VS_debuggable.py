@@ -9,6 +9,9 @@
 
 # import copy
 # import sys
+import os
+
+import rbgProfile
 
 myFirstInclude = """
 // DebugRBG01.cpp : This file contains the 'main' function. Program execution begins and ends there.
@@ -246,8 +249,9 @@ def debuggable():
     myDebugLines = []
 
     # the *.h file is easy to process
+    rbgProfile.lap("read .h")
     for fn in files_to_read_h:
-        fobj = open(file_location_no_trail_slash+"\\"+fn, 'rt')
+        fobj = open(os.path.join(file_location_no_trail_slash, fn), 'rt')
         myDebugLines.append("\n// following lines from %s\n" % fn)
         theLine = fobj.readline()
         while "" != theLine: # null string means EOF
@@ -265,10 +269,11 @@ def debuggable():
         fobj.close()
 
     # this is the tricky one - the *.ino code
+    rbgProfile.lap("read .ino")
     copying = ""
     prototypes = []
     for fn in files_to_read_ino:
-        fobj = open(file_location_no_trail_slash+"\\"+fn, 'rt')
+        fobj = open(os.path.join(file_location_no_trail_slash, fn), 'rt')
         myDebugLines.append("\n// following lines from %s\n" % fn)
         theLine = fobj.readline()
         while "" != theLine: # null string means EOF
@@ -323,6 +328,7 @@ def debuggable():
     #   4) all the other lines collected from the Arduino *.h and *.ino files
     #   5) our VS main() routine including the inputs to test
     #
+    rbgProfile.lap("emit")
     for myTypedef in print_typedefs_for_prototypes:
         print("%s" % myTypedef)
     if 0 != len(prototypes):
@@ -336,6 +342,7 @@ def debuggable():
     for line in myDebugLines:
         print("%s" % line)
     print(myMain)
+    rbgProfile.stop()
 
 def rplc_F(theLine, theRplc): # to handle weird Serial.printx(F("")); replaces
     tmp = theLine.find(theRplc) # where it starts
@@ -386,4 +393,5 @@ def prepare(theLine):
     return myLine
 
 if __name__ == "__main__":
+    rbgProfile.setup("VS_debuggable")
     debuggable()
@@ -0,0 +1,188 @@
+# get_attribs.py - make attribs.md and attribs.txt from Attributions.html in one pass, and check sound attributions
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# Replaces get_attribs.sh, which ran a grep|sed pipeline over Attributions.html once per output file
+#    and only worked if each <tr>...</tr> was on one line.
+# Here the HTML is read in blocks into html.parser, so table rows may span lines (or share lines),
+#    and each row is written to every output as soon as it is complete.
+#    Cell text keeps inline markup such as <b>...</b>; runs of whitespace become one space.
+#
+# With --copied, also checks that every sound copied to the SD card has an attribution row.
+#    --copied is either the directory copyem.py copies from (####_*.wav) or a copy script it made (docopyem.sh).
+#    Source file names follow freesound: ####_<freesound id>__<who>__<name>[_mdo47].wav
+#    Sounds with no freesound id (####__mdo47__...) are our own and need no row.
+#    Rows are looked up by freesound id and by file name in dicts built while parsing.
+#
+
+import argparse
+import html.parser
+import os
+import re
+import sys
+
+BLOCKSIZE = 64 * 1024
+MAX_NUM = 127  # same as copyem.py maxNum - higher numbers are not copied
+
+RE_SOURCE = re.compile(r'^(\d{4})_(.*)\.wav$', re.IGNORECASE)
+RE_FREESOUND_ID = re.compile(r'^(\d+)__')
+
+OUTPUT_PREFIX = {"md": "| ", "txt": "\\ | "}  # same line formats as get_attribs.sh
+
+
+###################################################################################################
+# AttribTableParser - html.parser callbacks that collect <td> cells into rows
+#
+class AttribTableParser(html.parser.HTMLParser):
+    def __init__(self, rowCallback):
+        super().__init__(convert_charrefs=True)
+        self.rowCallback = rowCallback
+        self.row = None   # list of cells while inside <tr>
+        self.cell = None  # list of text pieces while inside <td>
+
+    def _end_cell(self):
+        if self.cell is not None:
+            self.row.append(" ".join("".join(self.cell).split()))
+            self.cell = None
+
+    def _end_row(self):
+        self._end_cell()
+        if self.row:
+            self.rowCallback(self.row)
+        self.row = None
+
+    def handle_starttag(self, tag, attrs):
+        if "tr" == tag:
+            self._end_row()  # a <tr> without </tr> ends at the next <tr>
+            self.row = []
+        elif tag in ("td", "th") and (self.row is not None):
+            self._end_cell()
+            self.cell = []
+        elif self.cell is not None:
+            self.cell.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th"):
+            self._end_cell()
+        elif tag in ("tr", "table"):
+            self._end_row()
+        elif self.cell is not None:
+            self.cell.append("</%s>" % tag)
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+
+    def close(self):
+        super().close()
+        self._end_row()
+
+
+###################################################################################################
+# extract_attribs(infname, outputs) - one pass over the HTML writing every output format
+#
+# outputs - dict of format name ("md", "txt") -> open file object
+#
+# returns (number of rows, dict freesound id -> row, dict file name stem -> row)
+#
+def extract_attribs(infname, outputs):
+    byId = {}
+    byStem = {}
+    counts = [0]
+    fileNameCol = [None]  # column with "File Name" in the current table header
+
+    def row_done(row):
+        counts[0] += 1
+        for fmt, fobj in outputs.items():
+            fobj.write(OUTPUT_PREFIX[fmt] + " | ".join(row) + " |\n")
+        plain = [re.sub(r'<[^>]*>', '', cell) for cell in row]
+        if "File Name" in plain:
+            fileNameCol[0] = plain.index("File Name")
+        elif "Tag" == plain[0]:
+            fileNameCol[0] = None  # some other table
+        elif (fileNameCol[0] is not None) and (fileNameCol[0] < len(plain)):
+            stem = os.path.splitext(plain[fileNameCol[0]])[0].lower()
+            byStem[stem] = row
+            match = RE_FREESOUND_ID.match(stem)
+            if match:
+                byId[match.group(1)] = row
+
+    parser = AttribTableParser(row_done)
+    with open(infname, 'rt', errors='replace') as fobj:
+        while True:
+            block = fobj.read(BLOCKSIZE)
+            if "" == block:
+                break
+            parser.feed(block)
+    parser.close()
+    return counts[0], byId, byStem
+# end extract_attribs()
+
+
+###################################################################################################
+# copied_sounds(copied) - source *.wav names copyem.py copies, from its directory or its copy script
+#
+def copied_sounds(copied):
+    if os.path.isdir(copied):
+        names = [fname for fname in os.listdir(copied) if RE_SOURCE.match(fname)]
+    else:
+        names = []
+        with open(copied, 'rt') as fobj:
+            for theLine in fobj:
+                words = theLine.split()
+                if (len(words) >= 3) and (words[0] in ("cp", "copy")):
+                    fname = re.split(r'[\\/]', words[1])[-1]
+                    if RE_SOURCE.match(fname):
+                        names.append(fname)
+    return sorted(set(fname.lower() for fname in names if MAX_NUM >= int(fname[:4])))
+
+def check_copied(copied, byId, byStem):
+    """check_copied - every copied sound with a freesound id must have an attribution row
+    :return: (list of (fname, id) missing, number checked, number of our own sounds)
+    """
+    missing = []
+    numChecked = numOwn = 0
+    for fname in copied_sounds(copied):
+        stem = RE_SOURCE.match(fname).group(2)
+        if stem.endswith("_mdo47"):
+            stem = stem[:-len("_mdo47")]
+        match = RE_FREESOUND_ID.match(stem)
+        if match is None:
+            numOwn += 1
+            continue
+        numChecked += 1
+        if (match.group(1) not in byId) and (stem not in byStem):
+            missing.append((fname, match.group(1)))
+    return missing, numChecked, numOwn
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(prog='get_attribs',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="make attribs.md and attribs.txt from the tables in Attributions.html in one pass\n" +
+                    "   optionally check that every copied sound has an attribution row (exit status 1 if not)",
+        epilog="""Example:
+python get_attribs.py D:/svnNew/SoundsSciFi/SoundsRecordedMDO/secondCut/Attributions.html
+python get_attribs.py Attributions.html --copied ../docopyem.sh
+""",
+        usage='%(prog)s [--md FILE] [--txt FILE] [--copied DIR_OR_SCRIPT] html')
+    my_parser.add_argument('html', type=str, help='path to Attributions.html')
+    my_parser.add_argument('--md', type=str, default="attribs.md", help='markdown table output (default attribs.md); "" to skip')
+    my_parser.add_argument('--txt', type=str, default="attribs.txt", help='text table output (default attribs.txt); "" to skip')
+    my_parser.add_argument('--copied', type=str, default=None, help='copyem.py source directory or the copy script it made')
+    args = my_parser.parse_args()
+
+    outputs = {fmt: open(fname, 'wt', newline='\n') for fmt, fname in (("md", args.md), ("txt", args.txt)) if fname}
+    numRows, byId, byStem = extract_attribs(args.html, outputs)
+    for fobj in outputs.values():
+        fobj.close()
+    sys.stderr.write("%d table rows, %d attributed files\n" % (numRows, len(byStem)))
+
+    if args.copied:
+        missing, numChecked, numOwn = check_copied(args.copied, byId, byStem)
+        sys.stderr.write("%d copied sounds with a freesound id checked, %d of our own\n" % (numChecked, numOwn))
+        for fname, soundId in missing:
+            sys.stderr.write("   NO ATTRIBUTION: %s (freesound %s)\n" % (fname, soundId))
+        if missing:
+            sys.exit(1)
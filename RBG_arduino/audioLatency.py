@@ -0,0 +1,222 @@
+# audioLatency.py - measure the delay from RBG_startEffectSound() to audible sound, from a microphone recording
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# Record the gun with a microphone (through the Bluetooth emitter or not) while capturing its serial debug output.
+#    Each "RBG_startEffectSound ln N EFCT num E final num S loopCount L" line (see parseSerialLog.py) says sound S
+#    was sent to the YX5200 at millis() L (DEBUG_SHOW_MSEC; otherwise give --loop_ms, milliseconds per loopCount).
+#    The start of that clip (--template_ms of ###.wav or ####_*.wav, see soundFiles.py) is looked for in the recording
+#    from --early_ms before to --max_latency_ms after the time L maps to; the latency is where it is found minus L.
+#
+# The search is a normalized FFT cross-correlation done in overlapping blocks (overlap-save): each block of
+#    --block_frames recording samples overlaps the next by the template length, so only the search windows are
+#    read from the WAV file and an hours-long recording is never all in memory. A match needs a score
+#    (correlation over template and recording energy, 0 to 1) of at least --min_score.
+#
+# The recording and the Arduino do not share a clock. --rec_start_ms is millis() at the first sample of the recording
+#    (for instance from a clap heard in the recording and printed in the log). Without it the first clip found
+#    anchors the two clocks, and the latencies are relative to that first one (they show spread, not the absolute delay).
+#    The Arduino resonator can be off by a few hundred ppm, minutes into a recording that is tens of milliseconds:
+#    the report gives the latency trend, and --drift_ppm corrects for it.
+#
+
+import argparse
+import csv
+import math
+import wave
+
+import numpy as np
+
+import parseSerialLog
+import rbgProfile
+import robotVoice
+import soundFiles
+
+BLOCK_FRAMES = 1 << 16
+EVENT_COLUMNS = ("lineNum", "loopCount", "sound", "expected_ms", "found_ms", "latency_ms", "score", "status")
+PERCENTILES = (0, 50, 95, 100)
+
+
+def read_mono(wobj, start, numFrames):
+    # frames [start, start+numFrames) of an open wave file, channels averaged; shorter at the end of the file
+    wobj.setpos(max(0, start))
+    raw = wobj.readframes(numFrames)
+    return robotVoice.pcm_to_float(raw, wobj.getsampwidth()).reshape(-1, wobj.getnchannels()).mean(axis=1)
+
+
+def load_template(fname, rate, template_ms):
+    """load_template - first template_ms of a sound file at the recording's sample rate, zero mean and unit norm
+    :return: float64 array, or None if the clip is silent there (the silence file, for instance)
+    """
+    data, fileRate = robotVoice.read_wav_mono(fname)
+    data = data[:int(round(fileRate * template_ms / 1000.0))]
+    if fileRate != rate:
+        numOut = int(len(data) * rate / fileRate)
+        data = np.interp(np.arange(numOut) * (fileRate / rate), np.arange(len(data)), data)
+    data = data - data.mean()
+    norm = math.sqrt(float(np.dot(data, data)))
+    if norm < 1e-6:
+        return None
+    return data / norm
+
+
+###################################################################################################
+# best_match(wobj, template, start, end, blockFrames, firstOver) - where template best matches the recording
+#
+# looks at template start positions [start, end) using overlap-save blocks of blockFrames (rounded up to a power of 2)
+# with firstOver, the best match within one template length of the first score >= firstOver: the same clip played
+#    again a little later matches just as well, and the first one is the one the log line started
+# returns (frame of best match, score 0 to 1)
+#
+def best_match(wobj, template, start, end, blockFrames=BLOCK_FRAMES, firstOver=None):
+    numTemplate = len(template)
+    fftLen = 1 << int(math.ceil(math.log2(max(blockFrames, 2 * numTemplate))))
+    step = fftLen - numTemplate + 1  # template positions per block
+    spectrum = np.conj(np.fft.rfft(template, fftLen))
+    start = max(0, start)
+    end = min(end, wobj.getnframes() - numTemplate + 1)
+    bestFrame, bestScore = start, 0.0
+    for pos in range(start, end, step):
+        seg = read_mono(wobj, pos, min(fftLen, end - pos + numTemplate - 1))
+        numOut = len(seg) - numTemplate + 1
+        if numOut <= 0:
+            break
+        corr = np.fft.irfft(np.fft.rfft(seg, fftLen) * spectrum, fftLen)[:numOut]
+        energy = np.cumsum(np.concatenate(([0.0], seg * seg)))
+        energy = energy[numTemplate:numTemplate + numOut] - energy[:numOut]
+        score = np.abs(corr) / np.sqrt(np.maximum(energy, 1e-12))
+        if firstOver is not None:
+            over = np.flatnonzero(score >= firstOver)
+            if 0 != len(over):
+                return best_match(wobj, template, pos + int(over[0]), pos + int(over[0]) + numTemplate, blockFrames)
+            continue
+        idx = int(np.argmax(score))
+        if score[idx] > bestScore:
+            bestFrame, bestScore = pos + idx, float(score[idx])
+    return bestFrame, bestScore
+# end best_match()
+
+
+def sound_events(logfname, loop_ms):
+    # (lineNum, loopCount, sound number, Arduino milliseconds) of every RBG_startEffectSound in the log
+    cols = parseSerialLog.parse_serial_log(logfname)
+    startSound = parseSerialLog.EVENT_CODES["START_SOUND"]
+    return [(cols["lineNum"][idx], cols["loopCount"][idx], cols["value"][idx], cols["loopCount"][idx] * loop_ms)
+            for idx in range(len(cols["event"])) if startSound == cols["event"][idx]]
+
+
+###################################################################################################
+# measure(args) - find every played clip in the recording
+#
+# returns (list of dicts with EVENT_COLUMNS, True if latencies are relative to the first clip found)
+#
+def measure(args):
+    rbgProfile.lap("parse log")
+    events = sound_events(args.serial_log, args.loop_ms)
+    soundPaths = soundFiles.find_sound_files(args.sounds)
+    results = []
+    with wave.open(args.recording, 'rb') as wobj:
+        rate = wobj.getframerate()
+        scale = 1.0 + args.drift_ppm / 1e6
+        templates = {}
+        recStart = args.rec_start_ms
+        rbgProfile.lap("correlate")
+        for lineNum, loopCount, sound, eventMs in events:
+            result = dict(zip(EVENT_COLUMNS, (lineNum, loopCount, sound, "", "", "", "", "")))
+            results.append(result)
+            if sound not in templates:
+                templates[sound] = load_template(soundPaths[sound], rate, args.template_ms) if sound in soundPaths else None
+            template = templates[sound]
+            if template is None:
+                result["status"] = "no sound file" if sound not in soundPaths else "silent clip"
+                continue
+            if recStart is None:  # anchor the clocks on the first clip found anywhere in the recording
+                frame, score = best_match(wobj, template, 0, wobj.getnframes(), args.block_frames, args.min_score)
+                if score < args.min_score:
+                    result.update(score="%.3f" % score, status="not found")
+                    continue
+                recStart = eventMs - frame * 1000.0 / rate
+            expectedMs = (eventMs - recStart) * scale
+            frame, score = best_match(wobj, template, int((expectedMs - args.early_ms) * rate / 1000.0),
+                                      int((expectedMs + args.max_latency_ms) * rate / 1000.0) + 1, args.block_frames, args.min_score)
+            result.update(expected_ms="%.1f" % expectedMs, score="%.3f" % score)
+            if score < args.min_score:
+                result["status"] = "not found"
+                continue
+            foundMs = frame * 1000.0 / rate
+            result.update(found_ms="%.1f" % foundMs, latency_ms="%.1f" % (foundMs - expectedMs), status="ok")
+    return results, args.rec_start_ms is None
+# end measure()
+
+
+###################################################################################################
+# report(results, relative) - per-event lines, then the latency distribution overall and per sound
+#
+def pct(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, (percent * len(values)) // 100)]
+
+def report(results, relative):
+    print("%-8s %-12s %5s %12s %12s %10s %6s %s" % ("line", "loopCount", "sound", "expected_ms", "found_ms", "latency", "score", "status"))
+    for row in results:
+        print("%-8d %-12d %5d %12s %12s %10s %6s %s" % tuple(row[col] for col in EVENT_COLUMNS))
+    found = [row for row in results if "ok" == row["status"]]
+    print("")
+    print("%d sounds started, %d found in the recording%s" % (len(results), len(found),
+          " - latencies are relative to the first one (no --rec_start_ms)" if relative else ""))
+    if 0 == len(found):
+        return
+    header = "%-8s %6s" % ("sound", "found") + "".join(" %8s" % ("p%d" % p) for p in PERCENTILES) + " %8s %8s" % ("mean", "stdev")
+    print(header)
+    groups = [("all", found)] + [("%d" % sound, [row for row in found if row["sound"] == sound])
+                                 for sound in sorted(set(row["sound"] for row in found))]
+    for name, rows in groups:
+        latencies = [float(row["latency_ms"]) for row in rows]
+        mean = sum(latencies) / len(latencies)
+        stdev = math.sqrt(sum((lat - mean) ** 2 for lat in latencies) / len(latencies))
+        print("%-8s %6d" % (name, len(rows)) + "".join(" %8.1f" % pct(latencies, p) for p in PERCENTILES) +
+              " %8.1f %8.1f" % (mean, stdev))
+    if len(found) >= 3:
+        # a latency that grows (or shrinks) steadily over the recording is the two clocks drifting apart
+        times = np.array([float(row["expected_ms"]) for row in found])
+        slope = np.polyfit(times, np.array([float(row["latency_ms"]) for row in found]), 1)[0]
+        print("latency trend %.2f ms per minute (clock drift about %+.0f ppm; see --drift_ppm)" % (slope * 60000.0, slope * 1e6))
+# end report()
+
+
+if __name__ == "__main__":
+    rbgProfile.setup("audioLatency")
+    my_parser = argparse.ArgumentParser(prog='audioLatency',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="measure the delay from RBG_startEffectSound() to audible sound\n" +
+                    "   by finding each clip in a microphone recording with FFT cross-correlation",
+        epilog="""Example:
+python audioLatency.py mic.wav serial.log D:/svnNew/SoundsSciFi/SoundsRecordedMDO/secondCut
+python audioLatency.py mic.wav serial.log H: --rec_start_ms 5210 --csv latency.csv
+""",
+        usage='%(prog)s recording serial_log sounds [--rec_start_ms MS] [--loop_ms MS] [--template_ms MS] [--early_ms MS]\n' +
+              '          [--max_latency_ms MS] [--min_score S] [--drift_ppm PPM] [--block_frames N] [--csv FILE]')
+    my_parser.add_argument('recording', type=str, help='microphone recording, PCM WAV')
+    my_parser.add_argument('serial_log', type=str, help='serial debug output captured during the recording; - for stdin')
+    my_parser.add_argument('sounds', type=str, help='directory with ###.wav (SD card) or ####_*.wav (source) sounds')
+    my_parser.add_argument('--rec_start_ms', type=float, default=None, help='millis() at the first sample of the recording (default: anchor on the first clip)')
+    my_parser.add_argument('--loop_ms', type=float, default=1.0, help='milliseconds per loopCount (default 1, for DEBUG_SHOW_MSEC)')
+    my_parser.add_argument('--template_ms', type=float, default=500.0, help='length of the start of each clip to look for (default 500)')
+    my_parser.add_argument('--early_ms', type=float, default=100.0, help='search starts this long before the log time (default 100)')
+    my_parser.add_argument('--max_latency_ms', type=float, default=2000.0, help='search ends this long after the log time (default 2000)')
+    my_parser.add_argument('--min_score', type=float, default=0.3, help='lowest correlation score counted as found (default 0.3)')
+    my_parser.add_argument('--drift_ppm', type=float, default=0.0, help='recording clock runs this many ppm faster than millis() (default 0)')
+    my_parser.add_argument('--block_frames', type=int, default=BLOCK_FRAMES, help='FFT block size in samples (default %d)' % BLOCK_FRAMES)
+    my_parser.add_argument('--csv', type=str, default=None, help='also write the per-event results to this CSV file')
+    args = my_parser.parse_args()
+
+    theResults, isRelative = measure(args)
+    rbgProfile.lap("report")
+    if args.csv:
+        with open(args.csv, 'wt', newline='') as fobj:
+            writer = csv.DictWriter(fobj, fieldnames=EVENT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(theResults)
+    report(theResults, isRelative)
+    rbgProfile.stop()
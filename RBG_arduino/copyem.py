@@ -4,14 +4,31 @@
 #    note: filenames are of form ####_anything.wav
 #          root directory needs ###.wav with no gaps
 #
+# --cards writes the same layout straight to several freshly formatted cards at once:
+#    each source file is read once and the same buffer goes to one writer thread per card,
+#    each card is written in order (the YX5200 finds ###.wav by the order the files were written, not by name),
+#    then read back and compared with the source. Progress and results are per card.
+#    The read back only checks the card itself where posix_fadvise() can drop the cached pages first (Linux);
+#    elsewhere it is served from the OS cache and the summary says so.
+#
 import os
-# import sys
+import sys
 import argparse
+import hashlib
+import queue
+import re
+import threading
+import time
+
+import rbgProfile
 
 theFnames = []
 maxNum = 127  # beyond that is not currently used
+ATTRIB_FNAME = "Attributions.html"
+ATTRIB_DIR = "ATTRIBUTIONS"
 
 def doCopyem(theFrom = None, theSD = None, fnameSilence = None, copyCmd = None, theSlash = None, noAttributeFile = False):
+    rbgProfile.lap("scan")
     for fname in os.listdir(theFrom):
         if (fname.lower().endswith(".wav")) and (maxNum >= int(fname[:4])):
             theFnames.append(fname.lower())
@@ -24,24 +41,155 @@ def doCopyem(theFrom = None, theSD = None, fnameSilence = None, copyCmd = None,
     """
     
     # first the root directory
+    rbgProfile.lap("emit")
+    for fname, destName in plan_layout(theFnames, fnameSilence):
+        print("%s %s%s%s %s%s%s" % (copyCmd, theFrom, theSlash, fname, theSD, theSlash, destName))
+
+    # now the attributions
+    if False == noAttributeFile:
+        print(" ")
+        print("mkdir %s%sATTRIBUTIONS" % (theSD, theSlash))
+        print("%s  %s%sAttributions.html %s%sATTRIBUTIONS" % (copyCmd, theFrom, theSlash, theSD, theSlash))
+    rbgProfile.stop()
+
+
+def plan_layout(fnames, fnameSilence):
+    """plan_layout - the ###.wav files for the card root, in the order they must be written
+    :param fnames: sorted ####*.wav source names
+    :param fnameSilence: source name copied into the gaps
+    :return: list of (source name, ###.wav)
+    """
+    layout = []
     count = 1 # we do not want number 0 to be copied
-    for fname in theFnames:
+    for fname in fnames:
         fcount = int(fname[:4])
         if fcount < count:
             continue # we do not want number 0 to be copied
         for idx in range(count, fcount):
-            print("%s %s%s%s %s%s%03d.wav" % (copyCmd, theFrom, theSlash, fnameSilence, theSD, theSlash, idx))
-        print("%s %s%s%s %s%s%03d.wav" % (copyCmd, theFrom, theSlash, fname, theSD, theSlash, fcount))
+            layout.append((fnameSilence, "%03d.wav" % idx))
+        layout.append((fname, "%03d.wav" % fcount))
         count = fcount + 1
+    return layout
 
-    # now the attributions
+
+def card_writer(card, jobs, status, lock, numFiles):
+    """card_writer - thread that writes the (destName, data, sha256) items from jobs to card, in order, then verifies
+    :param status: dict for this card; files, bytes, seconds, verified, fromMedia, bad, error are filled in
+    always takes jobs up to the None sentinel, even after an error, so the reader is never blocked by a failed card
+    """
+    written = []
+    startTime = time.time()
+    nextReport = 0
+    gotSentinel = False
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                gotSentinel = True
+                break
+            if "error" in status:
+                continue
+            destName, data, digest = job
+            path = os.path.join(card, destName)
+            try:
+                if os.path.dirname(destName):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as fobj:
+                    fobj.write(data)
+                    fobj.flush()
+                    os.fsync(fobj.fileno())
+            except OSError as err:
+                status["error"] = "writing %s: %s" % (path, err)
+                continue
+            written.append((path, digest))
+            status["files"] += 1
+            status["bytes"] += len(data)
+            if status["files"] * 10 >= nextReport * numFiles:
+                with lock:
+                    sys.stderr.write("%-12s %4d of %d files %8.1f MB\n" % (card, status["files"], numFiles, status["bytes"] / 1e6))
+                nextReport = status["files"] * 10 // numFiles + 1
+        status["seconds"] = time.time() - startTime
+        # the files were just written, so without dropping the cached pages the read back would never touch the card
+        status["fromMedia"] = hasattr(os, "posix_fadvise")
+        for path, digest in written:
+            try:
+                with open(path, 'rb') as fobj:
+                    if status["fromMedia"]:
+                        os.posix_fadvise(fobj.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+                    ok = hashlib.sha256(fobj.read()).digest() == digest
+            except OSError:
+                ok = False
+            if ok:
+                status["verified"] += 1
+            else:
+                status["bad"].append(path)
+    except Exception as err:
+        status["error"] = "%s: %s" % (type(err).__name__, err)
+    finally:
+        while not gotSentinel:
+            gotSentinel = jobs.get() is None
+
+
+def provision_cards(theFrom, cards, fnameSilence, noAttributeFile=False, bufferFiles=8):
+    """provision_cards - write the copyem layout to every card in cards at the same time
+    :param theFrom: directory with the ####*.wav files (and Attributions.html)
+    :param cards: list of mount points or drive letters of freshly formatted FAT32 cards
+    :param bufferFiles: how many files each card's writer may fall behind the reader
+    :return: dict of card -> status dict (see card_writer), with error if the card could not be used
+    """
+    fnames = sorted((fname for fname in os.listdir(theFrom)
+                     if fname.lower().endswith(".wav") and fname[:4].isdigit() and (maxNum >= int(fname[:4]))), key=str.lower)
+    plan = plan_layout(fnames, fnameSilence)
     if False == noAttributeFile:
-        print(" ")
-        print("mkdir %s%sATTRIBUTIONS" % (theSD, theSlash))
-        print("%s  %s%sAttributions.html %s%sATTRIBUTIONS" % (copyCmd, theFrom, theSlash, theSD, theSlash))
+        plan.append((ATTRIB_FNAME, ATTRIB_DIR + "/" + ATTRIB_FNAME))
+    missing = sorted(set(fname for fname, destName in plan if not os.path.isfile(os.path.join(theFrom, fname))))
+    if missing:
+        raise FileNotFoundError("not in %s: %s" % (theFrom, " ".join(missing)))
+
+    lock = threading.Lock()
+    statuses = {}
+    writers = []
+    for card in cards:
+        statuses[card] = {"files": 0, "bytes": 0, "seconds": 0.0, "verified": 0, "fromMedia": False, "bad": []}
+        cardDir = card + os.sep if re.match(r'^[A-Za-z]:$', card) else card  # H: alone is the current directory on H
+        if not os.path.isdir(cardDir):
+            statuses[card]["error"] = "no such directory"
+        elif any(fname.lower().endswith(".wav") for fname in os.listdir(cardDir)):
+            statuses[card]["error"] = "already has *.wav files - format it first so the files are in order"
+        else:
+            jobs = queue.Queue(maxsize=bufferFiles)
+            thread = threading.Thread(target=card_writer, args=(cardDir, jobs, statuses[card], lock, len(plan)), daemon=True)
+            thread.start()
+            writers.append((jobs, thread))
+
+    # read each source file once (the silence file only the first time) and hand the same bytes to every card
+    silence = None
+    try:
+        for fname, destName in plan:
+            if (fname == fnameSilence) and (silence is not None):
+                data, digest = silence
+            else:
+                with open(os.path.join(theFrom, fname), 'rb') as fobj:
+                    data = fobj.read()
+                digest = hashlib.sha256(data).digest()
+                if fname == fnameSilence:
+                    silence = (data, digest)
+            for jobs, thread in writers:
+                jobs.put((destName, data, digest))
+    except Exception as err:
+        # every card is now incomplete; say so on each one that has not failed already
+        for status in statuses.values():
+            status.setdefault("error", "incomplete - reading %s: %s" % (fname, err))
+    finally:
+        for jobs, thread in writers:
+            jobs.put(None)
+        for jobs, thread in writers:
+            thread.join()
+    return statuses
 
 
 if __name__ == "__main__":
+    rbgProfile.setup("copyem")
     my_parser = argparse.ArgumentParser(prog='copyem',
         formatter_class=argparse.RawTextHelpFormatter,
         description="stdout receives list of copy commands for freshly formatted SD card",
@@ -51,18 +199,43 @@ By default the file Attributions.html in DIRECTORY will be stored on SD card in
 When using the .play() method, the files must be of form ###.ext (ext=wav, mp3, etc.) and must be copied in order.
 copyem.py uses *.wav files but YX5200 can use other formats too.
 If there are SD card files 001.wav and 003.wav, there must be a 002.wav or .play() will find the wrong file. copyem.py takes care of that.
+With --cards the files are copied, not listed: the same layout goes to every card named, all at the same time,
+each source file read once; each card is then read back and checked. The cards must be freshly formatted.
+The read back checks the card itself only where the OS cache can be dropped first (Linux); elsewhere it only
+checks the copy and the summary says "from OS cache - not a media check".
 Example:
 python copyem.py -d ./myAudioFiles -s H: -f 0070_soundsOfSilence.wav --linux
+python copyem.py -d ./myAudioFiles -f 0070_soundsOfSilence.wav --cards /media/sd1 /media/sd2 /media/sd3
 """,
-        usage='%(prog)s {-d directory -s sd-disk -f fname-silence {-l linux | -w windows} }')
+        usage='%(prog)s {-d directory -s sd-disk -f fname-silence {-l linux | -w windows} }\n' +
+              '       %(prog)s {-d directory -f fname-silence --cards card [card ...] [--buffer-files N]}')
     my_parser.add_argument('-d', '--directory', type=str, help='path to directory containing *.wav files', action='store', default="D:/svnNew/SoundsSciFi/SoundsRecordedMDO/secondCut")
     my_parser.add_argument('-s', '--sd-disk', type=str, help='path to freshly formatted FAT32 SD disk (e.g. H:)', action='store', default="H:")
     my_parser.add_argument('-f', '--fname-silence', type=str, help='filename within DIRECTORY to use as silence when break in numerical sequence', action='store', default="0069__mdo47__silence.wav")
     my_parser.add_argument('-w', '--windows', help='Use *.bat copy commands for output file', action='store_true')
     my_parser.add_argument('-l', '--linux', help='use *.sh cp commands for output file', action='store_true')
     my_parser.add_argument('-n', '--no-attribute-file', help='do not include Attributions.html from DIRECTORY in an ATTRIBUTIONS directory on the sd-disk', action='store_true', default=False)
+    my_parser.add_argument('-c', '--cards', type=str, nargs='+', help='copy to all these freshly formatted cards (mount points or drive letters) at once', default=None)
+    my_parser.add_argument('--buffer-files', type=int, help='files a card writer may fall behind the reader (default 8)', action='store', default=8)
     args = my_parser.parse_args()
 
+    if args.cards:
+        rbgProfile.lap("provision")
+        statuses = provision_cards(args.directory, args.cards, args.fname_silence, args.no_attribute_file, args.buffer_files)
+        rbgProfile.stop()
+        numBad = 0
+        for card, status in statuses.items():
+            if ("error" in status) or status["bad"]:
+                numBad += 1
+            print("%-12s %4d files %8.1f MB in %6.1f s (%5.1f MB/s), %d verified%s, %d bad%s" % (
+                card, status["files"], status["bytes"] / 1e6, status["seconds"],
+                status["bytes"] / 1e6 / status["seconds"] if status["seconds"] else 0.0,
+                status["verified"], "" if status["fromMedia"] or not status["verified"] else " (from OS cache - not a media check)",
+                len(status["bad"]), " - " + status["error"] if "error" in status else ""))
+            for path in status["bad"]:
+                print("   differs from source: %s" % path)
+        sys.exit(1 if numBad else 0)
+
     copyCmd = None
     if args.windows:
         copyCmd = "copy"
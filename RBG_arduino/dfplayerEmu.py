@@ -0,0 +1,335 @@
+# dfplayerEmu.py - emulate the YX5200 (DFPlayer Mini) serial protocol on a pty or TCP socket
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# RBG_SciFi talks to the YX5200 through DFRobotDFPlayerMini (see RBG_SciFi/DFRobotDFPlayerMini.cpp).
+#    Off-device, VS_debuggable.py just stubs those calls; this lets a host build or simulator send the real frames.
+#
+# Frames are 10 bytes both ways:
+#    0x7E 0xFF 0x06 CMD ACK PARAM_HI PARAM_LO CHKSUM_HI CHKSUM_LO 0xEF
+#    CHKSUM is the 16-bit negative of the sum of bytes 1 through 6 (calculateCheckSum())
+#
+# What is emulated:
+#    reset (0x0C)          - after --reset_ms sends 0x3F "card online" (param 2) as begin() expects;
+#                            other commands received before then are ignored (logged as such), as the module is booting
+#    play (0x03), playMp3Folder (0x12), loop (0x08) - start the file; it is "busy" for the WAV length from --sounds
+#                            then 0x3D "play finished" is sent; a new play ends the previous one (no 0x3D for it)
+#    stop (0x16), pause (0x0E), start (0x0D), volume (0x06, 0x04, 0x05), EQ (0x07), outputDevice (0x09)
+#    queries 0x42 state, 0x43 volume, 0x44 EQ, 0x48 SD file count, 0x4C current SD file
+#    ACK (0x41) when the ACK byte is 1; 0x40 error 4 for bad checksum, 5 for file number out of range
+#    replies are paced as at --baud (10 bits per byte) plus --response_ms module processing time
+#
+# Log (CSV): one line per frame received or sent and per busy change, with response latency in milliseconds
+#    measured from the end of the command frame until the reply frame is written.
+#
+
+import argparse
+import csv
+import heapq
+import os
+import select
+import socket
+import sys
+import time
+import tty
+
+import soundFiles
+
+FRAME_LEN = 10
+FRAME_START = 0x7E
+FRAME_VERSION = 0xFF
+FRAME_LENGTH = 0x06
+FRAME_END = 0xEF
+
+CMD_NAMES = {
+    0x01: "next", 0x02: "previous", 0x03: "play", 0x04: "volumeUp", 0x05: "volumeDown", 0x06: "volume",
+    0x07: "EQ", 0x08: "loop", 0x09: "outputDevice", 0x0A: "sleep", 0x0C: "reset", 0x0D: "start",
+    0x0E: "pause", 0x0F: "playFolder", 0x10: "outputSetting", 0x11: "loopAll", 0x12: "playMp3Folder",
+    0x13: "advertise", 0x14: "playLargeFolder", 0x15: "stopAdvertise", 0x16: "stop", 0x17: "loopFolder",
+    0x18: "randomAll", 0x19: "loopCurrent", 0x1A: "DAC",
+    0x3A: "inserted", 0x3B: "removed", 0x3D: "playFinished", 0x3F: "online", 0x40: "error", 0x41: "ACK",
+    0x42: "readState", 0x43: "readVolume", 0x44: "readEQ", 0x48: "readFileCountsSD", 0x4C: "readCurrentFileNumberSD",
+}
+CMDS_PLAY = (0x03, 0x08, 0x12)
+ERR_CHECKSUM = 4
+ERR_FILE_INDEX = 5
+DEVICE_SD = 2
+
+LOG_COLUMNS = ["time_ms", "direction", "cmd", "name", "param", "latency_ms", "note"]
+
+
+###################################################################################################
+# frame utilities - also useful for host-side tests that talk to the emulator
+#
+def checksum(frame):
+    return (-sum(frame[1:7])) & 0xFFFF
+
+def make_frame(cmd, param=0, ack=0):
+    """make_frame - build a 10 byte DFPlayer frame
+    :param cmd: command byte
+    :param param: 16-bit parameter
+    :param ack: 1 to ask for an 0x41 ACK
+    :return: bytes
+    """
+    frame = bytearray([FRAME_START, FRAME_VERSION, FRAME_LENGTH, cmd & 0xFF, ack & 0xFF, (param >> 8) & 0xFF, param & 0xFF, 0, 0, FRAME_END])
+    chk = checksum(frame)
+    frame[7], frame[8] = chk >> 8, chk & 0xFF
+    return bytes(frame)
+
+def find_frames(buffer):
+    """find_frames - pull complete frames out of received bytes, resyncing on 0x7E like available() does
+    :param buffer: bytearray of received bytes; consumed bytes are removed
+    :return: list of (cmd, ack, param, checksumOK)
+    """
+    frames = []
+    while True:
+        start = buffer.find(bytes([FRAME_START]))
+        if -1 == start:
+            del buffer[:]
+            break
+        del buffer[:start]
+        if len(buffer) < FRAME_LEN:
+            break
+        frame = buffer[:FRAME_LEN]
+        if (FRAME_VERSION != frame[1]) or (FRAME_LENGTH != frame[2]) or (FRAME_END != frame[9]):
+            del buffer[:1]  # WrongStack: look for the next 0x7E
+            continue
+        del buffer[:FRAME_LEN]
+        frames.append((frame[3], frame[4], (frame[5] << 8) | frame[6], checksum(frame) == ((frame[7] << 8) | frame[8])))
+    return frames
+
+
+###################################################################################################
+# the emulated module - state in a dict, timed actions in a heap of (due time, seq, action, args)
+#
+def new_player(args, durations):
+    return {
+        "args": args, "durations": durations, "numFiles": max(durations) if durations else 0,
+        "t0": time.monotonic(), "events": [], "seq": 0,
+        "volume": 30, "eq": 0, "device": DEVICE_SD,
+        "playing": 0, "playSeq": 0, "paused": False, "pausedLeft": 0.0, "finishAt": 0.0,
+        "txFreeAt": 0.0, "resetUntil": 0.0, "stats": {},
+    }
+
+def now_ms(player):
+    return 1000.0 * (time.monotonic() - player["t0"])
+
+def schedule(player, due, action, *actArgs):
+    player["seq"] += 1
+    heapq.heappush(player["events"], (due, player["seq"], action, actArgs))
+
+def schedule_reply(player, rxTime, cmd, param, note="", readyAt=None):
+    # module processing time (or until readyAt) then the bytes on the wire at --baud; replies queue behind each other
+    #    only for the wire time, so txFreeAt is never pushed out by a long wait such as the reset
+    args = player["args"]
+    start = max(rxTime + args.response_ms if readyAt is None else readyAt, player["txFreeAt"])
+    due = start + (FRAME_LEN * 10 * 1000.0 / args.baud if args.baud else 0.0)
+    player["txFreeAt"] = due
+    schedule(player, due, "send", cmd, param, rxTime, note)
+
+def start_play(player, rxTime, fileNum):
+    args = player["args"]
+    if (fileNum < 1) or (player["numFiles"] and (fileNum > player["numFiles"]) and not args.any_file):
+        schedule_reply(player, rxTime, 0x40, ERR_FILE_INDEX, "file %d not on card" % fileNum)
+        return
+    player["playing"] = fileNum
+    player["playSeq"] += 1
+    player["paused"] = False
+    busyStart = rxTime + args.busy_delay_ms
+    player["finishAt"] = busyStart + player["durations"].get(fileNum, args.default_sound_ms)
+    schedule(player, busyStart, "busy", player["playSeq"], 1)
+    schedule(player, player["finishAt"], "finished", player["playSeq"])
+
+def handle_command(player, rxTime, cmd, ack, param):
+    # returns a note for the log: why the command was ignored, or ""
+    args = player["args"]
+    if (0x0C != cmd) and (rxTime < player["resetUntil"]):
+        return "ignored during reset"
+    if ack:
+        schedule_reply(player, rxTime, 0x41, 0)
+    if 0x0C == cmd:  # reset; a second reset starts it over
+        player["playing"] = 0
+        player["playSeq"] += 1
+        player["resetUntil"] = rxTime + args.reset_ms
+        schedule(player, player["resetUntil"], "online", rxTime, player["resetUntil"])
+    elif cmd in CMDS_PLAY:
+        start_play(player, rxTime, param)
+    elif 0x16 == cmd:  # stop
+        if player["playing"]:
+            player["playSeq"] += 1
+            schedule(player, rxTime, "busy", player["playSeq"], 0)
+        player["playing"] = 0
+    elif 0x0E == cmd:  # pause
+        if player["playing"] and not player["paused"]:
+            player["paused"] = True
+            player["pausedLeft"] = max(0.0, player["finishAt"] - rxTime)
+            player["playSeq"] += 1
+            schedule(player, rxTime, "busy", player["playSeq"], 0)
+    elif 0x0D == cmd:  # start (resume)
+        if player["playing"] and player["paused"]:
+            player["paused"] = False
+            player["playSeq"] += 1
+            player["finishAt"] = rxTime + player["pausedLeft"]
+            schedule(player, rxTime, "busy", player["playSeq"], 1)
+            schedule(player, player["finishAt"], "finished", player["playSeq"])
+    elif 0x06 == cmd:
+        player["volume"] = min(30, param)
+    elif 0x04 == cmd:
+        player["volume"] = min(30, player["volume"] + 1)
+    elif 0x05 == cmd:
+        player["volume"] = max(0, player["volume"] - 1)
+    elif 0x07 == cmd:
+        player["eq"] = param
+    elif 0x09 == cmd:
+        player["device"] = param
+    elif 0x42 == cmd:  # readState: 0x0200 + 1 playing / 2 paused / 0 stopped, as the YX5200 does for SD
+        state = 0 if not player["playing"] else (2 if player["paused"] else 1)
+        schedule_reply(player, rxTime, 0x42, 0x0200 | state)
+    elif 0x43 == cmd:
+        schedule_reply(player, rxTime, 0x43, player["volume"])
+    elif 0x44 == cmd:
+        schedule_reply(player, rxTime, 0x44, player["eq"])
+    elif 0x48 == cmd:
+        schedule_reply(player, rxTime, 0x48, player["numFiles"])
+    elif 0x4C == cmd:
+        schedule_reply(player, rxTime, 0x4C, player["playing"])
+    # anything else is accepted and ignored, as the RBG does not use it
+    return ""
+
+
+###################################################################################################
+# log and statistics
+#
+def log(player, writer, direction, cmd, param, latency=None, note=""):
+    writer.writerow(["%.1f" % now_ms(player), direction, "0x%02X" % cmd, CMD_NAMES.get(cmd, "?"),
+                     param, "" if latency is None else "%.2f" % latency, note])
+
+def add_stat(player, name, latency):
+    count, total, worst = player["stats"].get(name, (0, 0.0, 0.0))
+    player["stats"][name] = (count + 1, total + latency, max(worst, latency))
+
+def print_stats(player, numRx, fobj=sys.stderr):
+    elapsed = now_ms(player) / 1000.0
+    fobj.write("%d command frames in %.1f seconds (%.1f per second)\n" % (numRx, elapsed, numRx / elapsed if elapsed else 0.0))
+    fobj.write("%-24s %8s %10s %10s\n" % ("reply latency (ms)", "count", "mean", "max"))
+    for name in sorted(player["stats"]):
+        count, total, worst = player["stats"][name]
+        fobj.write("%-24s %8d %10.2f %10.2f\n" % (name, count, total / count, worst))
+
+
+###################################################################################################
+# serve(args) - run the emulator until --seconds (0 = forever) or Ctrl-C
+#
+def serve(args):
+    durations = soundFiles.sound_durations_ms(args.sounds)
+    player = new_player(args, durations)
+    logfobj = sys.stdout if "-" == args.log else open(args.log, 'wt', newline='')
+    writer = csv.writer(logfobj)
+    writer.writerow(LOG_COLUMNS)
+
+    listener = conn = None
+    if args.port:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((args.host, args.port))
+        listener.listen(1)
+        sys.stderr.write("dfplayerEmu listening on %s:%d with %d sounds\n" % (args.host, args.port, len(durations)))
+        readFd = None
+    else:
+        readFd, slaveFd = os.openpty()
+        tty.setraw(slaveFd)
+        sys.stderr.write("dfplayerEmu on pty %s with %d sounds\n" % (os.ttyname(slaveFd), len(durations)))
+
+    rxBuffer = bytearray()
+    numRx = 0
+    try:
+        while (0 == args.seconds) or (now_ms(player) < 1000.0 * args.seconds):
+            timeout = 0.05
+            if player["events"]:
+                timeout = max(0.0, min(timeout, (player["events"][0][0] - now_ms(player)) / 1000.0))
+            waitOn = [fobj for fobj in (readFd, listener, conn) if fobj is not None]
+            ready = select.select(waitOn, [], [], timeout)[0]
+            if (listener is not None) and (listener in ready):
+                if conn is not None:
+                    conn.close()
+                conn = listener.accept()[0]
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                rxBuffer = bytearray()
+            data = b""
+            if (conn is not None) and (conn in ready):
+                try:
+                    data = conn.recv(4096)
+                except ConnectionResetError:
+                    data = b""  # host went away with replies unread; same as a close
+                if not data:
+                    conn.close()
+                    conn = None
+            elif (readFd is not None) and (readFd in ready):
+                data = os.read(readFd, 4096)
+            if data:
+                rxTime = now_ms(player)
+                rxBuffer.extend(data)
+                for cmd, ack, param, chkOK in find_frames(rxBuffer):
+                    numRx += 1
+                    if chkOK:
+                        log(player, writer, "rx", cmd, param, note=handle_command(player, rxTime, cmd, ack, param))
+                    else:
+                        log(player, writer, "rx", cmd, param, note="bad checksum")
+                        schedule_reply(player, rxTime, 0x40, ERR_CHECKSUM, "checksum")
+
+            # timed actions that are due
+            while player["events"] and (player["events"][0][0] <= now_ms(player)):
+                due, dummy, action, actArgs = heapq.heappop(player["events"])
+                if "send" == action:
+                    cmd, param, rxTime, note = actArgs
+                    frame = make_frame(cmd, param)
+                    if conn is not None:
+                        conn.sendall(frame)
+                    elif readFd is not None:
+                        os.write(readFd, frame)
+                    latency = now_ms(player) - rxTime
+                    add_stat(player, CMD_NAMES.get(cmd, "0x%02X" % cmd), latency)
+                    log(player, writer, "tx", cmd, param, latency, note)
+                elif ("online" == action) and (actArgs[1] == player["resetUntil"]):
+                    schedule_reply(player, actArgs[0], 0x3F, DEVICE_SD, "card online", readyAt=due)
+                elif ("busy" == action) and (actArgs[0] == player["playSeq"]):
+                    writer.writerow(["%.1f" % now_ms(player), "busy", "", "BUSY" if actArgs[1] else "IDLE", player["playing"], "", ""])
+                elif ("finished" == action) and (actArgs[0] == player["playSeq"]) and player["playing"]:
+                    fileNum = player["playing"]
+                    player["playing"] = 0
+                    writer.writerow(["%.1f" % now_ms(player), "busy", "", "IDLE", fileNum, "", ""])
+                    schedule_reply(player, due, 0x3D, fileNum, "play finished")
+            logfobj.flush()
+    except KeyboardInterrupt:
+        pass
+    print_stats(player, numRx)
+    if logfobj is not sys.stdout:
+        logfobj.close()
+# end serve()
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(prog='dfplayerEmu',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="emulate the YX5200/DFPlayer Mini serial protocol on a pty (default) or TCP socket\n" +
+                    "   busy time of each file comes from the WAV lengths of the card image; log is CSV",
+        epilog="""Example:
+python dfplayerEmu.py --sounds /media/sdcard --log dfplayer.csv
+python dfplayerEmu.py --sounds ../sounds --port 5200 --baud 0 --seconds 60
+""",
+        usage='%(prog)s [--sounds DIR] [--port N] [--log FILE] [options]')
+    my_parser.add_argument('--sounds', type=str, default=None, help='directory with ###.wav (SD card) or ####_*.wav (source) sounds')
+    my_parser.add_argument('--default_sound_ms', type=float, default=2000.0, help='busy time for files with no WAV length (default 2000)')
+    my_parser.add_argument('--any_file', action='store_true', help='accept any file number, not just those on the card (always so without --sounds)')
+    my_parser.add_argument('--port', type=int, default=0, help='serve TCP on this port instead of a pty')
+    my_parser.add_argument('--host', type=str, default="127.0.0.1", help='address for --port (default 127.0.0.1)')
+    my_parser.add_argument('--baud', type=int, default=9600, help='pace replies at this baud rate; 0 for no pacing (default 9600)')
+    my_parser.add_argument('--response_ms', type=float, default=5.0, help='module processing time before a reply (default 5)')
+    my_parser.add_argument('--busy_delay_ms', type=float, default=30.0, help='play command until busy (default 30)')
+    my_parser.add_argument('--reset_ms', type=float, default=1500.0, help='reset until "card online" (default 1500)')
+    my_parser.add_argument('--seconds', type=float, default=0, help='stop after this many seconds; 0 runs until Ctrl-C (default 0)')
+    my_parser.add_argument('--log', type=str, default="-", help='CSV log file; - for stdout (default -)')
+    args = my_parser.parse_args()
+
+    serve(args)
@@ -0,0 +1,318 @@
+# eepromModel.py - host model of the RBG EEPROM configuration storage, counting writes per cell
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# The Arduino Nano has 1 Kbyte of EEPROM, good for about 100,000 write cycles per cell.
+# RBG_SciFi.ino keeps NUM_EEPROM_CONFIGURATIONS configurations of EEPROM_BYTES_PER_CONFIG bytes each,
+#    with an inverted checksum in the last byte of each configuration.
+#
+# The routines below are one-to-one copies of the RBG_SciFi.ino EEPROM routines
+#    (eeprom_check_init, eeprom_calc_inverted_checksum, eeprom_store_with_chksum, eeprom_factory_init,
+#     copy_eeprom_to_ram, copy_ram_to_eeprom, copy_eeprom_to_eeprom)
+#    running on a 1024 byte array. Every EEPROM.write is counted per cell.
+#    Addresses past the end of EEPROM wrap like the ATmega328P address register does, and are reported.
+#
+# The simulation runs random configuration-menu sessions (power on, then some menu actions) and reports
+#    writes per cell and "redundant" writes - writes to cells that ended the session with the same value they started with.
+#    Those are the writes that buffering the menu changes in RAM and committing once would save.
+#
+
+import argparse
+import random
+
+import parseRBGheaders
+
+EEPROM_SIZE = 1024
+EEPROM_ERASED = 0xFF  # value of a never-written EEPROM cell
+
+# values from the *.h files; filled in by load_header_values()
+HDR = {}
+
+# model state - same names as the Arduino globals where there is one
+EEPROM = bytearray([EEPROM_ERASED] * EEPROM_SIZE)
+EEPROM_writes = [0] * EEPROM_SIZE
+EEPROM_RAMcopy = []
+EEPROM_out_of_range = []  # list of (function, address) for accesses past EEPROM_SIZE
+dynamicMode = 0
+
+
+###################################################################################################
+# load_header_values() - get the EEPROM layout and factory settings from RBG_SciFi_StatesAndInputs.h
+#
+def load_header_values():
+    defines = parseRBGheaders.read_all_defines()
+    for name in ("mNONE", "EEPROM_PROCESS_ALL_CONFIG", "EEPROM_CONFIG_RUNNING", "EEPROM_SAVED_ONE", "EEPROM_SAVED_TWO",
+                 "EEPROM_SAVED_THREE", "EEPROM_SAVED_LAST", "NUM_EEPROM_CONFIGURATIONS", "EEPROM_START_SOUND_CONFIGS",
+                 "EEPROM_START_LED_CONFIGS", "EEPROM_LAST_NON_CHKSM", "EEPROM_INVERTED_CHKSM", "EEPROM_BYTES_PER_CONFIG",
+                 "mCFG_CATEGORY_SOUND", "mCFG_CATEGORY_LEDPTRN", "mEFCT_UNIQ"):
+        HDR[name] = parseRBGheaders.eval_define(defines[name], defines)
+    HDR["factory_effect_configs"] = parseRBGheaders.read_c_int_array(parseRBGheaders.FNAME_STATES_H, "factory_effect_configs", defines)
+    HDR["cfgMaxSoundForType"] = parseRBGheaders.read_c_int_array(parseRBGheaders.FNAME_STATES_H, "cfgMaxSoundForType", defines)
+    HDR["cfgMaxLEDForType"] = parseRBGheaders.read_c_int_array(parseRBGheaders.FNAME_STATES_H, "cfgMaxLEDForType", defines)
+# end load_header_values()
+
+def EEPOFFSET(parm):
+    return parm // 10
+
+
+###################################################################################################
+# EEPROM access - wraps out-of-range addresses and counts writes
+#
+def EEPROM_read(address, caller="read"):
+    if not (0 <= address < EEPROM_SIZE):
+        EEPROM_out_of_range.append((caller, address))
+    return EEPROM[address % EEPROM_SIZE]
+
+def EEPROM_write(address, value, caller="write"):
+    if not (0 <= address < EEPROM_SIZE):
+        EEPROM_out_of_range.append((caller, address))
+    EEPROM[address % EEPROM_SIZE] = value & 0xFF
+    EEPROM_writes[address % EEPROM_SIZE] += 1
+
+def reset_model(contents=None):
+    """reset_model - start over with erased (or given) EEPROM contents and zero write counts
+    :param contents: optional bytes of length EEPROM_SIZE
+    """
+    global EEPROM, EEPROM_writes, EEPROM_RAMcopy, EEPROM_out_of_range, dynamicMode
+    EEPROM = bytearray(contents) if contents is not None else bytearray([EEPROM_ERASED] * EEPROM_SIZE)
+    EEPROM_writes = [0] * EEPROM_SIZE
+    EEPROM_RAMcopy = [0] * HDR["EEPROM_BYTES_PER_CONFIG"]
+    EEPROM_out_of_range = []
+    dynamicMode = HDR["EEPROM_CONFIG_RUNNING"]
+
+
+###################################################################################################
+# host copies of the RBG_SciFi.ino EEPROM routines
+#
+def eeprom_check_init(configToProc):
+    # NOTE: same as the .ino, the ALL / single test is inverted here. With EEPROM_PROCESS_ALL_CONFIG
+    #    min_config = max_config = 0x20, so only config 0x20 (address 1024 = wraps to config 0) gets checked
+    if (HDR["EEPROM_PROCESS_ALL_CONFIG"] != configToProc) and (configToProc >= HDR["NUM_EEPROM_CONFIGURATIONS"]):
+        configToProc = HDR["EEPROM_PROCESS_ALL_CONFIG"]
+    if HDR["EEPROM_PROCESS_ALL_CONFIG"] != configToProc:
+        min_config = HDR["EEPROM_CONFIG_RUNNING"]
+        max_config = HDR["EEPROM_SAVED_LAST"]
+    else:
+        min_config = max_config = configToProc
+    bytesPerConfig = HDR["EEPROM_BYTES_PER_CONFIG"]
+    for thisConfigStart in range(min_config * bytesPerConfig, max_config * bytesPerConfig + 1, bytesPerConfig):
+        invChksumValue = eeprom_calc_inverted_checksum(thisConfigStart // bytesPerConfig)
+        nowValue = EEPROM_read(HDR["EEPROM_INVERTED_CHKSM"] + thisConfigStart, "eeprom_check_init")
+        if nowValue != invChksumValue:
+            eeprom_factory_init(thisConfigStart // bytesPerConfig)
+
+def eeprom_calc_inverted_checksum(configToProc):
+    if (HDR["EEPROM_PROCESS_ALL_CONFIG"] != configToProc) and (configToProc >= HDR["NUM_EEPROM_CONFIGURATIONS"]):
+        configToProc = HDR["NUM_EEPROM_CONFIGURATIONS"] - 1
+    thisConfigStart = configToProc * HDR["EEPROM_BYTES_PER_CONFIG"]
+    chksumValue = 0
+    for address in range(HDR["EEPROM_LAST_NON_CHKSM"] + 1):
+        chksumValue = (chksumValue + EEPROM_read(address + thisConfigStart, "eeprom_calc_inverted_checksum")) & 0xFF
+    return (~chksumValue) & 0xFF
+
+def eeprom_store_with_chksum(address, byteValue):
+    thisConfig = address // HDR["EEPROM_BYTES_PER_CONFIG"]
+    thisConfigStart = thisConfig * HDR["EEPROM_BYTES_PER_CONFIG"]
+    if EEPROM_read(address, "eeprom_store_with_chksum") != byteValue:
+        EEPROM_write(address, byteValue, "eeprom_store_with_chksum")
+    invChksumValue = eeprom_calc_inverted_checksum(thisConfig)
+    if EEPROM_read(HDR["EEPROM_INVERTED_CHKSM"] + thisConfigStart, "eeprom_store_with_chksum") != invChksumValue:
+        EEPROM_write(HDR["EEPROM_INVERTED_CHKSM"] + thisConfigStart, invChksumValue, "eeprom_store_with_chksum")
+    if (HDR["mNONE"] == dynamicMode) and (HDR["EEPROM_CONFIG_RUNNING"] == thisConfig):
+        copy_eeprom_to_ram_running_config(HDR["EEPROM_CONFIG_RUNNING"])
+
+def eeprom_factory_init(configToProc):
+    if HDR["EEPROM_PROCESS_ALL_CONFIG"] == configToProc:
+        min_config, max_config = HDR["EEPROM_CONFIG_RUNNING"], HDR["EEPROM_SAVED_LAST"]
+    elif configToProc < HDR["NUM_EEPROM_CONFIGURATIONS"]:
+        min_config = max_config = configToProc
+    else:
+        min_config, max_config = HDR["EEPROM_CONFIG_RUNNING"], HDR["EEPROM_SAVED_LAST"]
+    bytesPerConfig = HDR["EEPROM_BYTES_PER_CONFIG"]
+    for thisConfig in range(min_config, max_config + 1):
+        effectConfigs = HDR["factory_effect_configs"][thisConfig * bytesPerConfig:(thisConfig + 1) * bytesPerConfig]
+        copy_ram_to_eeprom(effectConfigs, thisConfig)
+
+def copy_eeprom_to_ram(configToProc, ramArray):
+    thisConfigStart = configToProc * HDR["EEPROM_BYTES_PER_CONFIG"]
+    for address in range(HDR["EEPROM_BYTES_PER_CONFIG"]):
+        ramArray[address] = EEPROM_read(address + thisConfigStart, "copy_eeprom_to_ram")
+
+def copy_eeprom_to_ram_running_config(configToProc):
+    copy_eeprom_to_ram(configToProc, EEPROM_RAMcopy)
+
+def copy_ram_to_eeprom(ramAddr, configToProc):
+    thisConfigStart = configToProc * HDR["EEPROM_BYTES_PER_CONFIG"]
+    for address in range(HDR["EEPROM_LAST_NON_CHKSM"]):
+        if ramAddr[address] != EEPROM_read(address + thisConfigStart, "copy_ram_to_eeprom"):
+            EEPROM_write(address + thisConfigStart, ramAddr[address], "copy_ram_to_eeprom")
+    eeprom_store_with_chksum(HDR["EEPROM_LAST_NON_CHKSM"] + thisConfigStart, ramAddr[HDR["EEPROM_LAST_NON_CHKSM"]])
+
+def copy_eeprom_to_eeprom(fromConfigToProc, toConfigToProc):
+    toStart = toConfigToProc * HDR["EEPROM_BYTES_PER_CONFIG"]
+    fromStart = fromConfigToProc * HDR["EEPROM_BYTES_PER_CONFIG"]
+    for address in range(HDR["EEPROM_LAST_NON_CHKSM"]):
+        desiredValue = EEPROM_read(address + fromStart, "copy_eeprom_to_eeprom")
+        if desiredValue != EEPROM_read(address + toStart, "copy_eeprom_to_eeprom"):
+            EEPROM_write(address + toStart, desiredValue, "copy_eeprom_to_eeprom")
+    desiredValue = EEPROM_read(HDR["EEPROM_LAST_NON_CHKSM"] + fromStart, "copy_eeprom_to_eeprom")
+    eeprom_store_with_chksum(HDR["EEPROM_LAST_NON_CHKSM"] + toStart, desiredValue)
+    if (HDR["mNONE"] == dynamicMode) and (HDR["EEPROM_CONFIG_RUNNING"] == toConfigToProc):
+        copy_eeprom_to_ram_running_config(HDR["EEPROM_CONFIG_RUNNING"])
+
+
+###################################################################################################
+# menu actions - what the mSPCL_HANDLER_* special handlers in RBG_specialProcessing() do with EEPROM
+#
+def menu_store_choice(category, effectType, choice):
+    """menu_store_choice - RBG_specialProcConfig2Storage() for mADDR_CFG_EFFECT
+    :param category: mCFG_CATEGORY_SOUND or mCFG_CATEGORY_LEDPTRN
+    :param effectType: 0 through 5 (mEFCT_WIND_UP/10 etc.)
+    :param choice: 1 through cfgMax...ForType[effectType]
+    """
+    if HDR["mCFG_CATEGORY_SOUND"] == category:
+        eepromBase = HDR["EEPROM_START_SOUND_CONFIGS"]
+    else:
+        eepromBase = HDR["EEPROM_START_LED_CONFIGS"]
+    eeprom_store_with_chksum(eepromBase + EEPOFFSET(effectType * 10), choice)
+
+def menu_handler(name):
+    """menu_handler - the EEPROM part of the copy/reset special handlers
+    :param name: one of MENU_HANDLERS keys, for instance "RUN2ONE"
+    """
+    global dynamicMode
+    RUN, ONE, TWO, THREE = (HDR["EEPROM_CONFIG_RUNNING"], HDR["EEPROM_SAVED_ONE"], HDR["EEPROM_SAVED_TWO"], HDR["EEPROM_SAVED_THREE"])
+    if "FACT2RUN" == name:
+        eeprom_factory_init(RUN)
+    elif "FACT2ALL" == name:
+        eeprom_factory_init(HDR["EEPROM_PROCESS_ALL_CONFIG"])
+    elif "STATICMODE" == name:
+        dynamicMode = HDR["mNONE"]
+        copy_eeprom_to_ram_running_config(dynamicMode)  # same as the .ino: dynamicMode is mNONE here
+    else:
+        fromTo = {"RUN2ONE": (RUN, ONE), "RUN2TWO": (RUN, TWO), "RUN2THREE": (RUN, THREE),
+                  "ONE2RUN": (ONE, RUN), "TWO2RUN": (TWO, RUN), "THREE2RUN": (THREE, RUN)}[name]
+        copy_eeprom_to_eeprom(fromTo[0], fromTo[1])
+
+MENU_HANDLERS = ["FACT2RUN", "FACT2ALL", "RUN2ONE", "RUN2TWO", "RUN2THREE", "ONE2RUN", "TWO2RUN", "THREE2RUN", "STATICMODE"]
+
+def power_on():
+    """power_on - what setup() does with EEPROM"""
+    global dynamicMode
+    dynamicMode = HDR["EEPROM_CONFIG_RUNNING"]
+    eeprom_check_init(HDR["EEPROM_PROCESS_ALL_CONFIG"])
+    copy_eeprom_to_ram_running_config(HDR["EEPROM_CONFIG_RUNNING"])
+
+
+###################################################################################################
+# simulate_sessions(numSessions, actionsPerSession, seed) - random configuration-menu sessions
+#
+# most menu actions are effect choices; sometimes a copy or factory reset
+#
+# returns (total writes, redundant writes); out-of-range accesses are collected in EEPROM_out_of_range
+#    (see print_out_of_range())
+#
+def simulate_sessions(numSessions, actionsPerSession, seed):
+    rng = random.Random(seed)
+    totalWrites = redundantWrites = 0
+    for session in range(numSessions):
+        before = bytes(EEPROM)
+        writesBefore = list(EEPROM_writes)
+        power_on()
+        for action in range(rng.randint(1, actionsPerSession)):
+            if rng.random() < 0.85:
+                category = rng.choice((HDR["mCFG_CATEGORY_SOUND"], HDR["mCFG_CATEGORY_LEDPTRN"]))
+                effectType = rng.randrange(EEPOFFSET(HDR["mEFCT_UNIQ"]))
+                if HDR["mCFG_CATEGORY_SOUND"] == category:
+                    choice = rng.randint(1, HDR["cfgMaxSoundForType"][effectType])
+                else:
+                    choice = rng.randint(1, HDR["cfgMaxLEDForType"][effectType])
+                menu_store_choice(category, effectType, choice)
+            else:
+                menu_handler(rng.choice(MENU_HANDLERS))
+        for address in range(EEPROM_SIZE):
+            sessionWrites = EEPROM_writes[address] - writesBefore[address]
+            totalWrites += sessionWrites
+            if sessionWrites > 0:
+                # only one write is needed if the value changed, none if it ended where it started
+                redundantWrites += sessionWrites - (1 if before[address] != EEPROM[address] else 0)
+    return totalWrites, redundantWrites
+# end simulate_sessions()
+
+
+###################################################################################################
+# print_out_of_range() - the WARNING for accesses past the end of EEPROM since the last reset_model()
+#
+# returns True if there were any
+#
+def print_out_of_range():
+    if 0 == len(EEPROM_out_of_range):
+        return False
+    addresses = sorted(set(address for caller, address in EEPROM_out_of_range))
+    callers = sorted(set(caller for caller, address in EEPROM_out_of_range))
+    print("   WARNING: %d EEPROM accesses past address %d (wrapped), addresses %d to %d, from %s" %
+          (len(EEPROM_out_of_range), EEPROM_SIZE - 1, addresses[0], addresses[-1], " ".join(callers)))
+    return True
+
+
+###################################################################################################
+# do_eepromModel(numSessions, actionsPerSession, seed) - run the model and print the report
+#
+def do_eepromModel(numSessions, actionsPerSession, seed):
+    load_header_values()
+    reset_model()
+
+    # first power on of a new Nano with erased EEPROM
+    power_on()
+    bytesPerConfig = HDR["EEPROM_BYTES_PER_CONFIG"]
+    print("first power on with erased EEPROM: %d writes" % sum(EEPROM_writes))
+    for config in range(HDR["NUM_EEPROM_CONFIGURATIONS"]):
+        stored = EEPROM[config * bytesPerConfig + HDR["EEPROM_INVERTED_CHKSM"]]
+        calc = eeprom_calc_inverted_checksum(config)
+        print("   config %d checksum stored 0x%02X calculated 0x%02X %s" % (config, stored, calc, "OK" if stored == calc else "MISMATCH"))
+    if print_out_of_range():
+        print("   eeprom_check_init(EEPROM_PROCESS_ALL_CONFIG) only checks config %d; configs %d to %d are never checked" %
+              ((HDR["EEPROM_PROCESS_ALL_CONFIG"] * bytesPerConfig % EEPROM_SIZE) // bytesPerConfig, 1, HDR["NUM_EEPROM_CONFIGURATIONS"] - 1))
+
+    reset_model(EEPROM)
+    totalWrites, redundantWrites = simulate_sessions(numSessions, actionsPerSession, seed)
+    print("")
+    print("%d simulated menu sessions, up to %d actions each: %d EEPROM writes, %d redundant (%.1f%%)" %
+          (numSessions, actionsPerSession, totalWrites, redundantWrites, 100.0 * redundantWrites / max(1, totalWrites)))
+    print_out_of_range()
+    print("")
+    print("writes per cell (cells with any writes):")
+    print("%-8s %-7s %-10s %8s" % ("address", "config", "offset", "writes"))
+    for address in range(EEPROM_SIZE):
+        if EEPROM_writes[address]:
+            offset = address % bytesPerConfig
+            if HDR["EEPROM_INVERTED_CHKSM"] == offset:
+                what = "CHKSM"
+            elif offset >= HDR["EEPROM_START_LED_CONFIGS"]:
+                what = "LED+%d" % (offset - HDR["EEPROM_START_LED_CONFIGS"])
+            else:
+                what = "SOUND+%d" % (offset - HDR["EEPROM_START_SOUND_CONFIGS"])
+            print("0x%03X    %-7d %-10s %8d" % (address, address // bytesPerConfig, what, EEPROM_writes[address]))
+    worst = max(EEPROM_writes)
+    print("")
+    print("most-written cell: %d writes; at this rate the 100,000 cycle rating lasts about %d sessions" %
+          (worst, 100000 * numSessions // max(1, worst)))
+# end do_eepromModel()
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(prog='eepromModel',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="model the RBG EEPROM configuration storage and count writes per cell\n" +
+                    "   uses host copies of the RBG_SciFi.ino EEPROM routines and the layout from RBG_SciFi_StatesAndInputs.h",
+        epilog="""Example:
+python eepromModel.py --sessions 1000 --actions 10
+""",
+        usage='%(prog)s [--sessions num] [--actions num] [--seed num]')
+    my_parser.add_argument('--sessions', type=int, default=1000, help='number of simulated menu sessions (default 1000)')
+    my_parser.add_argument('--actions', type=int, default=10, help='maximum menu actions per session (default 10)')
+    my_parser.add_argument('--seed', type=int, default=47, help='random seed (default 47)')
+    args = my_parser.parse_args()
+
+    do_eepromModel(args.sessions, args.actions, args.seed)
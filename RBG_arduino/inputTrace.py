@@ -0,0 +1,290 @@
+# inputTrace.py - compact binary recording of the nowVinputRBG input masks, with memory-mapped replay
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# loop() calls getButtonInput() once per 40 millisecond tick and gets a 16-bit mVINP_* mask. A trace holds the
+#    sequence of those masks as runs: (mask, number of ticks). The masks change a few times a second at most,
+#    so an hours-long soak session is a few thousand runs - kilobytes, not the gigabytes of the serial log.
+#
+# File layout (all little-endian):
+#    header  - HEADER_FMT: MAGIC, VERSION, tick_ms, index stride, number of runs, total ticks,
+#                          loopCount of the first tick, byte offset of the index
+#    runs    - number of runs * RUN_FMT: uint16 mask, uint16 ticks (a longer run is split into several with the same mask)
+#    index   - one uint64 per INDEX_STRIDE runs: the tick at which run (n * stride) starts, so a reader can find
+#              the run for any tick with a binary search over the index and a short scan
+#
+# Traces come from a serial log (the "DEBUG loop() - nowVinputRBG 0x.. loopCount L" lines, printed on the tick
+#    where the mask changed; see parseSerialLog.py). With DEBUG_SHOW_MSEC loopCount is millis(); otherwise give
+#    --loop_ms, the milliseconds per loopCount.
+#
+# InputTrace(fname) maps the file read-only; the runs are a memoryview on the map so replay runs at memory speed
+#    and nothing is read that is not used. A host simulator calls mask_at(tick) or iterates masks() in place of
+#    getButtonInput(). --c_array prints the masks as a VS_debuggable.py myInputs[] array.
+#
+
+import argparse
+import bisect
+import mmap
+import os
+import re
+import struct
+import sys
+
+import mdoUniq
+import parseRBGheaders
+import parseSerialLog
+import rbgProfile
+
+MAGIC = b"RBGTRACE"
+VERSION = 1
+HEADER_FMT = "<8sHHIIQqQ"  # magic, version, tick_ms, index stride, runs, total ticks, first loopCount, index offset
+RUN_FMT = "<HH"            # mask, ticks
+INDEX_FMT = "<Q"           # start tick of run (n * stride)
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+RUN_SIZE = struct.calcsize(RUN_FMT)
+INDEX_SIZE = struct.calcsize(INDEX_FMT)
+MAX_RUN_TICKS = 0xFFFF
+INDEX_STRIDE = 64
+TICK_MS = 40
+
+RE_LOOPCOUNT = re.compile(r'loopCount (\d+)')
+
+
+###################################################################################################
+# write_trace(fname, runs, tick_ms, firstLoopCount, stride) - write runs [(mask, ticks), ...] as a trace file
+#
+# adjacent runs with the same mask are merged, zero-length runs dropped, runs over MAX_RUN_TICKS split
+# returns (number of runs written, total ticks)
+#
+def write_trace(fname, runs, tick_ms=TICK_MS, firstLoopCount=0, stride=INDEX_STRIDE):
+    packed = []
+    for mask, ticks in runs:
+        if ticks <= 0:
+            continue
+        if (0 != len(packed)) and (packed[-1][0] == mask):
+            ticks += packed.pop()[1]
+        while ticks > MAX_RUN_TICKS:
+            packed.append((mask, MAX_RUN_TICKS))
+            ticks -= MAX_RUN_TICKS
+        packed.append((mask, ticks))
+
+    body = bytearray()
+    index = bytearray()
+    totalTicks = 0
+    for runNum, (mask, ticks) in enumerate(packed):
+        if 0 == (runNum % stride):
+            index += struct.pack(INDEX_FMT, totalTicks)
+        body += struct.pack(RUN_FMT, mask & 0xFFFF, ticks)
+        totalTicks += ticks
+    header = struct.pack(HEADER_FMT, MAGIC, VERSION, int(tick_ms), stride, len(packed), totalTicks, firstLoopCount,
+                         HEADER_SIZE + len(body))
+    with open(fname + ".tmp", 'wb') as fobj:
+        fobj.write(header)
+        fobj.write(body)
+        fobj.write(index)
+    os.replace(fname + ".tmp", fname)
+    return len(packed), totalTicks
+# end write_trace()
+
+
+###################################################################################################
+# runs_from_serial_log(fname, tick_ms, loop_ms) - input runs from the nowVinputRBG lines of a serial log
+#
+# returns (list of (mask, ticks), loopCount of the first input line or 0 if none)
+# the last mask lasts until the last loopCount anywhere in the log
+#
+def runs_from_serial_log(fname, tick_ms=TICK_MS, loop_ms=1.0):
+    changes = []  # (loopCount, mask)
+    lastLine = None
+    for batch in mdoUniq.read_line_batches(fname):
+        for theLine in batch:
+            if "loopCount" not in theLine:
+                continue
+            lastLine = theLine
+            if "nowVinputRBG" in theLine:
+                match = parseSerialLog.RE_INPUT_CHANGE.search(theLine)
+                if match:
+                    changes.append((int(match.group(2)), int(match.group(1), 16)))
+    if 0 == len(changes):
+        return [], 0
+    match = RE_LOOPCOUNT.search(lastLine)
+    endLoopCount = max(int(match.group(1)), changes[-1][0]) if match else changes[-1][0]
+
+    # round each change to the tick it happened on; every mask is seen for at least one tick
+    runs = []
+    prevTick = 0
+    for idx, (loopCount, mask) in enumerate(changes):
+        nextLoopCount = changes[idx + 1][0] if idx + 1 < len(changes) else endLoopCount
+        nextTick = max(prevTick + 1, int(round((nextLoopCount - changes[0][0]) * loop_ms / tick_ms)))
+        runs.append((mask, nextTick - prevTick))
+        prevTick = nextTick
+    return runs, changes[0][0]
+# end runs_from_serial_log()
+
+
+###################################################################################################
+# InputTrace - read-only memory-mapped trace
+#
+class InputTrace:
+    def __init__(self, fname):
+        self.fname = fname
+        self._fobj = open(fname, 'rb')
+        self._map = mmap.mmap(self._fobj.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.tick_ms, self.stride, self.num_runs, self.total_ticks, self.first_loopcount, indexOffset = \
+            struct.unpack_from(HEADER_FMT, self._map, 0)
+        if (MAGIC != magic) or (VERSION != version):
+            self.close()
+            raise ValueError("%s is not an RBG input trace version %d" % (fname, VERSION))
+        view = memoryview(self._map)
+        runs = view[HEADER_SIZE:HEADER_SIZE + self.num_runs * RUN_SIZE]
+        index = view[indexOffset:indexOffset + (-(-self.num_runs // self.stride)) * INDEX_SIZE]
+        if "little" == sys.byteorder:
+            self._runs = runs.cast("H")     # mask, ticks, mask, ticks, ...
+            self._index = index.cast("Q")
+        else:  # copy and swap on a big-endian host
+            self._runs = [val for pair in struct.iter_unpack(RUN_FMT, runs) for val in pair]
+            self._index = [val for (val,) in struct.iter_unpack(INDEX_FMT, index)]
+        self._views = (runs, index, view)
+
+    def close(self):
+        if getattr(self, "_views", None) is not None:
+            self._runs = self._index = None
+            for view in self._views:
+                view.release()
+            self._views = None
+        if not self._map.closed:
+            self._map.close()
+        self._fobj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excinfo):
+        self.close()
+
+    def __len__(self):
+        return self.total_ticks
+
+    def run(self, runNum):
+        """run - (mask, ticks) of run number runNum"""
+        return self._runs[2 * runNum], self._runs[2 * runNum + 1]
+
+    def runs(self):
+        """runs - iterate (mask, ticks) over all runs"""
+        theRuns = self._runs
+        for idx in range(0, 2 * self.num_runs, 2):
+            yield theRuns[idx], theRuns[idx + 1]
+
+    def find_run(self, tick):
+        """find_run - (run number, tick that run starts on) for the run containing tick
+        :param tick: 0 <= tick < len(trace)
+        """
+        if not (0 <= tick < self.total_ticks):
+            raise IndexError("tick %d not in trace of %d ticks" % (tick, self.total_ticks))
+        block = bisect.bisect_right(self._index, tick) - 1
+        runNum, start = block * self.stride, self._index[block]
+        theRuns = self._runs
+        while start + theRuns[2 * runNum + 1] <= tick:
+            start += theRuns[2 * runNum + 1]
+            runNum += 1
+        return runNum, start
+
+    def mask_at(self, tick):
+        """mask_at - the nowVinputRBG mask getButtonInput() returned on tick"""
+        return self._runs[2 * self.find_run(tick)[0]]
+
+    def masks(self, start=0):
+        """masks - iterate the mask for each tick from tick start to the end of the trace"""
+        if start >= self.total_ticks:
+            return
+        runNum, runStart = self.find_run(start)
+        theRuns = self._runs
+        skip = start - runStart
+        for idx in range(2 * runNum, 2 * self.num_runs, 2):
+            mask = theRuns[idx]
+            for dummy in range(theRuns[idx + 1] - skip):
+                yield mask
+            skip = 0
+# end class InputTrace
+
+
+###################################################################################################
+# mask_names(mask, bits) - "mVINP_LOCK | mVINP_SOUNDACTV" style text for a mask
+#
+def mask_names(mask, bits):
+    names = [name for value, name in bits if mask & value]
+    rest = mask & ~sum(value for value, name in bits if mask & value)
+    if rest:
+        names.append("0x%04X" % rest)
+    return " | ".join(names) if names else "0x0000"
+
+def mvinp_bits():
+    # the single-bit mVINP_* masks from the .h file, lowest bit first
+    defines = parseRBGheaders.read_all_defines()
+    bits = []
+    for name in defines:
+        if name.startswith("mVINP_"):
+            value = parseRBGheaders.eval_define(name, defines)
+            if isinstance(value, int) and (value > 0) and (0 == (value & (value - 1))):
+                bits.append((value, name))
+    return sorted(bits)
+
+def print_info(trace):
+    print("%s: %d runs, %d ticks of %d ms (%.1f minutes), first loopCount %d, index every %d runs, %d bytes" %
+          (trace.fname, trace.num_runs, trace.total_ticks, trace.tick_ms, trace.total_ticks * trace.tick_ms / 60000.0,
+           trace.first_loopcount, trace.stride, os.path.getsize(trace.fname)))
+    ticksPerMask = {}
+    for mask, ticks in trace.runs():
+        ticksPerMask[mask] = ticksPerMask.get(mask, 0) + ticks
+    bits = mvinp_bits()
+    for mask in sorted(ticksPerMask, key=lambda m: -ticksPerMask[m]):
+        print("   0x%04X %10d ticks  %s" % (mask, ticksPerMask[mask], mask_names(mask, bits)))
+
+def print_c_array(trace, maxTicks):
+    # one entry per tick, the form used by the myInputs[] arrays in VS_debuggable.py
+    bits = mvinp_bits()
+    print("    } myInputs[] = { // from %s" % os.path.basename(trace.fname))
+    for tick, mask in enumerate(trace.masks()):
+        if tick >= maxTicks:
+            break
+        print("        %-40s \" %s tick %d\"," % (mask_names(mask, bits) + ",", mask_names(mask, bits), tick))
+    print("    }; // myInputs from %s" % os.path.basename(trace.fname))
+
+
+if __name__ == "__main__":
+    rbgProfile.setup("inputTrace")
+    my_parser = argparse.ArgumentParser(prog='inputTrace',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="record the per-tick nowVinputRBG input masks from a serial log as a compact binary trace\n" +
+                    "   or describe a trace (--info) or print it as a VS_debuggable myInputs[] array (--c_array)",
+        epilog="""Example:
+python inputTrace.py soak.log soak.rbgt
+python inputTrace.py soak.rbgt --info
+python inputTrace.py soak.rbgt --c_array 200
+""",
+        usage='%(prog)s infile [outfile] [--info] [--c_array N] [--tick_ms MS] [--loop_ms MS] [--stride N]')
+    my_parser.add_argument('infile', type=str, help='serial log (- for stdin) to convert, or trace for --info/--c_array')
+    my_parser.add_argument('outfile', type=str, nargs='?', default=None, help='trace file to write')
+    my_parser.add_argument('--info', action='store_true', help='print the header and ticks per mask of trace infile')
+    my_parser.add_argument('--c_array', type=int, default=None, metavar='N', help='print the first N ticks of trace infile as myInputs[]')
+    my_parser.add_argument('--tick_ms', type=int, default=TICK_MS, help='state machine period, the 40 in loop() (default 40)')
+    my_parser.add_argument('--loop_ms', type=float, default=1.0, help='milliseconds per loopCount (default 1, for DEBUG_SHOW_MSEC)')
+    my_parser.add_argument('--stride', type=int, default=INDEX_STRIDE, help='runs per index entry (default %d)' % INDEX_STRIDE)
+    args = my_parser.parse_args()
+
+    if args.info or (args.c_array is not None):
+        with InputTrace(args.infile) as theTrace:
+            if args.info:
+                print_info(theTrace)
+            if args.c_array is not None:
+                print_c_array(theTrace, args.c_array)
+    elif args.outfile is None:
+        my_parser.error("outfile is required to convert a serial log")
+    else:
+        rbgProfile.lap("parse")
+        theRuns, firstLoopCount = runs_from_serial_log(args.infile, args.tick_ms, args.loop_ms)
+        rbgProfile.lap("write")
+        numRuns, totalTicks = write_trace(args.outfile, theRuns, args.tick_ms, firstLoopCount, args.stride)
+        rbgProfile.stop()
+        sys.stderr.write("%s: %d runs, %d ticks\n" % (args.outfile, numRuns, totalTicks))
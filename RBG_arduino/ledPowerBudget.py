@@ -0,0 +1,519 @@
+# ledPowerBudget.py - estimate LED current draw for each LED pattern by emulating the pattern frames
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# RBG_SciFi_LEDs.h caps BRIGHTMAX by hand because the three rings can draw a lot of current (about 42 mA per LED WHITE).
+# This runs each doPattern() case through a host copy of the pattern code and the few FastLED routines it uses,
+#    then computes the current for every frame the same way FastLED power_mgt.cpp does:
+#      mW = ((sum of red * gRed_mW) + (sum of green * gGreen_mW) + (sum of blue * gBlue_mW)) / 256 + numLEDs * gDark_mW
+#      scaled by brightness/256, then mA = mW / 5 volts
+#    The gRed_mW etc. values are taken from the comments in RBG_SciFi_LEDs.h so they stay the same as what the header quotes.
+#
+# Reports peak and time-weighted average current for each pattern (1 through 13 plus OFF), which patterns each
+#    efctLED configuration choice uses (from lookupLEDpatternTbl), and the highest BRIGHTMAX that keeps the peak under a budget.
+#
+# The emulation follows the Arduino code as written (including its quirks); FastLED math is the 8-bit integer version.
+#    Timing assumes each LED step happens exactly ptrnDelayLEDstep milliseconds after the previous one.
+#
+
+import argparse
+import re
+import math
+
+import parseRBGheaders
+
+# FastLED CRGB constants used by the patterns
+CRGB_Black = (0x00, 0x00, 0x00)
+CRGB_White = (0xFF, 0xFF, 0xFF)
+CRGB_Red = (0xFF, 0x00, 0x00)
+CRGB_Green = (0x00, 0x80, 0x00)  # yes, FastLED CRGB::Green is half intensity
+CRGB_Blue = (0x00, 0x00, 0xFF)
+CRGB_Yellow = (0xFF, 0xFF, 0x00)
+CRGB_BY_NAME = {"Black": CRGB_Black, "White": CRGB_White, "Red": CRGB_Red, "Green": CRGB_Green, "Blue": CRGB_Blue, "Yellow": CRGB_Yellow}
+
+# FastLED PartyColors_p
+PartyColors_p = [
+    0x5500AB, 0x84007C, 0xB5004B, 0xE5001B,
+    0xE81700, 0xB84700, 0xAB7700, 0xABAB00,
+    0xAB5500, 0xDD2200, 0xF2000E, 0xC2003E,
+    0x8F0071, 0x5F00A1, 0x2F00D0, 0x0007F9]
+PartyColors_p = [((val >> 16) & 0xFF, (val >> 8) & 0xFF, val & 0xFF) for val in PartyColors_p]
+
+ALL_PATTERNS = list(range(1, 14)) + [254]
+PATTERN_NAMES = {
+    1: "juggle", 2: "rainbowWithGlitter", 3: "RBG_bpm_rings", 4: "disk rotate",
+    5: "disk down the drain", 6: "RBG_juggle_numdot_ring(-4)", 7: "RBG_juggle_numdot_ring(5)+confetti",
+    8: "RailGun BLUE", 9: "RailGun RED", 10: "RailGun GREEN", 11: "RBG_confetti_fadeby(128)",
+    12: "bpm", 13: "confetti", 254: "OFF"}
+EFFECT_TYPE_NAMES = ["WINDUP", "SHOOT", "OPEN", "LOCK", "PWRON", "WAIT"]  # same order as cfgMaxLEDForType
+
+# values from the *.h files; filled in by load_header_values()
+HDR = {}
+
+# emulator state - same names as the Arduino globals where there is one
+led_display = []
+gHue = 0
+rand16seed = 1337  # FastLED RAND16_SEED
+timerNow = 0
+ptrnDelayLEDstep = 7
+numSteps = 0  # doPattern() static
+railStep = 0  # RBG_RailGunEffect() static myStep
+
+
+###################################################################################################
+# load_header_values() - get LED layout, brightness and power constants from the *.h files
+#
+def load_header_values():
+    defines = parseRBGheaders.read_all_defines()
+    for name in ("BRIGHTMAX", "NUM_LEDS_PER_DISK", "NUM_RINGS_PER_DISK", "MIN_LEDS_PER_RING",
+                 "mEFCT_PTRNLED_OFF", "mNONE", "FASTLED_SNGLPTRNLEN"):
+        HDR[name] = parseRBGheaders.eval_define(defines[name], defines)
+    HDR["leds_per_ring"] = parseRBGheaders.read_c_int_array(parseRBGheaders.FNAME_LEDS_H, "leds_per_ring", defines)
+    HDR["start_per_ring"] = parseRBGheaders.read_c_int_array(parseRBGheaders.FNAME_LEDS_H, "start_per_ring", defines)
+    HDR["lookupLEDpatternTbl"] = parseRBGheaders.read_c_int_array(parseRBGheaders.FNAME_STATES_H, "lookupLEDpatternTbl", defines)
+    HDR["cfgMaxLEDForType"] = parseRBGheaders.read_c_int_array(parseRBGheaders.FNAME_STATES_H, "cfgMaxLEDForType", defines)
+    HDR["windup1BrightSpots"] = []
+    for spot in parseRBGheaders.read_c_array(parseRBGheaders.FNAME_LEDS_H, "windup1BrightSpots"):
+        match = re.search(r'\.posn\s*=\s*(\w+)\s*,\s*\.hue\s*=\s*CRGB::(\w+)', spot)
+        HDR["windup1BrightSpots"].append((parseRBGheaders.eval_define(match.group(1), defines), CRGB_BY_NAME[match.group(2)]))
+    # the power numbers are only in the comments, for instance "static const uint8_t gRed_mW   = 16 * 5;"
+    with open(parseRBGheaders.FNAME_LEDS_H, 'rt') as fobj:
+        the_text = fobj.read()
+    for color in ("Red", "Green", "Blue", "Dark"):
+        match = re.search(r'g%s_mW\s*=\s*(\d+)\s*\*\s*(\d+)' % color, the_text)
+        HDR["g%s_mW" % color] = int(match.group(1)) * int(match.group(2))
+    HDR["volts"] = int(re.search(r'gRed_mW\s*=\s*\d+\s*\*\s*(\d+)', the_text).group(1))
+# end load_header_values()
+
+
+###################################################################################################
+# FastLED 8-bit math - integer versions matching lib8tion
+#
+def scale8(i, scale):
+    return (i * (1 + scale)) >> 8
+
+def scale8_video(i, scale):
+    return ((i * scale) >> 8) + (1 if (i and scale) else 0)
+
+def qadd8(i, j):
+    return min(255, i + j)
+
+def scale16(i, scale):
+    return (i * (1 + scale)) >> 16
+
+def sin8(theta):
+    return max(0, min(255, int(round(128 + 127.5 * math.sin(2.0 * math.pi * (theta & 0xFF) / 256.0)))))
+
+def sin16(theta):
+    return int(round(32767 * math.sin(2.0 * math.pi * (theta & 0xFFFF) / 65536.0)))
+
+def beat88(bpm88):
+    return ((timerNow * bpm88 * 280) >> 16) & 0xFFFF
+
+def beat16(bpm):
+    if bpm < 256:
+        bpm <<= 8
+    return beat88(bpm)
+
+def beatsin8(bpm, lowest=0, highest=255):
+    beatsin = sin8(beat16(bpm) >> 8)
+    return (lowest + scale8(beatsin, highest - lowest)) & 0xFF
+
+def beatsin16(bpm, lowest=0, highest=65535):
+    beatsin = sin16(beat16(bpm)) + 32768
+    return (lowest + scale16(beatsin, highest - lowest)) & 0xFFFF
+
+def random16(lim=None):
+    global rand16seed
+    rand16seed = (rand16seed * 2053 + 13849) & 0xFFFF
+    if lim is None:
+        return rand16seed
+    return (rand16seed * lim) >> 16
+
+def random8(lim=None):
+    global rand16seed
+    rand16seed = (rand16seed * 2053 + 13849) & 0xFFFF
+    r = ((rand16seed & 0xFF) + (rand16seed >> 8)) & 0xFF
+    if lim is None:
+        return r
+    return (r * lim) >> 8
+
+def hsv2rgb_rainbow(hue, sat, val):
+    hue, sat, val = hue & 0xFF, sat & 0xFF, val & 0xFF
+    offset8 = (hue & 0x1F) << 3
+    third = scale8(offset8, 85)
+    if 0 == (hue & 0x80):
+        if 0 == (hue & 0x40):
+            if 0 == (hue & 0x20):
+                r, g, b = 255 - third, third, 0
+            else:
+                r, g, b = 171, 85 + third, 0
+        else:
+            if 0 == (hue & 0x20):
+                twothirds = scale8(offset8, 170)
+                r, g, b = 171 - twothirds, 170 + third, 0
+            else:
+                r, g, b = 0, 255 - third, third
+    else:
+        if 0 == (hue & 0x40):
+            if 0 == (hue & 0x20):
+                twothirds = scale8(offset8, 170)
+                r, g, b = 0, 171 - twothirds, 85 + twothirds
+            else:
+                r, g, b = third, 0, 255 - third
+        else:
+            if 0 == (hue & 0x20):
+                r, g, b = 85 + third, 0, 171 - third
+            else:
+                r, g, b = 170 + third, 0, 85 - third
+    if 255 != sat:
+        if 0 == sat:
+            r, g, b = 255, 255, 255
+        else:
+            desat = scale8_video(255 - sat, 255 - sat)
+            satscale = 255 - desat
+            r, g, b = scale8(r, satscale) + desat, scale8(g, satscale) + desat, scale8(b, satscale) + desat
+    if 255 != val:
+        val = scale8_video(val, val)
+        if 0 == val:
+            r, g, b = 0, 0, 0
+        else:
+            r, g, b = scale8(r, val), scale8(g, val), scale8(b, val)
+    return (r & 0xFF, g & 0xFF, b & 0xFF)
+
+def ColorFromPalette(pal, index, brightness):
+    index, brightness = index & 0xFF, brightness & 0xFF
+    hi4, lo4 = index >> 4, index & 0x0F
+    red1, green1, blue1 = pal[hi4]
+    if lo4:  # LINEARBLEND
+        red2, green2, blue2 = pal[0] if (15 == hi4) else pal[hi4 + 1]
+        f2 = lo4 << 4
+        f1 = 255 - f2
+        red1 = scale8(red1, f1) + scale8(red2, f2)
+        green1 = scale8(green1, f1) + scale8(green2, f2)
+        blue1 = scale8(blue1, f1) + scale8(blue2, f2)
+    if 255 != brightness:
+        if brightness:
+            brightness += 1
+            red1, green1, blue1 = scale8(red1, brightness), scale8(green1, brightness), scale8(blue1, brightness)
+        else:
+            red1, green1, blue1 = 0, 0, 0
+    return (red1 & 0xFF, green1 & 0xFF, blue1 & 0xFF)
+
+def nscale8(color, scale):
+    return tuple(scale8(chan, scale) for chan in color)
+
+def fadeToBlackBy(leds, num, fadeBy):
+    for idx in range(num):
+        leds[idx] = nscale8(leds[idx], 255 - fadeBy)
+
+def fill_rainbow(leds, num, initialhue, deltahue):
+    hue = initialhue
+    for idx in range(num):
+        leds[idx] = hsv2rgb_rainbow(hue, 240, 255)
+        hue = (hue + deltahue) & 0xFF
+
+def crgb_add(c1, c2):  # CRGB +=
+    return tuple(qadd8(a, b) for a, b in zip(c1, c2))
+
+def crgb_or(c1, c2):  # CRGB |=
+    return tuple(max(a, b) for a, b in zip(c1, c2))
+
+
+###################################################################################################
+# host copies of the RBG_SciFi.ino LED pattern routines
+#
+def sgn(val):
+    return (val > 0) - (val < 0)
+
+def RBG_ringIdxIncrDecr(idx, idxRing, direction):
+    rtn = idx + direction
+    start, num = HDR["start_per_ring"][idxRing], HDR["leds_per_ring"][idxRing]
+    if rtn >= start + num:
+        rtn = start
+    elif rtn < start:
+        rtn = start + num  # as written in the .ino; this is one past the end of the ring
+    return rtn & 0xFF
+
+def RBG_diskInitBrightSpots(brightSpots, color, direction, fade):
+    for idx in range(HDR["NUM_LEDS_PER_DISK"]):
+        led_display[idx] = color
+    for idxRing in range(HDR["NUM_RINGS_PER_DISK"]):
+        idxBrtspt = 0
+        while (brightSpots[idxBrtspt][0] < HDR["leds_per_ring"][idxRing]) and (idxBrtspt < HDR["leds_per_ring"][idxRing]):
+            myHue = brightSpots[idxBrtspt][1]
+            idxFade = brightSpots[idxBrtspt][0] + HDR["start_per_ring"][idxRing]
+            led_display[idxFade] = myHue
+            idxFade = RBG_ringIdxIncrDecr(idxFade, idxRing, direction)
+            while 0 != sgn(direction):  # note direction is not reset for the next spot, same as the .ino
+                myHue = nscale8(myHue, 255 - (fade & 0xFF))
+                led_display[idxFade] = myHue
+                direction -= sgn(direction)
+                idxFade = RBG_ringIdxIncrDecr(idxFade, idxRing, direction)
+            idxBrtspt += 1
+
+def RBG_ringRotateAndFade_init():
+    global ptrnDelayLEDstep
+    ptrnDelayLEDstep = 7  # DLYLED_ringRotateAndFade
+    RBG_diskInitBrightSpots(HDR["windup1BrightSpots"], CRGB_Black, -3, 196)
+
+def RBG_diskRotateOrDrain(direction, color):
+    num = HDR["NUM_LEDS_PER_DISK"]
+    if direction > 0:
+        led_tmp1 = led_display[0] if (1 == direction) else color
+        for idx in range(1, num):
+            led_display[idx - 1] = led_display[idx]
+        led_display[num - 1] = led_tmp1
+    else:
+        led_tmp1 = led_display[num - 1] if (-1 == direction) else color
+        for idx in range(num - 1, 0, -1):
+            led_display[idx] = led_display[idx - 1]
+        led_display[0] = led_tmp1
+
+def RBG_diskDownTheDrainOrRotate(direction):
+    global ptrnDelayLEDstep
+    if direction > (HDR["NUM_RINGS_PER_DISK"] - 1):
+        ptrnDelayLEDstep = 7  # DLYLED_diskDownTheDrain
+    else:
+        RBG_diskRotateOrDrain(direction, CRGB_Black)
+
+def set_ring(whichRing, color):
+    start = HDR["start_per_ring"][whichRing]
+    for idx in range(start, start + HDR["leds_per_ring"][whichRing]):
+        led_display[idx] = color
+
+def RBG_RailGunEffect(myInit, color):
+    global railStep, ptrnDelayLEDstep
+    if 0 != myInit:
+        railStep = 0
+        ptrnDelayLEDstep = 25
+        for idx in range(HDR["NUM_LEDS_PER_DISK"]):
+            led_display[idx] = CRGB_Black
+    elif railStep < 8 * 4 * 27:
+        phase = (railStep // 8) % 4
+        if 0 == phase:
+            set_ring(2, color)
+        elif 1 == phase:
+            set_ring(2, CRGB_Black)
+            set_ring(1, color)
+        elif 2 == phase:
+            set_ring(1, CRGB_Black)
+            set_ring(0, color)
+        else:
+            if railStep < 8 * 4 * 1:
+                ptrnDelayLEDstep = 16
+            elif railStep < 8 * 4 * 2:
+                ptrnDelayLEDstep = 7
+            set_ring(0, CRGB_Black)
+        railStep += 1
+    else:
+        RBG_confetti_fadeby(128)
+
+def RBG_bpm_rings():
+    beat = beatsin8(62 + 10, 0, 255)
+    for ring in range(HDR["NUM_RINGS_PER_DISK"]):
+        beat = -beat + 255
+        start = HDR["start_per_ring"][ring]
+        for idx in range(start, start + HDR["leds_per_ring"][ring]):
+            led_display[idx] = ColorFromPalette(PartyColors_p, gHue + (idx * 2), beat - gHue + (idx * 10))
+
+def RBG_confetti_fadeby(fadeVal):
+    fadeToBlackBy(led_display, HDR["NUM_LEDS_PER_DISK"], fadeVal)
+    pos = random16(HDR["NUM_LEDS_PER_DISK"])
+    led_display[pos] = crgb_add(led_display[pos], hsv2rgb_rainbow(gHue + random8(64), 200, 255))
+
+def RBG_juggle_numdot_ring(numDots):
+    fadeToBlackBy(led_display, HDR["NUM_LEDS_PER_DISK"], 20)
+    dothue = 0
+    if 0 == numDots:
+        numDots = 8
+    if 0 < numDots:
+        for i in range(numDots):
+            pos = beatsin16(i + 7, 0, HDR["NUM_LEDS_PER_DISK"] - 1)
+            led_display[pos] = crgb_or(led_display[pos], hsv2rgb_rainbow(dothue, 200, 255))
+            dothue = (dothue + 32) & 0xFF
+    else:
+        numDots = min(-numDots, HDR["MIN_LEDS_PER_RING"])
+        for ring in range(HDR["NUM_RINGS_PER_DISK"]):
+            start = HDR["start_per_ring"][ring]
+            for i in range(numDots):
+                pos = beatsin16(i + 7, start, start + HDR["leds_per_ring"][ring] - 1)
+                led_display[pos] = crgb_or(led_display[pos], hsv2rgb_rainbow(dothue, 200, 255))
+                dothue = (dothue + 32) & 0xFF
+
+def rainbowWithGlitter():
+    fill_rainbow(led_display, HDR["NUM_LEDS_PER_DISK"], gHue, 7)
+    if random8() < 100:
+        pos = random16(HDR["NUM_LEDS_PER_DISK"])
+        led_display[pos] = crgb_add(led_display[pos], CRGB_White)
+
+def confetti():
+    fadeToBlackBy(led_display, HDR["NUM_LEDS_PER_DISK"], 10)
+    pos = random16(HDR["NUM_LEDS_PER_DISK"])
+    led_display[pos] = crgb_add(led_display[pos], hsv2rgb_rainbow(gHue + random8(64), 200, 255))
+
+def bpm():
+    beat = beatsin8(62 + 10, 64, 255)
+    for idx in range(HDR["NUM_LEDS_PER_DISK"]):
+        led_display[idx] = ColorFromPalette(PartyColors_p, gHue + (idx * 2), beat - gHue + (idx * 10))
+
+def juggle():
+    RBG_juggle_numdot_ring(8)
+
+def doPattern(nowEfctLED, tmpInit):
+    """doPattern - host copy of the switch in RBG_SciFi.ino doPattern(); nowEfctLED is the pattern number after lookup
+    :param nowEfctLED: 1 through 13, anything else is OFF
+    :param tmpInit: nonzero to initialize the pattern
+    """
+    global numSteps
+    if 1 == nowEfctLED:
+        juggle()
+    elif 2 == nowEfctLED:
+        rainbowWithGlitter()
+    elif 3 == nowEfctLED:
+        RBG_bpm_rings()
+    elif 4 == nowEfctLED:
+        if 0 != tmpInit:
+            RBG_ringRotateAndFade_init()
+            RBG_diskDownTheDrainOrRotate(0)
+        else:
+            RBG_diskDownTheDrainOrRotate(-1)
+    elif 5 == nowEfctLED:
+        if (0 != tmpInit) or (numSteps > (10 + HDR["NUM_LEDS_PER_DISK"])):
+            RBG_ringRotateAndFade_init()
+            numSteps = 0
+        else:
+            RBG_diskDownTheDrainOrRotate(2)
+            numSteps += 1
+    elif 6 == nowEfctLED:
+        RBG_juggle_numdot_ring(-4)
+    elif 7 == nowEfctLED:
+        RBG_juggle_numdot_ring(5)
+        RBG_confetti_fadeby(128)
+    elif nowEfctLED in (8, 9, 10):
+        RBG_RailGunEffect(tmpInit, {8: CRGB_Blue, 9: CRGB_Red, 10: CRGB_Green}[nowEfctLED])
+    elif 11 == nowEfctLED:
+        RBG_confetti_fadeby(128)
+    elif 12 == nowEfctLED:
+        bpm()
+    elif 13 == nowEfctLED:
+        confetti()
+    elif 0 != tmpInit:  # OFF: the .ino only blacks out the first NUM_RINGS_PER_DISK LEDs
+        for idx in range(HDR["NUM_RINGS_PER_DISK"]):
+            led_display[idx] = CRGB_Black
+# end doPattern()
+
+
+###################################################################################################
+# power calculations - same formula as FastLED calculate_unscaled_power_mW()
+#
+def unscaled_power_mW(leds):
+    red = sum(led[0] for led in leds)
+    green = sum(led[1] for led in leds)
+    blue = sum(led[2] for led in leds)
+    return ((red * HDR["gRed_mW"]) >> 8) + ((green * HDR["gGreen_mW"]) >> 8) + ((blue * HDR["gBlue_mW"]) >> 8) + \
+        len(leds) * HDR["gDark_mW"]
+
+def mW_to_mA(mW, brightness):
+    return (mW * brightness / 256.0) / HDR["volts"]
+
+def handle_led_peak_mW():
+    """handle_led_peak_mW - the single handle LED cycles through fill_rainbow(led_sngl_array, FASTLED_SNGLPTRNLEN, gHue, 21)
+    :return: worst-case unscaled mW for that one LED
+    """
+    sngl = [CRGB_Black] * HDR["FASTLED_SNGLPTRNLEN"]
+    fill_rainbow(sngl, HDR["FASTLED_SNGLPTRNLEN"], 0, 21)
+    return max(unscaled_power_mW([color]) for color in sngl)
+
+
+###################################################################################################
+# run_pattern(pattern, seconds) - emulate one pattern starting from the setup() display
+#
+# returns dict with peak_mW (unscaled), avg_mW (unscaled, time-weighted), numFrames
+#
+def run_pattern(pattern, seconds):
+    global led_display, gHue, rand16seed, timerNow, ptrnDelayLEDstep, numSteps, railStep
+    led_display = [CRGB_Black] * HDR["NUM_LEDS_PER_DISK"]
+    gHue, rand16seed, timerNow, ptrnDelayLEDstep, numSteps, railStep = 0, 1337, 0, 7, 0, 0
+    RBG_diskInitBrightSpots(HDR["windup1BrightSpots"], CRGB_Black, 3, 196)  # from setup()
+
+    doPattern(pattern, 1)
+    peak_mW = unscaled_power_mW(led_display)
+    weighted_mW = 0
+    numFrames = 0
+    while timerNow < seconds * 1000:
+        delay = max(1, ptrnDelayLEDstep)
+        timerNow += delay
+        gHue = (gHue + 3) & 0xFF
+        doPattern(pattern, 0)
+        frame_mW = unscaled_power_mW(led_display)
+        peak_mW = max(peak_mW, frame_mW)
+        weighted_mW += frame_mW * delay
+        numFrames += 1
+    return {"peak_mW": peak_mW, "avg_mW": weighted_mW / max(1, timerNow), "numFrames": numFrames}
+# end run_pattern()
+
+
+###################################################################################################
+# do_ledPowerBudget(seconds, budget_mA, brightness) - print the report
+#
+def do_ledPowerBudget(seconds, budget_mA, brightness):
+    load_header_values()
+    if brightness is None:
+        brightness = HDR["BRIGHTMAX"]
+    handle_mW = handle_led_peak_mW()
+    budget_mW = budget_mA * HDR["volts"]
+
+    print("LED power estimate: %d disk LEDs + 1 handle LED, BRIGHTMAX %d, gRed_mW %d gGreen_mW %d gBlue_mW %d gDark_mW %d, %d seconds per pattern" %
+          (HDR["NUM_LEDS_PER_DISK"], brightness, HDR["gRed_mW"], HDR["gGreen_mW"], HDR["gBlue_mW"], HDR["gDark_mW"], seconds))
+    print("")
+    print("%-8s %-36s %10s %10s %12s" % ("pattern", "name", "peak mA", "avg mA", "max bright"))
+    results = {}
+    for pattern in ALL_PATTERNS:
+        results[pattern] = run_pattern(pattern, seconds)
+        total_peak_mW = results[pattern]["peak_mW"] + handle_mW
+        max_bright = min(255, int(budget_mW * 256 / total_peak_mW))
+        results[pattern]["max_bright"] = max_bright
+        print("%-8d %-36s %10.1f %10.1f %12d" % (pattern, PATTERN_NAMES[pattern],
+                                                 mW_to_mA(total_peak_mW, brightness),
+                                                 mW_to_mA(results[pattern]["avg_mW"] + handle_mW, brightness),
+                                                 max_bright))
+
+    print("")
+    print("efctLED configuration choices (lookupLEDpatternTbl):")
+    print("%-8s %-7s %-8s %10s %10s" % ("type", "choice", "pattern", "peak mA", "avg mA"))
+    worst = 0
+    for efctType, maxChoice in enumerate(HDR["cfgMaxLEDForType"]):
+        for choice in range(1, maxChoice + 1):
+            pattern = HDR["lookupLEDpatternTbl"][efctType * 10 + choice - 1]
+            if pattern not in results:
+                pattern = HDR["mEFCT_PTRNLED_OFF"]
+            worst = max(worst, results[pattern]["peak_mW"] + handle_mW)
+            print("%-8s %-7d %-8d %10.1f %10.1f" % (EFFECT_TYPE_NAMES[efctType], choice, pattern,
+                                                    mW_to_mA(results[pattern]["peak_mW"] + handle_mW, brightness),
+                                                    mW_to_mA(results[pattern]["avg_mW"] + handle_mW, brightness)))
+
+    print("")
+    print("worst-case peak at BRIGHTMAX %d: %.1f mA" % (brightness, mW_to_mA(worst, brightness)))
+    print("highest BRIGHTMAX with peak under %d mA for all configurable patterns: %d" %
+          (budget_mA, min(255, int(budget_mW * 256 / worst))))
+    return results
+# end do_ledPowerBudget()
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(prog='ledPowerBudget',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="estimate peak and average LED current for each RBG LED pattern\n" +
+                    "   emulates the doPattern() frames and uses the FastLED mW-per-channel constants from RBG_SciFi_LEDs.h",
+        epilog="""Example:
+python ledPowerBudget.py --budget_mA 1000
+""",
+        usage='%(prog)s [--seconds secs] [--budget_mA mA] [--brightness BRIGHTMAX]')
+    my_parser.add_argument('--seconds', type=int, default=20, help='seconds of each pattern to emulate (default 20)')
+    my_parser.add_argument('--budget_mA', type=int, default=1000, help='current budget for the LEDs in mA (default 1000)')
+    my_parser.add_argument('--brightness', type=int, default=None, help='brightness to report at (default BRIGHTMAX from RBG_SciFi_LEDs.h)')
+    args = my_parser.parse_args()
+
+    do_ledPowerBudget(args.seconds, args.budget_mA, args.brightness)
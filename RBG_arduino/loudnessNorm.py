@@ -0,0 +1,190 @@
+# loudnessNorm.py - make all the RBG sounds about equally loud before they go on the SD card
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# The firmware sets one YX5200 volume per effect (efctSound >> mSHIFT_EFCT_SND_VOL & mMASK_EFCT_SND_VOL,
+#    usually mDEFAULT_EFCT_SND_VOL) but the source clips were recorded at very different levels,
+#    so a given volume setting is loud for one sound and quiet for the next.
+# This normalizes the numbered sounds (####_*.wav or ###.wav, see soundFiles.py) to one RMS level, in two passes:
+#    pass 1 - measure RMS and peak of each clip, reading it in chunks; clips are spread over a process pool
+#    pass 2 - write each clip to outdir with its gain applied, again in chunks
+# The gain is limited so the peak stays under --ceiling_db (never clips) and under --max_gain_db
+#    (so near-silent clips such as the silence file are not pumped up); clips quieter than --floor_db are copied at 0 dB.
+# Output is what the YX5200 plays: PCM 16-bit, mono or stereo as the input, at one of its sample rates;
+#    files at other sample rates are reported and not written.
+# A per-slot gain report (CSV) lists what was done to each sound number.
+#
+# Run copyem.py on outdir afterwards, exactly as on the original directory (copy Attributions.html there too).
+#
+
+import argparse
+import concurrent.futures
+import csv
+import math
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+import robotVoice
+import soundFiles
+
+YX5200_RATES = (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000)
+CHUNK_FRAMES = 64 * 1024
+REPORT_COLUMNS = ("num", "file", "rate", "channels", "seconds", "rms_db", "peak_db", "gain_db",
+                  "limited_by", "out_rms_db", "out_peak_db", "status")
+
+
+def to_db(value):
+    return 20.0 * math.log10(value) if value > 0 else -math.inf
+
+def wav_chunks(fname):
+    # yields float64 arrays of shape (frames, channels); a partial frame at the end of a truncated file is dropped
+    with wave.open(fname, 'rb') as wobj:
+        channels, sampwidth = wobj.getnchannels(), wobj.getsampwidth()
+        while True:
+            raw = wobj.readframes(CHUNK_FRAMES)
+            raw = raw[:len(raw) - len(raw) % (channels * sampwidth)]
+            if 0 == len(raw):
+                break
+            yield robotVoice.pcm_to_float(raw, sampwidth).reshape(-1, channels)
+
+
+###################################################################################################
+# measure_file(fname) - pass 1; returns a dict with rate, channels, frames, rms, peak or error
+#
+def measure_file(fname):
+    result = {"file": fname}
+    try:
+        with wave.open(fname, 'rb') as wobj:
+            result.update(rate=wobj.getframerate(), channels=wobj.getnchannels())
+        sumSquares = 0.0
+        numSamples = 0
+        peak = 0.0
+        for chunk in wav_chunks(fname):
+            sumSquares += float(np.dot(chunk.ravel(), chunk.ravel()))
+            numSamples += chunk.size
+            peak = max(peak, float(np.max(np.abs(chunk))))
+        result.update(frames=numSamples // result["channels"], peak=peak,
+                      rms=math.sqrt(sumSquares / numSamples) if numSamples else 0.0)
+    except (wave.Error, EOFError, OSError, KeyError, ValueError) as err:
+        result["error"] = "cannot read: %s" % (err or err.__class__.__name__)
+    return result
+
+def choose_gain(meas, targetDb, ceilingDb, maxGainDb, floorDb):
+    """choose_gain - gain in dB for one measured clip
+    :return: (gain dB, what limited it: "" "ceiling" "max_gain" or "floor")
+    """
+    rmsDb = to_db(meas["rms"])
+    if rmsDb < floorDb:
+        return 0.0, "floor"
+    gainDb = targetDb - rmsDb
+    limitedBy = ""
+    if gainDb > maxGainDb:
+        gainDb, limitedBy = maxGainDb, "max_gain"
+    if to_db(meas["peak"]) + gainDb > ceilingDb:
+        gainDb, limitedBy = ceilingDb - to_db(meas["peak"]), "ceiling"
+    return gainDb, limitedBy
+
+
+###################################################################################################
+# write_file(infname, outfname, gainDb) - pass 2; returns (out rms, out peak)
+#
+def write_file(infname, outfname, gainDb):
+    gain = 10.0 ** (gainDb / 20.0)
+    sumSquares = 0.0
+    numSamples = 0
+    peak = 0.0
+    tmpfname = "%s.%d.tmp" % (outfname, os.getpid())
+    with wave.open(infname, 'rb') as wobj:
+        channels, rate = wobj.getnchannels(), wobj.getframerate()
+    try:
+        with wave.open(tmpfname, 'wb') as wout:
+            wout.setnchannels(channels)
+            wout.setsampwidth(2)
+            wout.setframerate(rate)
+            for chunk in wav_chunks(infname):
+                chunk = np.clip(chunk * gain, -1.0, 32767.0 / 32768.0)
+                sumSquares += float(np.dot(chunk.ravel(), chunk.ravel()))
+                numSamples += chunk.size
+                peak = max(peak, float(np.max(np.abs(chunk))))
+                wout.writeframes(robotVoice.float_to_pcm16(chunk))
+        os.replace(tmpfname, outfname)
+    finally:
+        if os.path.exists(tmpfname):
+            os.remove(tmpfname)
+    return (math.sqrt(sumSquares / numSamples) if numSamples else 0.0), peak
+
+
+def normalize(indir, outdir, targetDb, ceilingDb, maxGainDb, floorDb, numJobs=None):
+    """normalize - both passes over all numbered sounds in indir
+    :return: list of report row dicts, one per sound number in order
+    """
+    sounds = soundFiles.find_sound_files(indir)
+    os.makedirs(outdir, exist_ok=True)
+    report = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=numJobs) as executor:
+        measured = dict(zip(sounds, executor.map(measure_file, sounds.values())))
+        futures = {}
+        for num, meas in sorted(measured.items()):
+            row = dict.fromkeys(REPORT_COLUMNS, "")
+            row.update(num=num, file=os.path.basename(meas["file"]))
+            report.append(row)
+            if "error" in meas:
+                row["status"] = meas["error"]
+                continue
+            row.update(rate=meas["rate"], channels=meas["channels"], seconds="%.3f" % (meas["frames"] / meas["rate"]),
+                       rms_db="%.1f" % to_db(meas["rms"]), peak_db="%.1f" % to_db(meas["peak"]))
+            if meas["rate"] not in YX5200_RATES:
+                row["status"] = "sample rate not supported by YX5200 - not written"
+                continue
+            gainDb, row["limited_by"] = choose_gain(meas, targetDb, ceilingDb, maxGainDb, floorDb)
+            row["gain_db"] = "%.1f" % gainDb
+            futures[num] = executor.submit(write_file, meas["file"], os.path.join(outdir, row["file"]), gainDb)
+        for row in report:
+            if row["num"] in futures:
+                try:
+                    outRms, outPeak = futures[row["num"]].result()
+                except (wave.Error, EOFError, OSError, KeyError, ValueError) as err:
+                    row["status"] = "cannot write: %s" % (err or err.__class__.__name__)  # the other files still are
+                    continue
+                row.update(out_rms_db="%.1f" % to_db(outRms), out_peak_db="%.1f" % to_db(outPeak), status="ok")
+    return report
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(prog='loudnessNorm',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="normalize the loudness of all numbered RBG sounds so one YX5200 volume setting fits all\n" +
+                    "   writes gain-adjusted PCM 16-bit WAVs to outdir and a per-slot gain report",
+        epilog="""Example:
+python loudnessNorm.py D:/svnNew/SoundsSciFi/SoundsRecordedMDO/secondCut ./normalized
+python copyem.py -d ./normalized -s H: -f 0069__mdo47__silence.wav --linux
+""",
+        usage='%(prog)s [--target_db DB] [--ceiling_db DB] [--max_gain_db DB] [--floor_db DB] [--report CSV] [--jobs N] indir outdir')
+    my_parser.add_argument('indir', type=str, help='directory with ####_*.wav or ###.wav sounds')
+    my_parser.add_argument('outdir', type=str, help='directory for the normalized sounds (same file names)')
+    my_parser.add_argument('--target_db', type=float, default=-20.0, help='target RMS level in dBFS (default -20)')
+    my_parser.add_argument('--ceiling_db', type=float, default=-1.0, help='highest allowed peak in dBFS (default -1)')
+    my_parser.add_argument('--max_gain_db', type=float, default=20.0, help='most gain applied to a clip (default 20)')
+    my_parser.add_argument('--floor_db', type=float, default=-60.0, help='clips with RMS below this are left alone (default -60)')
+    my_parser.add_argument('--report', type=str, default="loudnessReport.csv", help='per-slot gain report CSV (default loudnessReport.csv)')
+    my_parser.add_argument('--jobs', type=int, default=None, help='parallel jobs (default number of CPUs)')
+    args = my_parser.parse_args()
+
+    startTime = time.time()
+    report = normalize(args.indir, args.outdir, args.target_db, args.ceiling_db, args.max_gain_db, args.floor_db, args.jobs)
+    with open(args.report, 'wt', newline='') as fobj:
+        writer = csv.DictWriter(fobj, fieldnames=REPORT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(report)
+    for row in report:
+        print("%03d %-50s rms %6s peak %6s gain %6s %-9s %s" % (row["num"], row["file"][:50], row["rms_db"],
+                                                               row["peak_db"], row["gain_db"], row["limited_by"], row["status"]))
+    numBad = len([row for row in report if "ok" != row["status"]])
+    sys.stderr.write("%d sounds, %d not written, in %.1f seconds\n" % (len(report), numBad, time.time() - startTime))
+    if numBad:
+        sys.exit(1)
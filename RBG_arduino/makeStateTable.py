@@ -4,15 +4,31 @@
 # RBG - A high-tech imagining of the rubber band gun
 #
 # This program will read a spreadsheet with info to be encoded into the state table for RBG_SciFi.ino
+#
+# The C code is built in memory. With no options it goes to stdout, as it always has.
+#    --out FILE writes it to FILE, and --outdir DIR writes it as three headers (see SPLIT_FNAMES) for the defines,
+#    the RBGStateTable_t struct and myStateTable[]. Either way a file is only rewritten when its contents change,
+#    so an unchanged header keeps its timestamp and the Arduino build does not recompile because of it.
+# --minimize merges state decision blocks that behave the same (see minimize_state_table) and reports the rows saved;
+#    fewer rows is less PROGMEM and fewer rows for RBG_waitForInput() to copy out of flash.
 
 import pandas as pd
+import argparse
 import copy
+import os
+import re
 import sys
 
+import rbgProfile
+
 from makeStateTable_dict import *
 
 DEBUGflag = False  # global debug flag
 
+XLSX_FNAME = r'd:/GitHub-Mark-MDO47/RubberBandGun/RBG_arduino/StateTable_minimal.xlsx'
+SPLIT_FNAMES = {"defines": "myStateTable_defines.h", "struct": "myStateTable_struct.h", "table": "myStateTable_table.h"}
+POSITION_HANDLERS = ("mSPCL_HANDLER_CFG2STORAGESKIP", "mSPCL_HANDLER_CFG2CPYRST", "mSPCL_HANDLER_CFG2ADVNCD") # go to tableRow + choice
+
 def print_debug(the_str):
     """only prints if DEBUGflag is true
     :param the_str: string to print
@@ -21,6 +37,36 @@ def print_debug(the_str):
         print("%s" % the_str)
 
 
+def emitter(buffer):
+    """emitter - make a function used like print() that appends to buffer instead of writing to stdout
+    :param buffer: list of strings
+    :return: emit(text, end="\\n")
+    """
+    def emit(text="", end="\n"):
+        buffer.append(text + end)
+    return emit
+
+
+def write_if_changed(fname, text):
+    """write_if_changed - write text to fname unless fname already holds exactly that text
+    The file is written under a temporary name and renamed over the old one, so nothing ever sees half a header.
+    :param fname: path of file to write
+    :param text: complete contents
+    :return: True if written, False if it was already the same
+    """
+    try:
+        with open(fname, 'rt', newline='') as fobj:
+            if fobj.read() == text:
+                return False
+    except OSError:
+        pass
+    tmpfname = "%s.%d.tmp" % (fname, os.getpid())
+    with open(tmpfname, 'wt', newline='') as fobj:
+        fobj.write(text)
+    os.replace(tmpfname, fname)
+    return True
+
+
 def mark_end_block(curr_symb, curr_state_table_idx):
     """mark_end_block on curr_symb with curr_state_table_idx
     :param curr_symb: string for current symbol
@@ -79,6 +125,83 @@ def complete_block_field():
         if 0 == len(STATETABLE[idx]["blkFlags"]):
             STATETABLE[idx]["blkFlags"] = "mZERO"
 
+def minimize_state_table():
+    """minimize_state_table - merge state decision blocks that behave the same
+    Two blocks are the same if they have the same rows apart from the gotos, and each goto leads to blocks that are
+    the same; found by partition refinement (start with blocks grouped by their rows without the gotos, split groups
+    whose gotos lead to different groups, repeat until nothing splits). A goto to its own block stays distinct from a
+    goto to another block, and a group where one block goes to another block of the same group is split up, because
+    RBG_processStateTable() only restarts the effects when the row changes.
+    Blocks reached or left by position are never merged: blocks that no goto names (the *_SKIP* rows) and blocks
+    with a mSPCL_HANDLER_CFG2STORAGESKIP, _CFG2CPYRST or _CFG2ADVNCD row, which go to myState.tableRow + choice,
+    so the rows after them matter as much as their own.
+    Each group keeps its first block; the others are removed, every goto is remapped to the kept block and
+    SYMBTABLE points the removed symbols at it, so their #define mROW_* still compiles. mROW_POWERON stays at row 0.
+    :return: dict of removed symbol -> symbol of the block it was merged into
+    """
+    global SYMBTABLE
+    global STATETABLE
+    gotos = ("gotoOnInput", "gotoWithoutInput")
+    blocks = list(SYMBTABLE.keys())
+    blockRows = {symb: [STATETABLE[idx] for idx in range(SYMBTABLE[symb]["blockStart"], SYMBTABLE[symb]["blockEnd"] + 1)]
+                 for symb in blocks}
+
+    def renumber(signatures):
+        numbers = {}
+        return {symb: numbers.setdefault(signatures[symb], len(numbers)) for symb in blocks}
+
+    named = set(row[key] for symb in blocks for row in blockRows[symb] for key in gotos)
+    skips = set(symb for symb in blocks for row in blockRows[symb]
+                if set(re.findall(r'\w+', str(row["SPECIAL"]))) & set(POSITION_HANDLERS))
+    group = renumber({symb: tuple(tuple((key, row[key]) for key in row if key not in gotos + ("index",))
+                                  for row in blockRows[symb]) if (symb in named) and (symb not in skips) else ("by position", symb)
+                      for symb in blocks})
+    while True:
+        numGroups = len(set(group.values()))
+        group = renumber({symb: (group[symb],) + tuple("self" if symb == row[key] else group.get(row[key], row[key])
+                                                      for row in blockRows[symb] for key in gotos) for symb in blocks})
+        if len(set(group.values())) != numGroups:
+            continue
+        split = set()
+        for symb in blocks:
+            for row in blockRows[symb]:
+                for key in gotos:
+                    if (row[key] != symb) and (group.get(row[key]) == group[symb]):
+                        split.add(group[symb])
+        if 0 == len(split):
+            break
+        for symb in blocks:
+            if group[symb] in split:
+                group[symb] = ("alone", symb)
+        group = renumber(group)
+
+    kept = {}
+    merged = {}
+    for symb in blocks:
+        if group[symb] in kept:
+            merged[symb] = kept[group[symb]]
+        else:
+            kept[group[symb]] = symb
+    if 0 == len(merged):
+        return merged
+
+    newTable = {}
+    for symb in blocks:
+        if symb in merged:
+            continue
+        SYMBTABLE[symb]["blockStart"] = len(newTable)
+        for row in blockRows[symb]:
+            for key in gotos:
+                row[key] = merged.get(row[key], row[key])
+            newTable[len(newTable)] = row
+        SYMBTABLE[symb]["blockEnd"] = len(newTable) - 1
+    for symb in merged:
+        SYMBTABLE[symb] = copy.deepcopy(SYMBTABLE[merged[symb]])
+    STATETABLE.clear()
+    STATETABLE.update(newTable)
+    return merged
+
+
 # COLTOINDEX = {"index": -1, "SPECIAL": -1, "efctSound": -1, "efctLED": -1, "inputRBG": -1, "storeVal": -1,
 #               "storeAddr": -1, "gotoOnInput": -1, "gotoWithoutInput": -1}
 # STATETABLEROW = {"blkFlags": "", "SPECIAL": "", "efctSound": "", "efctLED": "", "inputRBG": "",
@@ -109,14 +232,18 @@ def fill_state_table_pass1(row, state_idx):
             STATETABLE[state_idx][key] = row_text
 
 
-def make_state_table():
-    """make_state_table then print info"""
+def make_state_table(xlsx=XLSX_FNAME, outfname=None, outdir=None, minimize=False):
+    """make_state_table then print info
+    :param xlsx: path to the spreadsheet with the StateTable sheet
+    :param minimize: merge equivalent blocks (see minimize_state_table) and report the rows saved on stderr
+    """
     global SYMBTABLE
     global STATETABLE
     global COLTOINDEX
 
     # Import the excel file
-    xls_file = pd.ExcelFile(r'd:/GitHub-Mark-MDO47/RubberBandGun/RBG_arduino/StateTable_minimal.xlsx')
+    rbgProfile.lap("xlsx load")
+    xls_file = pd.ExcelFile(xlsx)
     idx = xls_file.sheet_names.index('StateTable')
     df = xls_file.parse(xls_file.sheet_names[idx])
 
@@ -126,6 +253,7 @@ def make_state_table():
         COLTOINDEX[col] = df_col_names.index(col)
 
     # Pass 1 - read through excel file and get symbol table
+    rbgProfile.lap("pass 1")
     statetable_idx = -1  # this will be index into state table we are building
     symbtable_current = ""  # zero length means not processing any state decision block
     for row_num, row in df.iterrows():
@@ -165,6 +293,16 @@ def make_state_table():
             separator = ""
         STATETABLE[SYMBTABLE[symb]['blockEnd']]['blkFlags'] += separator + "mBLOCKEND"
 
+    if minimize:
+        rbgProfile.lap("minimize")
+        numRows = len(STATETABLE)
+        merged = minimize_state_table()
+        rowBytes = 2 * (len(COLTOSTRUCT) - 1)  # uint16_t per field; index is not in the struct
+        for symb in merged:
+            sys.stderr.write("minimize: %s merged into %s\n" % (symb, merged[symb]))
+        sys.stderr.write("minimize: %d blocks merged, myStateTable %d -> %d rows, %d bytes saved\n" %
+                         (len(merged), numRows, len(STATETABLE), (numRows - len(STATETABLE)) * rowBytes))
+
     print_debug("Pass 1 SYMBTABLE")
     print_debug("  %s" % SYMBTABLE)
     for symb in SYMBTABLE:
@@ -195,6 +333,7 @@ def make_state_table():
             print_debug("  %s %s %d" % (efct, symb, found_effects[efct][symb]))
 
     # Pass 2
+    rbgProfile.lap("pass 2")
 
     # collect found symbols from either goto column
     # just for sanity's sake I want them in numerical order
@@ -218,7 +357,10 @@ def make_state_table():
            found_symbols.append(symb.split(",")[1])
 
 
-    print("\n// define the symbols - general use symbols:"
+    rbgProfile.lap("emit")
+    parts = {"defines": [], "struct": [], "table": []}  # the header is built in memory, in pieces that can be separate files
+    emit = emitter(parts["defines"])
+    emit("\n// define the symbols - general use symbols:"
           + "\n#define mUNDEFINED 254"
           + "\n#define mNONE 255"
           + "\n#define mZERO 0"
@@ -271,14 +413,14 @@ def make_state_table():
             print_debug("  %s is valid" % key)
         elif key in SYMBTABLE.keys():
             print_debug("  %s in SYMBTABLE" % key)
-            print("#define %s %d" % (key, SYMBTABLE[key]["blockStart"]))
+            emit("#define %s %d" % (key, SYMBTABLE[key]["blockStart"]))
         else:
             print_debug("  ERROR - %s not in SYMBTABLE" % key)
-            print("#define %s mUNDEFINED" % key)
-    print("\n// define the effect number ranges - must be divisible by 10")
+            emit("#define %s mUNDEFINED" % key)
+    emit("\n// define the effect number ranges - must be divisible by 10")
     for key in EFFECT_MAP:
-        print("#define %s %*d %s" %(key, 20-len(key), EFFECT_MAP[key][0], EFFECT_MAP[key][1]))
-    print("\n")
+        emit("#define %s %*d %s" %(key, 20-len(key), EFFECT_MAP[key][0], EFFECT_MAP[key][1]))
+    emit("\n")
 
 
     known_effects = {"mNONE": 0xFF}
@@ -287,44 +429,81 @@ def make_state_table():
 
     complete_block_field()
 
-    print("typedef struct _RBGStateTable_t {")
+    emit = emitter(parts["struct"])
+    emit("typedef struct _RBGStateTable_t {")
     for key in COLTOSTRUCT:
         if key != "index":
-            print("%s" % COLTOSTRUCT[key])
-    print("} RBGStateTable_t;")
+            emit("%s" % COLTOSTRUCT[key])
+    emit("} RBGStateTable_t;")
 
+    emit = emitter(parts["table"])
     ### first the old way; curiously, Microsoft Visual Studio Community Edition 2019 in Console App wants the old way
-    print("\n// now the old way so can debug in Microsoft Visual Studio Community Edition 2019 in Console App")
+    emit("\n// now the old way so can debug in Microsoft Visual Studio Community Edition 2019 in Console App")
     len_statetable = len(STATETABLE)
     len_statetablekeys = len(STATETABLE[0])
-    print("static const RBGStateTable_t myStateTable[%d]" % len_statetable)
-    print("#if USE_PROGMEM")
-    print("  PROGMEM")
-    print("#endif // end USE_PROGMEM")
-    print("  = {")
+    emit("static const RBGStateTable_t myStateTable[%d]" % len_statetable)
+    emit("#if USE_PROGMEM")
+    emit("  PROGMEM")
+    emit("#endif // end USE_PROGMEM")
+    emit("  = {")
     for idx in range(len_statetable):
-        sys.stdout.write("      { /* row %d %s */ " % (idx, STATETABLE[idx]["index"]))
+        emit("      { /* row %d %s */ " % (idx, STATETABLE[idx]["index"]), end="")
         for count, key in enumerate(STATETABLE[idx]):
             if key != "index":
-                sys.stdout.write(" %s," % (STATETABLE[idx][key]))
-        print(" },")  # C is no longer picky about the last comma
-    print("}; // end definition of myStateTable[]")
-
-    print("\n// now the new way")
-    print("static const RBGStateTable_t myStateTable[%d]" % len_statetable)
-    print("#if USE_PROGMEM")
-    print("  PROGMEM")
-    print("#endif // end USE_PROGMEM")
-    print("  = {")
+                emit(" %s," % (STATETABLE[idx][key]), end="")
+        emit(" },")  # C is no longer picky about the last comma
+    emit("}; // end definition of myStateTable[]")
+
+    emit("\n// now the new way")
+    emit("static const RBGStateTable_t myStateTable[%d]" % len_statetable)
+    emit("#if USE_PROGMEM")
+    emit("  PROGMEM")
+    emit("#endif // end USE_PROGMEM")
+    emit("  = {")
     for idx in range(len_statetable):
-        sys.stdout.write("      { /* row %d %s */ " % (idx, STATETABLE[idx]["index"]))
+        emit("      { /* row %d %s */ " % (idx, STATETABLE[idx]["index"]), end="")
         for count, key in enumerate(STATETABLE[idx]):
             if key != "index":
-                sys.stdout.write(" .%s=%s," % (key, STATETABLE[idx][key]))
+                emit(" .%s=%s," % (key, STATETABLE[idx][key]), end="")
             # print("         %s, // %s" % (STATETABLE[idx][key], key))
-        print(" },")  # C is no longer picky about the last comma
-    print("}; // end definition of myStateTable[]")
+        emit(" },")  # C is no longer picky about the last comma
+    emit("}; // end definition of myStateTable[]")
+
+    rbgProfile.lap("write")
+    parts = {name: "".join(buffer) for name, buffer in parts.items()}
+    if (outfname is None) and (outdir is None):
+        sys.stdout.write("".join(parts.values()))
+    written = []
+    if outfname is not None:
+        written.append((outfname, write_if_changed(outfname, "".join(parts.values()))))
+    if outdir is not None:
+        for name, text in parts.items():
+            fname = os.path.join(outdir, SPLIT_FNAMES[name])
+            written.append((fname, write_if_changed(fname, text)))
+    for fname, changed in written:
+        sys.stderr.write("%s %s\n" % ("wrote    " if changed else "unchanged", fname))
+    rbgProfile.stop()
+    return parts
 
 
 if __name__ == "__main__":
-    make_state_table()
+    rbgProfile.setup("makeStateTable")
+    my_parser = argparse.ArgumentParser(prog='makeStateTable',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="read the state table spreadsheet and generate the myStateTable[] C code for RBG_SciFi.ino\n" +
+                    "   on stdout, or into header file(s) that are only rewritten when their contents change",
+        epilog="""Example:
+python makeStateTable.py StateTable_minimal.xlsx > myStateTable.h
+python makeStateTable.py StateTable_minimal.xlsx --out myStateTable.h
+python makeStateTable.py StateTable_minimal.xlsx --outdir RBG_SciFi
+   (writes %s)
+python makeStateTable.py StateTable_minimal.xlsx --minimize --out myStateTable.h
+""" % " ".join(SPLIT_FNAMES.values()),
+        usage='%(prog)s [--out FILE] [--outdir DIR] [--minimize] [xlsx]')
+    my_parser.add_argument('xlsx', type=str, nargs='?', default=XLSX_FNAME, help='path to the state table spreadsheet')
+    my_parser.add_argument('--out', type=str, default=None, help='write the whole header to this file instead of stdout')
+    my_parser.add_argument('--outdir', type=str, default=None, help='write the defines, struct and table as separate headers in this directory')
+    my_parser.add_argument('--minimize', action='store_true', help='merge state decision blocks that behave the same; rows saved go to stderr')
+    args = my_parser.parse_args()
+
+    make_state_table(args.xlsx, args.out, args.outdir, args.minimize)
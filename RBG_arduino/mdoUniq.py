@@ -6,38 +6,133 @@
 # Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
 # RBG - A high-tech imagining of the rubber band gun
 #
+# Each line is stripped, then compared using only the part from "start string" up to "end string"
+#    (if start string is not found we use the start of line; if end string is not found we use the end of line).
+#
+# Serial monitor captures from soak tests can be many gigabytes, so the file is read in large blocks
+#    and the output is written one batch at a time instead of one print() per line.
+#
+# --window N: a line is dropped if its compare part was seen in any of the previous N lines.
+#    This collapses the interleaved repeated debug lines (RBG_waitForInput etc.) that plain uniq misses.
+#    Memory is bounded to the last N lines. --window 1 (the default) is the original behavior:
+#    compare with the previous line only.
+#
 
 import sys
-# import io
-
-argFname = 1
-argStart = 2
-argEnd   = 3
-
-prevLine = ""
-
-if len(sys.argv) != 4:
-   print('USAGE: fname "start string" "end string"')
-   exit(0)
-
-fobj = open(sys.argv[argFname], 'rt')
-# print("DEBUG - open %s" % sys.argv[argFname])
-theLine = fobj.readline()
-# print("DEBUG - first line |%s|" % theLine)
-while "" != theLine: # null string means EOF
-   theLine = theLine.strip()
-   # print("DEBUG - line.strip() |%s|" % theLine)
-   nStart = theLine.find(sys.argv[argStart])
-   nEnd = theLine.find(sys.argv[argEnd])
-   if (-1 == nStart):
-      nStart = 0
-   if (-1 == nEnd):
-      nEnd = len(theLine)
-   if prevLine != theLine[nStart:nEnd]:
-      print("%s" % theLine)
-   # else:
-   # print("strt:%d end:%d entire|%s| prev|%s| this|%s|" % (nStart, nEnd, theLine, prevLine, theLine[nStart:nEnd]))
-   prevLine = theLine[nStart:nEnd]
-   # read the next line
-   theLine = fobj.readline()
-fobj.close()
+import argparse
+import collections
+
+import rbgProfile
+
+BLOCKSIZE = 16 * 1024 * 1024 # characters per read
+
+
+###################################################################################################
+# open_text_in(fname) - open fname for reading text; "-" means stdin
+#
+def open_text_in(fname):
+   if "-" == fname:
+      return open(sys.stdin.fileno(), 'rt', errors='replace', closefd=False)
+   return open(fname, 'rt', errors='replace')
+
+###################################################################################################
+# read_line_batches(fname, blocksize) - generator: lists of lines (without line endings) read in large blocks
+#
+# fname - path to file; "-" means stdin
+#
+def read_line_batches(fname, blocksize=BLOCKSIZE):
+   fobj = open_text_in(fname)
+   leftover = ""
+   while True:
+      block = fobj.read(blocksize)
+      if "" == block: # null string means EOF
+         break
+      lines = (leftover + block).split("\n")
+      leftover = lines.pop() # partial line, finish it with the next block
+      yield lines
+   if "" != leftover:
+      yield [leftover]
+   if fobj is not sys.stdin:
+      fobj.close()
+
+###################################################################################################
+# write_line_batches(batches, fobj) - one write per batch of lines
+#
+def write_line_batches(batches, fobj=None):
+   if fobj is None:
+      fobj = sys.stdout
+   for batch in batches:
+      if 0 != len(batch):
+         fobj.write("\n".join(batch) + "\n")
+   fobj.flush()
+
+###################################################################################################
+# uniq_batches(batches, strStart, strEnd, window) - generator: mdoUniq applied to batches of lines
+#
+# batches  - iterable of lists of lines
+# strStart - compare starts here in the line (or start of line)
+# strEnd   - compare ends here in the line (or end of line)
+# window   - drop a line if its compare part matches any of the previous window lines
+#
+# yields lists of stripped lines that survive
+#
+def uniq_batches(batches, strStart, strEnd, window=1):
+   prevLine = ""
+   lastSeen = collections.OrderedDict() # compare part -> line number last seen; only used if window > 1
+   lineNum = 0
+   for batch in batches:
+      output = []
+      append = output.append
+      for theLine in batch:
+         theLine = theLine.strip()
+         nStart = theLine.find(strStart)
+         nEnd = theLine.find(strEnd)
+         if (-1 == nStart):
+            nStart = 0
+         if (-1 == nEnd):
+            nEnd = len(theLine)
+         theKey = theLine[nStart:nEnd]
+         if 1 >= window:
+            if prevLine != theKey:
+               append(theLine)
+            prevLine = theKey
+         else:
+            lineNum += 1
+            if theKey in lastSeen:
+               lastSeen.move_to_end(theKey)
+            else:
+               append(theLine)
+            lastSeen[theKey] = lineNum
+            # forget anything not seen within the window
+            while lastSeen and (next(iter(lastSeen.values())) <= lineNum - window):
+               lastSeen.popitem(last=False)
+      yield output
+# end uniq_batches()
+
+###################################################################################################
+# mdoUniq(fname, strStart, strEnd, window) - stdout receives the unique lines of fname
+#
+def mdoUniq(fname, strStart, strEnd, window=1):
+   rbgProfile.lap("uniq") # read, compare and write are interleaved generators, so this is one phase
+   write_line_batches(uniq_batches(read_line_batches(fname), strStart, strEnd, window))
+   rbgProfile.stop()
+
+
+if __name__ == "__main__":
+   rbgProfile.setup("mdoUniq")
+   my_parser = argparse.ArgumentParser(prog='mdoUniq',
+      formatter_class=argparse.RawTextHelpFormatter,
+      description="stdout receives lines of fname that differ from the previous line(s),\n" +
+                  "   comparing only the part of the (stripped) line between \"start string\" and \"end string\"",
+      epilog="""Example:
+python mdoUniq.py serial.log "RBG_waitForInput" "loopCount" > serial_uniq.log
+python mdoUniq.py --window 50 - "DEBUG" "loopCount" < serial.log > serial_uniq.log
+""",
+      usage='%(prog)s [--window N] fname "start string" "end string"')
+   my_parser.add_argument('fname', type=str, help='path to input file; - for stdin')
+   my_parser.add_argument('start', type=str, help='compare starts at this string (or start of line)')
+   my_parser.add_argument('end', type=str, help='compare ends at this string (or end of line)')
+   my_parser.add_argument('--window', type=int, default=1, help='drop line if seen within the last N lines (default 1 = previous line only)')
+   args = my_parser.parse_args()
+
+   mdoUniq(args.fname, args.start, args.end, args.window)
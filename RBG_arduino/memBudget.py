@@ -0,0 +1,455 @@
+# memBudget.py - estimate the SRAM and flash taken by the RBG_SciFi data and fail if it is over budget
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# The Arduino Nano (ATmega328P) has 2048 bytes of SRAM and 32 Kbytes of flash, 2 Kbytes of which hold the bootloader.
+#    Every row added to StateTable_minimal.xlsx makes myStateTable[] bigger, and SRAM not used by variables is the stack.
+# This reads the sketch sources as the compiler sees them (after #if/#else with the current #defines) and sizes
+#    every global and static variable: myStateTable[], its RAM copies procRow/waitRow/loopRow, led_display[] and the
+#    other CRGB arrays, myState, the DFPlayer object and so on. Structs and classes are sized from their definitions;
+#    AVR has no alignment padding and pointers are 2 bytes.
+# Where each one goes:
+#    PROGMEM                 - flash only
+#    initialized, not zero   - SRAM (.data) and its initial value in flash
+#    not initialized or zero - SRAM (.bss)
+#    const scalars           - nothing; the compiler uses the value directly
+#    F("...") strings        - flash only
+#    other string literals   - SRAM and flash (identical literals are merged by the compiler)
+# Objects inside libraries (Serial buffers, SoftwareSerial, FastLED controllers, millis()) are added from LIBRARY_RAM;
+#    those are estimates from the AVR library sources.
+# Program code is not estimated; give --code_bytes (the "Sketch uses" number from the last Arduino build less
+#    the flash total printed here) to include it in the flash check.
+#
+# The state table (struct and rows) comes from --table, normally the output of makeStateTable.py, so a table edit
+#    can be checked before it is pasted into RBG_SciFi_StatesAndInputs.h. Exit status is 1 if over budget.
+#
+
+import argparse
+import math
+import os
+import re
+import sys
+
+import parseRBGheaders
+
+FNAME_DFPLAYER_H = os.path.join(parseRBGheaders.RBG_SCIFI_DIR, "DFRobotDFPlayerMini.h")
+FNAME_DFPLAYER_CPP = os.path.join(parseRBGheaders.RBG_SCIFI_DIR, "DFRobotDFPlayerMini.cpp")
+SOURCES = (parseRBGheaders.FNAME_STATES_H, parseRBGheaders.FNAME_LEDS_H, FNAME_DFPLAYER_H,
+           parseRBGheaders.FNAME_INO, FNAME_DFPLAYER_CPP)
+
+SRAM_SIZE = 2048
+FLASH_SIZE = 32768 - 2048  # less the bootloader
+STACK_RESERVE = 512        # default SRAM budget leaves this much for the stack
+POINTER_SIZE = 2
+
+TYPE_SIZES = {"char": 1, "unsigned char": 1, "signed char": 1, "uint8_t": 1, "int8_t": 1, "bool": 1, "boolean": 1, "byte": 1,
+              "uint16_t": 2, "int16_t": 2, "int": 2, "unsigned": 2, "unsigned int": 2, "short": 2, "unsigned short": 2, "word": 2,
+              "uint32_t": 4, "int32_t": 4, "long": 4, "unsigned long": 4, "float": 4, "double": 4,
+              "uint64_t": 8, "int64_t": 8,
+              "CRGB": 3, "SoftwareSerial": 31}
+OBJECT_TYPES = ("SoftwareSerial",)  # may be declared with constructor arguments: SoftwareSerial name(rx, tx);
+
+# (regex that shows the library is used, what it is, SRAM bytes, True if once per match)
+LIBRARY_RAM = (
+    (r'\bSerial\.begin\s*\(', "HardwareSerial Serial, 64 byte rx and tx buffers", 157, False),
+    (r'#include\s*[<"]SoftwareSerial\.h', "SoftwareSerial receive buffer and statics", 68, False),
+    (r'#include\s*[<"]FastLED\.h', "FastLED CFastLED object", 16, False),
+    (r'\baddLeds\s*<', "FastLED controller for each addLeds<>", 17, True),
+    (r'\bmillis\s*\(', "timer0 millis() counters", 9, False),
+)
+
+RE_LEXEME = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'', re.DOTALL)
+RE_TYPE = r'((?:unsigned\s+|signed\s+)?[A-Za-z_]\w*)\s*(\*\s*)?'
+RE_DECL = re.compile(r'^[ \t]*(static\s+|extern\s+)?(?:volatile\s+)?(const\s+)?(?:volatile\s+)?' + RE_TYPE +
+                     r'([A-Za-z_]\w*)\s*((?:\[[^\]]*\]\s*)*)(PROGMEM\s*)?(=|;|\([^()]*\)\s*;)', re.MULTILINE)
+RE_MEMBER = re.compile(r'\s*(static\s+)?(?:const\s+)?' + RE_TYPE + r'([A-Za-z_]\w*)\s*((?:\[[^\]]*\]\s*)*)(?:=.*)?', re.DOTALL)
+RE_TYPEDEF_STRUCT = re.compile(r'\btypedef\s+struct\s+\w*\s*\{')
+RE_CLASS = re.compile(r'\bclass\s+(\w+)[^{;()]*\{')
+RE_STRUCT_VAR = re.compile(r'^[ \t]*(static\s+)?(const\s+)?struct\s+\w*\s*\{', re.MULTILINE)
+RE_ZERO_INIT = re.compile(r'^[\s{},0xX]*$')
+RE_MACRO = re.compile(r'^\s*#define\s+([A-Za-z_]\w*)\(\s*([A-Za-z_]\w*)\s*\)\s*(.*)$')
+
+# one-parameter function-like #defines such as EEPOFFSET(parm); filled in by estimate()
+MACROS = {}
+
+
+###################################################################################################
+# source scanning - comments out and string literals emptied (so braces in them do not count); line numbers kept
+#
+def c_string_bytes(literal):
+    # size in memory of a C string literal including its terminating 0
+    return len(re.sub(r'\\(x[0-9a-fA-F]+|[0-7]{1,3}|.)', 'e', literal[1:-1]).encode('utf-8')) + 1
+
+def scan_source(text):
+    """scan_source - split C text into code and string literals
+    :param text: from parseRBGheaders.read_active_text()
+    :return: (code, strings) - code has comments blanked and each literal replaced by "" (or ' ');
+             strings is a list of dict pos (in code), text, bytes, flash (True if in F() or PSTR())
+    """
+    code = []
+    strings = []
+    outLen = 0
+    pos = 0
+    sinceString = None  # code since the last string literal; adjacent literals are one literal
+    for match in RE_LEXEME.finditer(text):
+        between = text[pos:match.start()]
+        code.append(between)
+        outLen += len(between)
+        if sinceString is not None:
+            sinceString += between
+        lexeme = match.group(0)
+        if lexeme.startswith("/"):
+            replacement = " " + "\n" * lexeme.count("\n")
+            if sinceString is not None:
+                sinceString += replacement
+        elif lexeme.startswith("'"):
+            replacement = "' '"
+            sinceString = None
+        else:
+            replacement = '""'
+            if (sinceString is not None) and (0 == len(sinceString.strip())):
+                strings[-1]["bytes"] += c_string_bytes(lexeme) - 1
+                strings[-1]["text"] = strings[-1]["text"][:-1] + lexeme[1:]
+                replacement = " " * len(lexeme.split("\n")[0]) + "\n" * lexeme.count("\n")
+            else:
+                tail = "".join(code[-3:])
+                strings.append({"pos": outLen, "text": lexeme, "bytes": c_string_bytes(lexeme),
+                                "flash": bool(re.search(r'\b(?:F|PSTR)\(\s*$', tail))})
+            sinceString = ""
+        code.append(replacement)
+        outLen += len(replacement)
+        pos = match.end()
+    code.append(text[pos:])
+    return "".join(code), strings
+
+def matching_brace(code, openPos):
+    # index of the } that closes the { at openPos
+    depth = 0
+    for idx in range(openPos, len(code)):
+        if "{" == code[idx]:
+            depth += 1
+        elif "}" == code[idx]:
+            depth -= 1
+            if 0 == depth:
+                return idx
+    raise ValueError("unbalanced {} in source")
+
+def line_of(code, pos):
+    return 1 + code.count("\n", 0, pos)
+
+
+###################################################################################################
+# types and sizes
+#
+def type_size(typeName, pointer, types, defines):
+    # bytes for one item of typeName (a #define such as TYPEOF_lookupLEDpatternTbl is followed); None if unknown
+    if pointer:
+        return POINTER_SIZE
+    typeName = " ".join(typeName.split())
+    for depth in range(5):
+        if typeName in types:
+            return types[typeName]
+        if typeName not in defines:
+            return None
+        typeName = " ".join(defines[typeName].split())
+    return None
+
+def read_macros(fnames):
+    # one-parameter function-like #defines such as EEPOFFSET(parm): name -> (parameter, body)
+    macros = {}
+    for fname in fnames:
+        with open(fname, 'rt') as fobj:
+            for theLine in fobj:
+                match = RE_MACRO.match(parseRBGheaders.strip_c_comments(theLine))
+                if match:
+                    macros[match.group(1)] = (match.group(2), match.group(3).strip())
+    return macros
+
+def expand_macros(expr, macros):
+    # replace NAME(arg) by the macro body with arg substituted, innermost first
+    regex = re.compile(r'\b(%s)\s*\(([^()]*)\)' % "|".join(map(re.escape, macros)))
+    while macros:
+        expanded = regex.sub(lambda m: "(%s)" % re.sub(r'\b%s\b' % macros[m.group(1)][0], "(%s)" % m.group(2),
+                                                        macros[m.group(1)][1]), expr)
+        if expanded == expr:
+            break
+        expr = expanded
+    return expr
+
+def dims_product(dims, defines, count=None):
+    # product of [a][b]...; an empty [] is count (from the initializer)
+    product = 1
+    for dim in re.findall(r'\[([^\]]*)\]', dims):
+        if 0 == len(dim.strip()):
+            if count is None:
+                raise ValueError("array size [] without an initializer")
+            product *= count
+        else:
+            product *= parseRBGheaders.eval_define(expand_macros(dim, MACROS), defines)
+    return product
+
+def struct_members(body, types, defines):
+    """struct_members - the data members of a struct or class body
+    :return: list of (name, bytes); static members and member functions are left out
+    """
+    while True:  # function bodies and brace initializers out, leaving a ; so members stay apart
+        flat = re.sub(r'\{[^{}]*\}', ';', body)
+        if flat == body:
+            break
+        body = flat
+    body = re.sub(r'\b(?:public|private|protected)\s*:', ';', body)
+    members = []
+    for piece in body.split(";"):
+        match = RE_MEMBER.fullmatch(piece)
+        if (match is None) or match.group(1) or (match.group(2) in ("typedef", "return")):
+            continue
+        size = type_size(match.group(2), match.group(3), types, defines)
+        if size is None:
+            raise ValueError("cannot size member |%s|" % " ".join(piece.split()))
+        members.append((match.group(4), size * dims_product(match.group(5), defines)))
+    return members
+
+def read_types(code, types, defines):
+    """read_types - add the typedef structs and classes in code to types (name -> bytes)
+    :return: (dict name -> number of data members, list of (start, end) of the bodies in code)
+    """
+    numMembers = {}
+    bodies = []
+    for regex in (RE_TYPEDEF_STRUCT, RE_CLASS):
+        for match in regex.finditer(code):
+            closePos = matching_brace(code, match.end() - 1)
+            if regex is RE_CLASS:
+                name = match.group(1)
+            else:
+                name = re.match(r'\s*(\w+)', code[closePos + 1:]).group(1)
+            members = struct_members(code[match.end():closePos], types, defines)
+            types[name] = sum(size for member, size in members)
+            numMembers[name] = len(members)
+            bodies.append((match.end(), closePos))
+    return numMembers, bodies
+
+
+###################################################################################################
+# variables
+#
+def initializer(code, pos):
+    # text of the initializer that starts after the = at pos: a {...} or up to the ;
+    idx = pos
+    while code[idx].isspace():
+        idx += 1
+    if "{" == code[idx]:
+        return code[idx:matching_brace(code, idx) + 1]
+    return code[idx:code.index(";", idx)].strip()
+
+def eval_or_none(expr, defines):
+    # value of a scalar initializer, or None if it is not a constant expression we can evaluate
+    try:
+        return parseRBGheaders.eval_define(expand_macros(expr, MACROS), defines)
+    except (ValueError, SyntaxError, TypeError, ZeroDivisionError):
+        return None
+
+def count_elements(initText, perElement):
+    # number of array elements in a {...} initializer; a flat list of struct members counts perElement at a time
+    elements = []
+    depth = 0
+    current = ""
+    for char in initText.strip()[1:-1]:
+        if "{" == char:
+            depth += 1
+        elif "}" == char:
+            depth -= 1
+        if (0 == depth) and ("," == char):
+            elements.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        elements.append(current.strip())
+    if elements and not elements[0].startswith("{"):
+        return int(math.ceil(len(elements) / float(max(1, perElement))))
+    return len(elements)
+
+def read_variables(fname, code, strings, types, numMembers, bodies, defines):
+    """read_variables - the globals and static locals declared in one file
+    :return: (list of dict symbol, type, count, bytes, section, where;  list of (bytes, symbol, where) for local arrays)
+    """
+    fbase = os.path.basename(fname)
+    depth = [0] * (len(code) + 1)
+    for idx, char in enumerate(code):
+        depth[idx + 1] = depth[idx] + (1 if "{" == char else (-1 if "}" == char else 0))
+    stringAt = {entry["pos"]: entry for entry in strings}
+    variables = []
+    localArrays = []
+
+    for match in RE_DECL.finditer(code):
+        storage, const, typeName, pointer, symbol, dims, progmem, ending = match.groups()
+        if any(start <= match.start() < end for start, end in bodies) or (storage or "").startswith("extern"):
+            continue
+        if ending.startswith("(") and (pointer or (typeName not in OBJECT_TYPES and typeName not in types)):
+            continue  # a function prototype, not an object with constructor arguments
+        size = type_size(typeName, pointer, types, defines)
+        if size is None:
+            continue  # a statement, or a type we know nothing about
+        initText = initializer(code, match.end()) if "=" == ending else ""
+        count = None
+        if initText.startswith("{"):
+            count = count_elements(initText, numMembers.get(typeName, 1))
+        elif initText.startswith('""') and (match.end() + code[match.end():].index('""')) in stringAt:
+            literal = stringAt[match.end() + code[match.end():].index('""')]
+            count, literal["bytes"] = literal["bytes"], 0  # the literal is the array itself
+        count = dims_product(dims, defines, count)
+        where = "%s:%d" % (fbase, line_of(code, match.start()))
+        if (0 == depth[match.start()]) or storage:
+            if progmem:
+                section = "progmem"
+            elif const and not dims:
+                section = "const"
+            elif initText and not (RE_ZERO_INIT.match(initText) or (0 == eval_or_none(initText, defines))):
+                section = "data"
+            else:
+                section = "bss"
+            variables.append({"symbol": symbol, "type": typeName + ("*" if pointer else ""), "count": count,
+                              "bytes": size * count, "section": section, "where": where})
+        elif dims:
+            localArrays.append((size * count, symbol, where))
+
+    for match in RE_STRUCT_VAR.finditer(code):  # static struct _x { ... } name;
+        closePos = matching_brace(code, match.end() - 1)
+        tail = re.match(r'\s*(\w+)\s*((?:\[[^\]]*\]\s*)*)(=|;)', code[closePos + 1:])
+        if tail is None:
+            continue
+        body = code[match.end():closePos]
+        count = dims_product(tail.group(2), defines)
+        variables.append({"symbol": tail.group(1), "type": "struct", "count": count,
+                          "bytes": count * sum(size for member, size in struct_members(body, types, defines)),
+                          "section": "data" if ("=" in body) or ("=" == tail.group(3)) else "bss",
+                          "where": "%s:%d" % (fbase, line_of(code, match.start()))})
+    return variables, localArrays
+
+
+###################################################################################################
+# estimate(tableFname) - size everything in the sketch, with the state table taken from tableFname
+#
+# returns dict variables, localArrays, flashStrings (list of bytes), ramStrings (text -> bytes), libraries, rowBytes
+#
+def estimate(tableFname=parseRBGheaders.FNAME_STATES_H):
+    defines = parseRBGheaders.read_all_defines()
+    parseRBGheaders.read_defines(FNAME_DFPLAYER_H, defines)
+    sameTable = os.path.realpath(tableFname) == os.path.realpath(parseRBGheaders.FNAME_STATES_H)
+    fnames = SOURCES if sameTable else SOURCES + (tableFname,)
+    if not sameTable:
+        parseRBGheaders.read_defines(tableFname, defines)
+
+    MACROS.clear()
+    MACROS.update(read_macros(fnames))
+    scanned = []
+    types = dict(TYPE_SIZES)
+    numMembers = {}
+    for fname in fnames:  # the table file is last, so its RBGStateTable_t is the one used
+        code, strings = scan_source(parseRBGheaders.read_active_text(fname, defines))
+        fileMembers, bodies = read_types(code, types, defines)
+        numMembers.update(fileMembers)
+        scanned.append((fname, code, strings, bodies))
+
+    result = {"variables": [], "localArrays": [], "flashStrings": [], "ramStrings": {}, "libraries": [],
+              "rowBytes": types.get("RBGStateTable_t")}
+    searchText = ""
+    for fname, code, strings, bodies in scanned:
+        isTable = (not sameTable) and (fname == tableFname)
+        variables, localArrays = read_variables(fname, code, strings, types, numMembers, bodies, defines)
+        for var in variables:
+            if "myStateTable" == var["symbol"]:
+                if (not sameTable) and not isTable:
+                    continue  # replaced by the one from the table file
+                if any("myStateTable" == old["symbol"] for old in result["variables"]):
+                    continue  # makeStateTable.py prints the table twice (positional and .field=)
+            elif isTable:
+                continue
+            result["variables"].append(var)
+        if isTable:
+            continue
+        result["localArrays"].extend(localArrays)
+        for entry in strings:
+            if entry["flash"]:
+                result["flashStrings"].append(entry["bytes"])
+            elif entry["bytes"]:
+                result["ramStrings"][entry["text"]] = entry["bytes"]
+        with open(fname, 'rt') as fobj:
+            searchText += code + "".join(line for line in fobj if line.lstrip().startswith("#include"))
+    for regex, what, size, perMatch in LIBRARY_RAM:
+        uses = len(re.findall(regex, searchText))
+        if uses:
+            result["libraries"].append((what, size * (uses if perMatch else 1)))
+    return result
+
+
+def totals(result, codeBytes=0):
+    """totals - SRAM and flash sums of an estimate()
+    :return: dict of byte counts
+    """
+    tot = {"ram_variables": sum(var["bytes"] for var in result["variables"] if var["section"] in ("data", "bss")),
+           "ram_strings": sum(result["ramStrings"].values()),
+           "ram_libraries": sum(size for what, size in result["libraries"]),
+           "flash_progmem": sum(var["bytes"] for var in result["variables"] if "progmem" == var["section"]),
+           "flash_data_init": sum(var["bytes"] for var in result["variables"] if "data" == var["section"]),
+           "flash_F_strings": sum(result["flashStrings"]),
+           "code": codeBytes}
+    tot["ram"] = tot["ram_variables"] + tot["ram_strings"] + tot["ram_libraries"]
+    tot["flash"] = tot["flash_progmem"] + tot["flash_data_init"] + tot["flash_F_strings"] + tot["ram_strings"] + codeBytes
+    return tot
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(prog='memBudget',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="estimate SRAM and flash used by the RBG_SciFi variables, tables and strings, by symbol\n" +
+                    "   exit status 1 if over the SRAM or flash budget",
+        epilog="""Example:
+python memBudget.py
+python makeStateTable.py StateTable_minimal.xlsx > myStateTable.h
+python memBudget.py --table myStateTable.h --ram_budget 1600 --code_bytes 21000
+""",
+        usage='%(prog)s [--table FILE] [--ram_budget BYTES] [--flash_budget BYTES] [--code_bytes BYTES]')
+    my_parser.add_argument('--table', type=str, default=parseRBGheaders.FNAME_STATES_H,
+                           help='file with RBGStateTable_t and myStateTable[] (default RBG_SciFi_StatesAndInputs.h)')
+    my_parser.add_argument('--ram_budget', type=int, default=SRAM_SIZE - STACK_RESERVE,
+                           help='most SRAM for variables, strings and libraries (default %d, leaving %d for the stack)' %
+                                (SRAM_SIZE - STACK_RESERVE, STACK_RESERVE))
+    my_parser.add_argument('--flash_budget', type=int, default=FLASH_SIZE, help='most flash (default %d)' % FLASH_SIZE)
+    my_parser.add_argument('--code_bytes', type=int, default=0, help='program code size to add to the flash total (default 0)')
+    args = my_parser.parse_args()
+
+    result = estimate(args.table)
+    tot = totals(result, args.code_bytes)
+    print("memBudget: state table from %s, %d bytes per row" % (args.table, result["rowBytes"] or 0))
+    print("\n SRAM  flash  section  %-28s %-26s %6s  %s" % ("symbol", "type", "count", "where"))
+    for var in sorted(result["variables"], key=lambda var: (var["section"] in ("const", "progmem"), -var["bytes"])):
+        ram = var["bytes"] if var["section"] in ("data", "bss") else 0
+        flash = var["bytes"] if var["section"] in ("data", "progmem") else 0
+        print("%5d %6d  %-7s  %-28s %-26s %6d  %s" % (ram, flash, var["section"], var["symbol"], var["type"], var["count"], var["where"]))
+    print("%5d %6d  strings  %d literals in SRAM (merged)" % (tot["ram_strings"], tot["ram_strings"], len(result["ramStrings"])))
+    print("%5d %6d  strings  %d F() literals in flash" % (0, tot["flash_F_strings"], len(result["flashStrings"])))
+    for what, size in result["libraries"]:
+        print("%5d %6d  library  %s" % (size, 0, what))
+    if args.code_bytes:
+        print("%5d %6d  code     program code (--code_bytes)" % (0, args.code_bytes))
+
+    print("\nSRAM:  %d variables + %d strings + %d libraries = %d of budget %d (%d on the chip)" %
+          (tot["ram_variables"], tot["ram_strings"], tot["ram_libraries"], tot["ram"], args.ram_budget, SRAM_SIZE))
+    print("flash: %d PROGMEM + %d initial values + %d F() strings + %d strings + %d code = %d of budget %d" %
+          (tot["flash_progmem"], tot["flash_data_init"], tot["flash_F_strings"], tot["ram_strings"], tot["code"],
+           tot["flash"], args.flash_budget))
+    if result["localArrays"]:
+        size, symbol, where = max(result["localArrays"])
+        print("stack: largest local array is %s, %d bytes (%s); %d bytes of SRAM are left for the stack" %
+              (symbol, size, where, SRAM_SIZE - tot["ram"]))
+
+    problems = []
+    if tot["ram"] > args.ram_budget:
+        problems.append("SRAM %d bytes is over budget %d by %d" % (tot["ram"], args.ram_budget, tot["ram"] - args.ram_budget))
+    if tot["flash"] > args.flash_budget:
+        problems.append("flash %d bytes is over budget %d by %d" % (tot["flash"], args.flash_budget, tot["flash"] - args.flash_budget))
+    if problems:
+        sys.stderr.write("memBudget: %s\n" % "; ".join(problems))
+        sys.exit(1)
@@ -0,0 +1,212 @@
+# parseRBGheaders.py - read #define values and const arrays from the RBG_SciFi *.h files
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# The host-side tools (LED power, EEPROM model, etc.) need the same numbers the Arduino code uses.
+#    Rather than copy them by hand, these routines pull them out of the *.h files so they stay in sync.
+# This is not a C preprocessor; it handles the simple forms used in RBG_SciFi_StatesAndInputs.h and RBG_SciFi_LEDs.h
+#
+
+import os
+import re
+
+RBG_SCIFI_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "RBG_SciFi")
+FNAME_STATES_H = os.path.join(RBG_SCIFI_DIR, "RBG_SciFi_StatesAndInputs.h")
+FNAME_LEDS_H = os.path.join(RBG_SCIFI_DIR, "RBG_SciFi_LEDs.h")
+FNAME_INO = os.path.join(RBG_SCIFI_DIR, "RBG_SciFi.ino")
+
+RE_DEFINE = re.compile(r'^\s*#define\s+([A-Za-z_]\w*)(?![\w(])\s*(.*)$')
+RE_IDENT = re.compile(r'[A-Za-z_]\w*')
+RE_CAST = re.compile(r'\(\s*(?:uint8_t|uint16_t|uint32_t|int8_t|int16_t|int32_t|int|unsigned long)\s*\)')
+RE_EXPR_OK = re.compile(r'^[\s0-9a-fA-FxX()|&~^+\-*/%<>.]*$')
+
+
+def strip_c_comments(the_text):
+    """strip_c_comments - remove // and /* */ comments from C text
+    :param the_text: string with C code, possibly multi-line
+    :return: the_text with comments removed
+    """
+    the_text = re.sub(r'/\*.*?\*/', ' ', the_text, flags=re.DOTALL)
+    return re.sub(r'//[^\n]*', '', the_text)
+
+
+def _preprocess(fname, defines):
+    # generator: (raw line, comment-stripped line, active) following #if/#ifdef/#ifndef/#elif/#else/#endif;
+    #    active is False for the conditional directives themselves and for lines in branches not taken
+    active = [True]  # stack for #if/#ifdef/#ifndef ... #else ... #endif
+    taken = [True]   # whether some branch at this level was already active
+    with open(fname, 'rt') as fobj:
+        for rawLine in fobj:
+            theLine = strip_c_comments(rawLine).strip()
+            words = theLine.split(None, 1)
+            directive = words[0] if len(words) else ""
+            if directive in ("#if", "#ifdef", "#ifndef"):
+                if "#ifdef" == directive:
+                    cond = words[1].strip() in defines
+                elif "#ifndef" == directive:
+                    cond = words[1].strip() not in defines
+                else:
+                    cond = _eval_condition(words[1], defines)
+                active.append(active[-1] and cond)
+                taken.append(cond)
+            elif "#elif" == directive:
+                cond = (not taken[-1]) and _eval_condition(words[1], defines)
+                active[-1] = active[-2] and cond
+                taken[-1] = taken[-1] or cond
+            elif "#else" == directive:
+                active[-1] = active[-2] and not taken[-1]
+                taken[-1] = True
+            elif "#endif" == directive:
+                if len(active) > 1:
+                    active.pop()
+                    taken.pop()
+            else:
+                yield rawLine, theLine, active[-1]
+                continue
+            yield rawLine, theLine, False
+
+
+def read_defines(fname, defines=None):
+    """read_defines - collect the simple (non-function) #define lines from a C file
+    :param fname: path to *.h or *.ino file
+    :param defines: optional dict to add to; later definitions override earlier ones
+    :return: dict of NAME -> value text (comments stripped, may be empty)
+    """
+    if defines is None:
+        defines = {}
+    for rawLine, theLine, active in _preprocess(fname, defines):
+        if active:
+            match = RE_DEFINE.match(theLine)
+            if match:
+                defines[match.group(1)] = match.group(2).strip()
+    return defines
+
+
+def read_active_text(fname, defines):
+    """read_active_text - the text of a C file as the compiler sees it after #if/#else/#endif
+    :param fname: path to *.h, *.ino or *.cpp file
+    :param defines: dict from read_defines(), used for the #if conditions
+    :return: file text with inactive lines and all # lines blanked; comments are kept and line numbers do not change
+    """
+    with open(fname, 'rt') as fobj:
+        directives = [theLine.split() for theLine in (strip_c_comments(rawLine).strip() for rawLine in fobj) if theLine.startswith("#")]
+    for idx, words in enumerate(directives[:-1]):
+        if words[0] in ("#if", "#ifdef", "#ifndef"):
+            if (["#ifndef"] == words[:1]) and (["#define"] + words[1:2] == directives[idx + 1][:2]):
+                defines = dict(defines)  # include guard: defines came from reading this file, so it would hide itself
+                defines.pop(words[1], None)
+            break
+    lines = []
+    for rawLine, theLine, active in _preprocess(fname, defines):
+        lines.append(rawLine if (active and not theLine.startswith("#")) else "\n")
+    return "".join(lines)
+
+
+def _eval_condition(expr, defines):
+    # value of an #if expression; unknown symbols count as 0 like the C preprocessor
+    expr = re.sub(r'defined\s*\(?\s*([A-Za-z_]\w*)\s*\)?', lambda m: "1" if m.group(1) in defines else "0", expr)
+    expr = expr.replace("&&", " and ").replace("||", " or ").replace("!", " not ").replace(" not =", "!=")
+    known = dict(defines)
+    for name in RE_IDENT.findall(expr):
+        if (name not in known) and (name not in ("and", "or", "not")):
+            known[name] = "0"
+    try:
+        return bool(eval(RE_IDENT.sub(lambda m: m.group(0) if m.group(0) in ("and", "or", "not")
+                                      else str(eval_define(m.group(0), known)), expr), {"__builtins__": {}}, {}))
+    except (ValueError, SyntaxError):
+        return True
+
+
+def eval_define(expr, defines, depth=0):
+    """eval_define - evaluate a #define value or C constant expression to an int
+    :param expr: text such as "mINP_TRIG|mINP_B01" or "(1 + EEPOFFSET_VALUE)" or "4.0"
+    :param defines: dict from read_defines()
+    :param depth: recursion guard
+    :return: int value; raises ValueError if it cannot be evaluated
+    """
+    if depth > 20:
+        raise ValueError("eval_define recursion too deep on |%s|" % expr)
+    expr = RE_CAST.sub(' ', strip_c_comments(str(expr))).strip()
+
+    def _subst(match):
+        name = match.group(0)
+        if name not in defines:
+            raise ValueError("eval_define unknown symbol |%s|" % name)
+        return "(%d)" % eval_define(defines[name], defines, depth + 1)
+
+    # hex constants look like identifiers after the leading 0, so protect them first
+    expr = re.sub(r'\b0[xX][0-9a-fA-F]+\b', lambda m: str(int(m.group(0), 16)), expr)
+    expr = re.sub(r'(?<=\d)[uUlL]+\b', '', expr)
+    expr = RE_IDENT.sub(_subst, expr)
+    if (0 == len(expr)) or not RE_EXPR_OK.match(expr):
+        raise ValueError("eval_define cannot evaluate |%s|" % expr)
+    expr = re.sub(r'(?<!/)/(?!/)', '//', expr)  # C integer division
+    return int(eval(expr, {"__builtins__": {}}, {}))
+
+
+def read_c_array(fname, arrayName):
+    """read_c_array - return the initializer elements of a C array as text
+    :param fname: path to *.h or *.ino file
+    :param arrayName: name of the array, for instance "lookupLEDpatternTbl"
+    :return: list of element strings with comments and whitespace removed; nested {} kept as one element
+    """
+    with open(fname, 'rt') as fobj:
+        the_text = strip_c_comments(fobj.read())
+    match = re.search(r'\b%s\s*\[[^\]]*\][^=;]*=\s*\{' % re.escape(arrayName), the_text)
+    if match is None:
+        raise ValueError("read_c_array could not find %s in %s" % (arrayName, fname))
+    elements = []
+    depth = 1
+    current = ""
+    for char in the_text[match.end():]:
+        if "{" == char:
+            depth += 1
+        elif "}" == char:
+            depth -= 1
+            if 0 == depth:
+                break
+        if (1 == depth) and ("," == char):
+            elements.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if 0 != len(current.strip()):
+        elements.append(current.strip())
+    return elements
+
+
+def read_c_int_array(fname, arrayName, defines):
+    """read_c_int_array - like read_c_array but evaluates each element to int
+    :param fname: path to *.h or *.ino file
+    :param arrayName: name of the array
+    :param defines: dict from read_defines()
+    :return: list of int
+    """
+    return [eval_define(elem, defines) for elem in read_c_array(fname, arrayName)]
+
+
+def read_all_defines():
+    """read_all_defines - #defines from RBG_SciFi_StatesAndInputs.h then RBG_SciFi_LEDs.h then RBG_SciFi.ino
+    :return: dict of NAME -> value text
+    """
+    defines = {}
+    for fname in (FNAME_STATES_H, FNAME_LEDS_H, FNAME_INO):
+        read_defines(fname, defines)
+    return defines
+
+
+def read_state_table(fname, defines, tableName="myStateTable"):
+    """read_state_table - read the ".field=value" rows of myStateTable as written by makeStateTable.py
+    :param fname: path to RBG_SciFi_StatesAndInputs.h
+    :param defines: dict from read_defines()
+    :param tableName: name of the C array
+    :return: list (indexed by row) of dict field -> int value
+    """
+    table = []
+    for elem in read_c_array(fname, tableName):
+        row = {}
+        for field, value in re.findall(r'\.(\w+)\s*=\s*([^,]+)', elem):
+            row[field] = eval_define(value.strip(), defines)
+        table.append(row)
+    return table
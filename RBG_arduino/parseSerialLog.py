@@ -0,0 +1,224 @@
+# parseSerialLog.py - turn RBG_SciFi serial debug output into columnar data
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# The serial monitor output from RBG_processStateTable(), RBG_waitForInput(), loop() etc. is written for reading by eye.
+#    This parses it into one record per event with typed columns:
+#       lineNum   - line number in the log (1 = first line)
+#       event     - event code, see EVENT_NAMES
+#       loopCount - globalLoopCount printed on the line (increments once per LED step), -1 if none
+#       row       - state table row in effect (from "from row" or the last "  - tableRow:" line), -1 if not known yet
+#       nextRow   - row we go to (TRANSITION, WAIT_RETURN), else -1
+#       inputMask - tmpVinputRBG/nowVinputRBG for the event, else the last one seen, -1 if not known yet
+#       value     - event specific: sound number, LED effect number, dynamicMode, etc; else -1
+#       timerNow  - timerNow printed on the line, else the last "  - timerNow:" seen, -1 if not known yet
+#
+# Output is CSV (.csv) or NumPy (.npz, one array per column); the columns are built in array.array so memory stays small.
+# Also prints a summary: time in each state table row and input-change-to-transition latency, both in loopCount units.
+#
+# Input is read in large blocks (see mdoUniq.py) so multi-gigabyte soak-test logs go quickly; "-" reads stdin.
+#
+
+import argparse
+import array
+import csv
+import re
+import sys
+
+import mdoUniq
+
+EVENT_NAMES = {
+    1: "TRANSITION",     # DEBUG RBG_processStateTable() - tmpVinputRBG 0x.. from row R foundInputRow F loopCount L
+    2: "ROW_START",      # DEBUG RBG_processStateTable() - tmpVinputRBG 0x.. loopCount L
+    3: "RESTART_SOUND",  # DEBUG RBG_processStateTable() - tmpVinputRBG 0x.. restart sound S loopCount L
+    4: "INPUT_CHANGE",   # DEBUG loop() - nowVinputRBG 0x.. loopCount L
+    5: "WAIT_RETURN",    #  RBG_waitForInput <why> thisReturn N loopCount L
+    6: "SHOOT",          #  RBG_specialProcShoot HIGH timerMaxForceSolenoidLow M timerNow T loopCount L
+    7: "STOP_SHOOT",     #  RBG_specialProcStopShoot DPIN_SOLENOID=LOW ... timerNow T dynamicMode D loopCount L
+    8: "START_LED",      #  RBG_startEffectLED ln N EFCT num E loopCount L
+    9: "START_SOUND",    #  RBG_startEffectSound ln N EFCT num E final num S loopCount L
+}
+EVENT_CODES = {name: code for code, name in EVENT_NAMES.items()}
+COLUMNS = ["lineNum", "event", "loopCount", "row", "nextRow", "inputMask", "value", "timerNow"]
+COLUMN_TYPES = ["q", "B", "q", "h", "h", "l", "l", "q"]
+
+RE_TRANSITION = re.compile(r'tmpVinputRBG 0x([0-9A-Fa-f]+) from row (\d+) foundInputRow (\d+) loopCount (\d+)')
+RE_ROW_START = re.compile(r'tmpVinputRBG 0x([0-9A-Fa-f]+) loopCount (\d+)')
+RE_RESTART_SOUND = re.compile(r'tmpVinputRBG 0x([0-9A-Fa-f]+) restart sound (\d+) loopCount (\d+)')
+RE_INPUT_CHANGE = re.compile(r'DEBUG loop\(\) - nowVinputRBG 0x([0-9A-Fa-f]+) loopCount (\d+)')
+RE_WAIT_RETURN = re.compile(r'RBG_waitForInput (\S+)(?: \S+)* thisReturn (\d+) loopCount (\d+)')
+RE_SHOOT = re.compile(r'RBG_specialProcShoot HIGH timerMaxForceSolenoidLow (\d+) timerNow (\d+) loopCount (\d+)')
+RE_STOP_SHOOT = re.compile(r'RBG_specialProcStopShoot DPIN_SOLENOID=LOW .*timerNow (\d+) dynamicMode (\d+) loopCount (\d+)')
+RE_START_LED = re.compile(r'RBG_startEffectLED ln \d+ EFCT num (\d+) loopCount (\d+)')
+RE_START_SOUND = re.compile(r'RBG_startEffectSound ln \d+ EFCT num (\d+) final num (\d+) loopCount (\d+)')
+RE_STATE_TABLEROW = re.compile(r'^\s*- tableRow: (\d+)')
+RE_STATE_VINPUT = re.compile(r'^\s*- VinputRBG: 0x([0-9A-Fa-f]+)')
+RE_STATE_TIMERNOW = re.compile(r'^\s*- timerNow: (\d+)')
+
+
+###################################################################################################
+# parse_serial_log(fname) - parse the log into typed columns
+#
+# returns dict of column name -> array.array
+#
+def parse_serial_log(fname):
+    cols = {name: array.array(typecode) for name, typecode in zip(COLUMNS, COLUMN_TYPES)}
+    appenders = [cols[name].append for name in COLUMNS]
+    row = inputMask = timerNow = -1
+    lineNum = 0
+
+    def add(event, loopCount, nextRow=-1, value=-1, thisTimerNow=-1):
+        for append, val in zip(appenders, (lineNum, event, loopCount, row, nextRow, inputMask, value,
+                                           thisTimerNow if thisTimerNow >= 0 else timerNow)):
+            append(val)
+
+    for batch in mdoUniq.read_line_batches(fname):
+        for theLine in batch:
+            lineNum += 1
+            if "loopCount" in theLine:
+                if "RBG_processStateTable" in theLine:
+                    match = RE_TRANSITION.search(theLine)
+                    if match:
+                        inputMask, row = int(match.group(1), 16), int(match.group(2))
+                        add(EVENT_CODES["TRANSITION"], int(match.group(4)), nextRow=int(match.group(3)))
+                        row = int(match.group(3))
+                        continue
+                    match = RE_RESTART_SOUND.search(theLine)
+                    if match:
+                        inputMask = int(match.group(1), 16)
+                        add(EVENT_CODES["RESTART_SOUND"], int(match.group(3)), value=int(match.group(2)))
+                        continue
+                    match = RE_ROW_START.search(theLine)
+                    if match:
+                        inputMask = int(match.group(1), 16)
+                        add(EVENT_CODES["ROW_START"], int(match.group(2)))
+                elif "RBG_waitForInput" in theLine:
+                    match = RE_WAIT_RETURN.search(theLine)
+                    if match:
+                        add(EVENT_CODES["WAIT_RETURN"], int(match.group(3)), nextRow=int(match.group(2)))
+                elif "nowVinputRBG" in theLine:
+                    match = RE_INPUT_CHANGE.search(theLine)
+                    if match:
+                        inputMask = int(match.group(1), 16)
+                        add(EVENT_CODES["INPUT_CHANGE"], int(match.group(2)))
+                elif "RBG_specialProcShoot" in theLine:
+                    match = RE_SHOOT.search(theLine)
+                    if match:
+                        timerNow = int(match.group(2))
+                        add(EVENT_CODES["SHOOT"], int(match.group(3)), value=int(match.group(1)))
+                elif "RBG_specialProcStopShoot" in theLine:
+                    match = RE_STOP_SHOOT.search(theLine)
+                    if match:
+                        timerNow = int(match.group(1))
+                        add(EVENT_CODES["STOP_SHOOT"], int(match.group(3)), value=int(match.group(2)))
+                elif "RBG_startEffectLED" in theLine:
+                    match = RE_START_LED.search(theLine)
+                    if match:
+                        add(EVENT_CODES["START_LED"], int(match.group(2)), value=int(match.group(1)))
+                elif "RBG_startEffectSound" in theLine:
+                    match = RE_START_SOUND.search(theLine)
+                    if match:
+                        add(EVENT_CODES["START_SOUND"], int(match.group(3)), value=int(match.group(2)))
+            elif "  - " in theLine:  # printAllMyState() lines
+                match = RE_STATE_TABLEROW.match(theLine)
+                if match:
+                    row = int(match.group(1))
+                    continue
+                match = RE_STATE_VINPUT.match(theLine)
+                if match:
+                    inputMask = int(match.group(1), 16)
+                    continue
+                match = RE_STATE_TIMERNOW.match(theLine)
+                if match:
+                    timerNow = int(match.group(1))
+    return cols
+# end parse_serial_log()
+
+
+###################################################################################################
+# write_columns(cols, outfname) - write CSV or .npz depending on outfname extension
+#
+def write_columns(cols, outfname):
+    if outfname.lower().endswith(".npz"):
+        import numpy as np  # only needed for .npz output
+        np.savez_compressed(outfname, **{name: np.frombuffer(cols[name], dtype=cols[name].typecode) for name in COLUMNS})
+    else:
+        if "-" == outfname:
+            fobj = sys.stdout
+        else:
+            fobj = open(outfname, 'wt', newline='')
+        writer = csv.writer(fobj)
+        writer.writerow(COLUMNS)
+        writer.writerows(zip(*[cols[name] for name in COLUMNS]))
+        if fobj is not sys.stdout:
+            fobj.close()
+# end write_columns()
+
+
+###################################################################################################
+# print_summary(cols) - time in each row and input-to-transition latency, in loopCount units
+#
+def print_summary(cols):
+    numEvents = len(cols["event"])
+    counts = {}
+    for event in cols["event"]:
+        counts[event] = counts.get(event, 0) + 1
+    print("%d events:" % numEvents)
+    for code in sorted(counts):
+        print("   %-14s %d" % (EVENT_NAMES[code], counts[code]))
+
+    # time in row: from the TRANSITION into a row until the TRANSITION out of it
+    timeInRow = {}
+    entered = None  # (row, loopCount)
+    latencies = []
+    pendingInput = None  # loopCount of the first input change not yet followed by a transition
+    for idx in range(numEvents):
+        event, loopCount = cols["event"][idx], cols["loopCount"][idx]
+        if EVENT_CODES["INPUT_CHANGE"] == event:
+            if pendingInput is None:
+                pendingInput = loopCount
+        elif EVENT_CODES["TRANSITION"] == event:
+            if (entered is not None) and (entered[0] == cols["row"][idx]) and (loopCount >= entered[1]):
+                total, num = timeInRow.get(entered[0], (0, 0))
+                timeInRow[entered[0]] = (total + loopCount - entered[1], num + 1)
+            entered = (cols["nextRow"][idx], loopCount)
+            if (pendingInput is not None) and (loopCount >= pendingInput):
+                latencies.append(loopCount - pendingInput)
+            pendingInput = None
+
+    if 0 != len(timeInRow):
+        print("")
+        print("time in state table row (loopCount units):")
+        print("%-6s %8s %12s %10s" % ("row", "visits", "total", "mean"))
+        for row in sorted(timeInRow, key=lambda r: -timeInRow[r][0]):
+            total, num = timeInRow[row]
+            print("%-6d %8d %12d %10.1f" % (row, num, total, total / num))
+    if 0 != len(latencies):
+        latencies.sort()
+        print("")
+        print("input change to transition latency (loopCount units): %d samples, min %d, median %d, 95%% %d, max %d" %
+              (len(latencies), latencies[0], latencies[len(latencies) // 2],
+               latencies[min(len(latencies) - 1, (95 * len(latencies)) // 100)], latencies[-1]))
+# end print_summary()
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(prog='parseSerialLog',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="parse RBG_SciFi serial debug output into typed event records\n" +
+                    "   writes CSV or NumPy .npz columns and prints time-in-state and latency summary",
+        epilog="""Example:
+python parseSerialLog.py serial.log serial_events.npz
+python parseSerialLog.py - serial_events.csv < serial.log
+""",
+        usage='%(prog)s infile outfile [--nosummary]')
+    my_parser.add_argument('infile', type=str, help='path to serial log; - for stdin')
+    my_parser.add_argument('outfile', type=str, help='output file: *.npz for NumPy, else CSV; - for CSV to stdout')
+    my_parser.add_argument('--nosummary', action='store_true', help='do not print the summary')
+    args = my_parser.parse_args()
+
+    cols = parse_serial_log(args.infile)
+    write_columns(cols, args.outfile)
+    if (not args.nosummary) and ("-" != args.outfile):
+        print_summary(cols)
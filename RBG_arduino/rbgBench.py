@@ -0,0 +1,331 @@
+# rbgBench.py - benchmarks for the RBG Python tools, with generators for synthetic inputs of any size
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# Each benchmark calls a tool's own function (not a subprocess) on generated input at several sizes:
+#    statetable - makeStateTable.make_state_table() on a StateTable sheet of N rows
+#    sounds     - RobotSounds.readSounds() on a Sounds sheet of N rows
+#    wavhdr     - WAV_hdr_YX5200.do_WAV_hdr_YX5200() on each of N WAV files
+#    copyem     - copyem.doCopyem() on a directory of N ####_*.wav names
+#    mdouniq    - mdoUniq.mdoUniq() on a serial log of N bytes (previous-line and --window 50)
+#    stripblank - stripblanklns.stripblanklns() on the same log (plain and with --uniq)
+#    debuggable - VS_debuggable.debuggable() on the RBG_SciFi sources with the .ino repeated N times
+# Tool output goes to os.devnull. The module globals some tools keep (makeStateTable, copyem, VS_debuggable)
+#    are reset before every run so the runs are independent.
+#
+# Generated inputs are kept in --workdir and reused when the same size is asked for again,
+#    so multi-GB serial logs (--scale large) are only written once.
+#
+# Results are written as JSON (rbgBench_<git commit>_<date-time>.json in --outdir; the commit gets -dirty if tracked
+#    files have changes), so no run overwrites another; --compare OLD.json (read before anything runs) prints the ratio
+#    new/old for each benchmark and size and marks anything more than --threshold slower.
+#
+
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import platform
+import random
+import statistics
+import struct
+import subprocess
+import sys
+import time
+
+MY_DIR = os.path.dirname(os.path.realpath(__file__))
+WAV_HDR_DIR = os.path.join(os.path.dirname(MY_DIR), "WAV_hdr_YX5200")
+RBG_SCIFI_DIR = os.path.join(MY_DIR, "RBG_SciFi")
+XLSX_FNAME = os.path.join(MY_DIR, "StateTable_minimal.xlsx")
+
+SCALES = {
+    "quick":   {"statetable": [150, 1500], "sounds": [100, 1000], "wavhdr": [100, 1000], "copyem": [127, 1000],
+                "mdouniq": [10**6, 10**7], "stripblank": [10**6, 10**7], "debuggable": [1, 10]},
+    "default": {"statetable": [150, 1500, 15000], "sounds": [100, 1000, 10000], "wavhdr": [100, 1000, 5000],
+                "copyem": [127, 1000, 9999], "mdouniq": [10**7, 10**8], "stripblank": [10**7, 10**8], "debuggable": [1, 10, 50]},
+    "large":   {"statetable": [15000, 60000], "sounds": [10000, 50000], "wavhdr": [5000, 20000], "copyem": [9999],
+                "mdouniq": [10**8, 10**9, 4 * 10**9], "stripblank": [10**8, 10**9, 4 * 10**9], "debuggable": [50, 200]},
+}
+STATETABLE_COLS = ["SPECIAL", "index", "efctSound", "efctLED", "inputRBG", "storeVal", "storeAddr", "gotoOnInput", "gotoWithoutInput"]
+SYMBOL_COLS = ("index", "gotoOnInput", "gotoWithoutInput")
+SILENCE_FNAME = "0069__mdo47__silence.wav"
+
+sys.path.insert(0, WAV_HDR_DIR)
+
+
+###################################################################################################
+# generators - each makes fname (or dirname) unless it already exists, and returns it
+#
+def gen_state_table_xlsx(fname, nrows):
+    # copies of the real StateTable sheet, row symbols renamed per copy so gotos stay inside their copy
+    import pandas as pd
+    if os.path.exists(fname):
+        return fname
+    base = pd.read_excel(XLSX_FNAME, sheet_name="StateTable")[STATETABLE_COLS]
+    copies = []
+    for copyNum in range(max(1, -(-nrows // len(base)))):
+        df = base.copy()
+        if copyNum:
+            for col in SYMBOL_COLS:
+                df[col] = df[col].map(lambda val: "%s_%d" % (val, copyNum) if isinstance(val, str) and val.startswith("mROW_") else val)
+        copies.append(df)
+    pd.concat(copies).head(nrows).to_excel(fname, sheet_name="StateTable", index=False)
+    return fname
+
+def gen_sounds_xlsx(fname, nrows):
+    # Sounds sheet: half UNIQ recordings that RobotSounds.py turns into espeak jobs, half other sounds
+    import pandas as pd
+    if os.path.exists(fname):
+        return fname
+    rng = random.Random(nrows)
+    words = "the rubber band gun configuration press trigger choose effect sound pattern yellow green red button".split()
+    rows = []
+    for num in range(1, nrows + 1):
+        if num % 2:
+            text = " ".join(rng.choice(words) for idx in range(rng.randint(3, 40))) + "."
+            rows.append({"usage": "unique", "num": num, "File Name": "%04d__mdo47__bench.wav" % num,
+                         "Description": 'mdo47 recording of "%s"' % text, "Mnemonic": "mEFCT_UNIQ_BENCH_%d" % num})
+        else:
+            rows.append({"usage": "shoot", "num": num, "File Name": "%d__someone__bench.wav" % num,
+                         "Description": "freesound", "Mnemonic": ""})
+    rows.append({"usage": "END", "num": "END", "File Name": "END", "Description": "END", "Mnemonic": "END"})
+    columns = ["usage", "num", "File Name", "Description", "all usage", "License", "Who", "URL", "Mnemonic", "#define"]
+    pd.DataFrame(rows, columns=columns).to_excel(fname, sheet_name="Sounds", index=False)
+    return fname
+
+def wav_bytes(variant, frames=64):
+    # a small WAV file; variants have different headers and chunk layouts
+    rate = {"mono22k": 22050, "mono44k": 44100, "mono48k": 48000, "stereo": 44100, "pcm8": 22050,
+            "mono16k": 16000, "fmt18": 22050, "extensible": 44100, "list_first": 22050}[variant]
+    channels = 2 if "stereo" == variant else 1
+    bits = 8 if "pcm8" == variant else 16
+    align = channels * bits // 8
+    fmtBody = struct.pack("<HHIIHH", 1, channels, rate, rate * align, align, bits)
+    if "fmt18" == variant:
+        fmtBody += struct.pack("<H", 0)
+    elif "extensible" == variant:
+        fmtBody = struct.pack("<HHIIHH", 0xFFFE, channels, rate, rate * align, align, bits) + \
+            struct.pack("<HHI", 22, bits, 4) + b"\x01\x00\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71"
+    chunks = [b"fmt " + struct.pack("<I", len(fmtBody)) + fmtBody,
+              b"data" + struct.pack("<I", frames * align) + bytes(frames * align)]
+    if "list_first" == variant:
+        info = b"INFOISFT" + struct.pack("<I", 6) + b"bench\x00"
+        chunks.insert(0, b"LIST" + struct.pack("<I", len(info)) + info)
+    body = b"WAVE" + b"".join(chunks)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+def gen_wav_corpus(dirname, nfiles):
+    variants = ("mono22k", "mono44k", "mono48k", "stereo", "pcm8", "mono16k", "fmt18", "extensible", "list_first")
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname + ".tmp", exist_ok=True)
+        for num in range(nfiles):
+            variant = variants[num % len(variants)]
+            with open(os.path.join(dirname + ".tmp", "%05d_%s.wav" % (num, variant)), 'wb') as fobj:
+                fobj.write(wav_bytes(variant))
+        os.replace(dirname + ".tmp", dirname)
+    return dirname
+
+def gen_copyem_dir(dirname, nfiles):
+    # empty files are enough - copyem.py only looks at the names; every seventh number is a gap
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname + ".tmp", exist_ok=True)
+        for num in range(1, nfiles + 1):
+            if num % 7:
+                open(os.path.join(dirname + ".tmp", "%04d_bench.wav" % num), 'wb').close()
+        open(os.path.join(dirname + ".tmp", SILENCE_FNAME), 'wb').close()
+        os.replace(dirname + ".tmp", dirname)
+    return dirname
+
+def gen_serial_log(fname, nbytes):
+    # looks like the firmware's DEBUG output: runs of repeated lines, blank lines and "--" markers
+    if os.path.exists(fname) and (os.path.getsize(fname) >= nbytes):
+        return fname
+    rng = random.Random(1)
+    templates = ["DEBUG RBG_waitForInput() - tmpVinputRBG 0x%04X nowVinputRBG 0x%04X loopCount %d",
+                 "DEBUG RBG_processStateTable() - row %d restart sound %d loopCount %d",
+                 "DEBUG RBG_startEffectSound() - mySound %d myVolume %d loopCount %d",
+                 "  - blkFlags 0x%04X SPECIAL 0x%04X efctSound %d"]
+    lines = []
+    loopCount = 0
+    while sum(len(ln) + 1 for ln in lines) < 1024 * 1024:
+        template = rng.choice(templates)
+        args = (rng.randint(0, 0xFFFF), rng.randint(0, 0xFFFF))
+        for idx in range(rng.randint(1, 30)):  # the same line with a new loopCount, as the firmware repeats it
+            loopCount += 1
+            lines.append(template % (args + (loopCount,)))
+        if 0 == rng.randint(0, 20):
+            lines.extend(["", "-- state %d" % rng.randint(0, 89), ""])
+    block = ("\n".join(lines) + "\n").encode()
+    with open(fname + ".tmp", 'wb') as fobj:
+        for idx in range(-(-nbytes // len(block))):
+            fobj.write(block)
+    os.replace(fname + ".tmp", fname)
+    return fname
+
+def gen_arduino_dir(dirname, copies):
+    # the real .h and the real .ino repeated; VS_debuggable copies each routine every time it appears
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname + ".tmp", exist_ok=True)
+        with open(os.path.join(RBG_SCIFI_DIR, "RBG_SciFi_StatesAndInputs.h"), 'rt') as fobj:
+            hText = fobj.read()
+        with open(os.path.join(RBG_SCIFI_DIR, "RBG_SciFi.ino"), 'rt') as fobj:
+            inoText = fobj.read()
+        with open(os.path.join(dirname + ".tmp", "RBG_SciFi_StatesAndInputs.h"), 'wt') as fobj:
+            fobj.write(hText)
+        with open(os.path.join(dirname + ".tmp", "RBG_SciFi.ino"), 'wt') as fobj:
+            fobj.write(inoText * copies)
+        os.replace(dirname + ".tmp", dirname)
+    return dirname
+
+
+###################################################################################################
+# the benchmarks - bench_<name>(workdir, size) returns (setup, run, amount of work, unit)
+#
+def bench_statetable(workdir, size):
+    xlsx = gen_state_table_xlsx(os.path.join(workdir, "statetable_%d.xlsx" % size), size)
+    def setup():
+        global makeStateTable
+        importlib.reload(importlib.import_module("makeStateTable_dict"))  # the tables live there
+        makeStateTable = importlib.reload(importlib.import_module("makeStateTable"))
+    return setup, lambda: makeStateTable.make_state_table(xlsx), size, "rows"
+
+def bench_sounds(workdir, size):
+    import RobotSounds
+    xlsx = gen_sounds_xlsx(os.path.join(workdir, "sounds_%d.xlsx" % size), size)
+    return None, lambda: RobotSounds.readSounds(xlsx), size, "rows"
+
+def bench_wavhdr(workdir, size):
+    import WAV_hdr_YX5200
+    dirname = gen_wav_corpus(os.path.join(workdir, "wavs_%d" % size), size)
+    paths = [os.path.join(dirname, fname) for fname in sorted(os.listdir(dirname))]
+    def run():
+        for path in paths:
+            WAV_hdr_YX5200.do_WAV_hdr_YX5200(path)
+    return None, run, size, "files"
+
+def bench_copyem(workdir, size):
+    import copyem
+    dirname = gen_copyem_dir(os.path.join(workdir, "copyem_%d" % size), size)
+    def setup():
+        del copyem.theFnames[:]  # doCopyem appends to this global
+        copyem.maxNum = max(127, size)
+    return setup, lambda: copyem.doCopyem(theFrom=dirname, theSD="H:", fnameSilence=SILENCE_FNAME,
+                                          copyCmd="cp", theSlash="/"), size, "files"
+
+def bench_mdouniq(workdir, size):
+    import mdoUniq
+    fname = gen_serial_log(os.path.join(workdir, "serial_%d.log" % size), size)
+    def run():
+        mdoUniq.mdoUniq(fname, "RBG_", "loopCount")
+        mdoUniq.mdoUniq(fname, "RBG_", "loopCount", 50)
+    return None, run, 2 * size / 1e6, "MB"
+
+def bench_stripblank(workdir, size):
+    import stripblanklns
+    fname = gen_serial_log(os.path.join(workdir, "serial_%d.log" % size), size)
+    def run():
+        stripblanklns.stripblanklns(fname)
+        stripblanklns.stripblanklns(fname, exclude="^  - ", uniq=("RBG_", "loopCount"), window=20)
+    return None, run, 2 * size / 1e6, "MB"
+
+def bench_debuggable(workdir, size):
+    dirname = gen_arduino_dir(os.path.join(workdir, "arduino_%d" % size), size)
+    def setup():
+        global VS_debuggable
+        VS_debuggable = importlib.reload(importlib.import_module("VS_debuggable"))
+        VS_debuggable.file_location_no_trail_slash = dirname
+    return setup, lambda: VS_debuggable.debuggable(), size, "ino copies"
+
+BENCHMARKS = {"statetable": bench_statetable, "sounds": bench_sounds, "wavhdr": bench_wavhdr, "copyem": bench_copyem,
+              "mdouniq": bench_mdouniq, "stripblank": bench_stripblank, "debuggable": bench_debuggable}
+
+
+def time_one(name, workdir, size, repeat):
+    setup, run, amount, unit = BENCHMARKS[name](workdir, size)
+    times = []
+    with open(os.devnull, 'wt') as devnull:
+        for idx in range(repeat):
+            if setup is not None:
+                setup()
+            with contextlib.redirect_stdout(devnull):
+                startTime = time.perf_counter()
+                run()
+                times.append(time.perf_counter() - startTime)
+    best = min(times)
+    return {"bench": name, "size": size, "repeat": repeat, "best_s": round(best, 6),
+            "median_s": round(statistics.median(times), 6), "per_s": round(amount / best, 3) if best else None, "unit": unit}
+
+def git_commit():
+    # short HEAD commit, with -dirty if tracked files differ from it
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=MY_DIR, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, check=True).stdout.decode().strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD", "--"], cwd=MY_DIR, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL).returncode
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("-dirty" if dirty else "")
+
+def compare(results, old, oldfname, threshold):
+    # print new/old best time for every benchmark and size in both; returns number of regressions
+    oldBest = {(res["bench"], res["size"]): res["best_s"] for res in old["results"]}
+    numSlower = 0
+    print("\ncompared with %s (commit %s)" % (oldfname, old.get("commit")))
+    for res in results["results"]:
+        key = (res["bench"], res["size"])
+        if key in oldBest and oldBest[key]:
+            ratio = res["best_s"] / oldBest[key]
+            flag = "  REGRESSION" if ratio > threshold else ""
+            numSlower += 1 if flag else 0
+            print("%-10s %12d  %8.3fs -> %8.3fs  x%.2f%s" % (key[0], key[1], oldBest[key], res["best_s"], ratio, flag))
+    return numSlower
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(prog='rbgBench',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="time the RBG Python tools on generated inputs of several sizes; results go to JSON",
+        epilog="""Example:
+python rbgBench.py --scale quick
+python rbgBench.py --compare bench/rbgBench_94f4e57_20250301-101500.json mdouniq stripblank
+""",
+        usage='%(prog)s [--scale quick|default|large] [--repeat N] [--workdir DIR] [--outdir DIR] [--compare OLD.json] [bench ...]')
+    my_parser.add_argument('bench', nargs='*', help='benchmarks to run (default all): %s' % " ".join(BENCHMARKS))
+    my_parser.add_argument('--scale', choices=sorted(SCALES), default="default", help='set of sizes (default "default")')
+    my_parser.add_argument('--repeat', type=int, default=3, help='runs per size; the best is reported (default 3)')
+    my_parser.add_argument('--workdir', type=str, default="benchdata", help='generated inputs, kept for reuse (default benchdata)')
+    my_parser.add_argument('--outdir', type=str, default="bench", help='JSON results directory (default bench)')
+    my_parser.add_argument('--compare', type=str, default=None, help='earlier JSON results to compare with')
+    my_parser.add_argument('--threshold', type=float, default=1.2, help='slower than this ratio is a regression (default 1.2)')
+    args = my_parser.parse_args()
+
+    names = args.bench or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        sys.stderr.write("unknown benchmark(s) %s\n" % " ".join(unknown))
+        sys.exit(1)
+    old = None
+    if args.compare:  # before this run writes anything
+        with open(args.compare, 'rt') as fobj:
+            old = json.load(fobj)
+    os.makedirs(args.workdir, exist_ok=True)
+    os.makedirs(args.outdir, exist_ok=True)
+    workdir = os.path.abspath(args.workdir)
+
+    startTime = time.localtime()
+    results = {"commit": git_commit(), "date": time.strftime("%Y-%m-%d %H:%M:%S", startTime), "python": platform.python_version(),
+               "machine": platform.machine(), "scale": args.scale, "results": []}
+    for name in names:
+        for size in SCALES[args.scale][name]:
+            res = time_one(name, workdir, size, args.repeat)
+            results["results"].append(res)
+            print("%-10s %12d  best %8.3fs  median %8.3fs  %10.1f %s/s" % (name, size, res["best_s"], res["median_s"],
+                                                                          res["per_s"] or 0, res["unit"]))
+    outfname = os.path.join(args.outdir, "rbgBench_%s_%s.json" % (results["commit"], time.strftime("%Y%m%d-%H%M%S", startTime)))
+    with open(outfname, 'wt') as fobj:
+        json.dump(results, fobj, indent=1)
+    print("results in %s" % outfname)
+    if (old is not None) and compare(results, old, args.compare, args.threshold):
+        sys.exit(1)
@@ -0,0 +1,275 @@
+# rbgBuild.py - one entry point for the RBG toolchain; rebuilds only what is out of date
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# By hand the steps are
+#    python makeStateTable.py > (paste into RBG_SciFi_StatesAndInputs.h)
+#    python RobotSounds.py > (script of espeak commands)
+#    python memBudget.py --table myStateTable.h
+#    python ../WAV_hdr_YX5200/WAV_hdr_YX5200.py one.wav   (once per sound file)
+#    python copyem.py ... > docopyem.sh
+# Here they are targets in a dependency graph, each writing one file in --outdir:
+#    statetable  - StateTable_minimal.xlsx              -> myStateTable.h
+#    tts         - StateTable_minimal.xlsx              -> RobotSounds.sh
+#    membudget   - statetable, RBG_SciFi sources        -> memBudget.txt (fails if SRAM or flash is over budget)
+#    validate    - every *.wav in --sounds              -> wavCheck.txt (fails if any file is not usable on the YX5200)
+#    cardlayout  - validate, the ####_*.wav in --sounds -> docopyem.sh
+# validate and cardlayout are left out when there is no --sounds directory.
+#
+# Each target's fingerprint is its command line plus size, mtime and sha256 of every input (including the tool's own
+#    source) and of its output; they are kept in rbgBuild.json in --outdir.
+#    A file whose size and mtime match the fingerprint is not re-hashed; a file that was touched but is unchanged
+#    is hashed once and its new mtime remembered. Targets that match are skipped.
+# Targets whose dependencies are done run at the same time on a thread pool (the tools run as subprocesses).
+# The tools are only imported when they run, so a rebuild with nothing to do takes about as long as stat() of the inputs.
+#
+
+import argparse
+import concurrent.futures
+import contextlib
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+MY_DIR = os.path.dirname(os.path.realpath(__file__))
+WAV_HDR_DIR = os.path.join(os.path.dirname(MY_DIR), "WAV_hdr_YX5200")
+STAMP_FNAME = "rbgBuild.json"
+HASH_BLOCKSIZE = 1024 * 1024
+
+
+###################################################################################################
+# fingerprints
+#
+def file_sig(path, oldSig):
+    """file_sig - [size, mtime_ns, sha256] of a file; the hash is reused from oldSig if size and mtime match
+    :return: list, or None if the file does not exist
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if oldSig and (oldSig[0] == st.st_size) and (oldSig[1] == st.st_mtime_ns):
+        return oldSig
+    sha = hashlib.sha256()
+    with open(path, 'rb') as fobj:
+        for block in iter(lambda: fobj.read(HASH_BLOCKSIZE), b""):
+            sha.update(block)
+    return [st.st_size, st.st_mtime_ns, sha.hexdigest()]
+
+def same_content(sigs, oldSigs):
+    # same set of files with the same hashes (mtime may differ)
+    return (sigs.keys() == oldSigs.keys()) and all(
+        (sigs[path] is not None) and (oldSigs[path] is not None) and (sigs[path][2] == oldSigs[path][2]) for path in sigs)
+
+def wav_files(dirname):
+    return sorted(os.path.join(dirname, fname) for fname in os.listdir(dirname) if fname.lower().endswith(".wav"))
+
+
+###################################################################################################
+# the actions - each writes its output file and returns a short note
+#
+def run_tool(cmd, outfname):
+    # run a tool that prints its result on stdout; the output file only appears if the tool succeeds,
+    #    and is only rewritten if the result is different
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=MY_DIR)
+    if 0 != result.returncode:
+        raise RuntimeError("%s failed: %s" % (os.path.basename(cmd[1]), result.stderr.decode(errors='replace').strip()))
+    for line in result.stderr.decode(errors='replace').splitlines(): # pass on the summary when RBG_PROFILE is set
+        if line.startswith("RBG_PROFILE "):
+            sys.stderr.write(line + "\n")
+    try:
+        with open(outfname, 'rb') as fobj:
+            if fobj.read() == result.stdout:
+                return "%d bytes, unchanged" % len(result.stdout)  # keep the timestamp for whatever uses the file
+    except OSError:
+        pass
+    tmpfname = outfname + ".tmp"
+    with open(tmpfname, 'wb') as fobj:
+        fobj.write(result.stdout)
+    os.replace(tmpfname, outfname)
+    return "%d bytes" % len(result.stdout)
+
+def check_wavs(sounds, outfname):
+    # WAV_hdr_YX5200 on every file, in this process; it prints its findings so they are captured
+    sys.path.insert(0, WAV_HDR_DIR)
+    import WAV_hdr_YX5200
+    numBad = 0
+    try:
+        with open(outfname + ".tmp", 'wt') as fobj:
+            for path in wav_files(sounds):
+                text = io.StringIO()
+                try:
+                    with contextlib.redirect_stdout(text):
+                        WAV_hdr_YX5200.do_WAV_hdr_YX5200(path)
+                except Exception as err:  # a truncated header, for instance, is just a bad file
+                    text.write("\nERROR in %s: WAV file not usable with YX5200 Audio Module (%s: %s)\n\n" % (path, type(err).__name__, err))
+                fobj.write(text.getvalue())
+                if "not usable" in text.getvalue():
+                    numBad += 1
+        os.replace(outfname + ".tmp", outfname)
+    finally:
+        if os.path.exists(outfname + ".tmp"):
+            os.remove(outfname + ".tmp")
+    if numBad:
+        raise RuntimeError("%d WAV files not usable with the YX5200 - see %s" % (numBad, outfname))
+    return "all usable"
+
+
+def make_targets(args):
+    """make_targets - the dependency graph
+    :return: dict of name -> dict(deps, inputs, output, cmd, action)
+    """
+    py = sys.executable
+    xlsx = os.path.abspath(args.xlsx)
+    tableFname = os.path.join(os.path.abspath(args.outdir), "myStateTable.h")
+    targets = {
+        "statetable": {"deps": [], "inputs": [xlsx, os.path.join(MY_DIR, "makeStateTable.py"), os.path.join(MY_DIR, "makeStateTable_dict.py")],
+                       "output": "myStateTable.h", "cmd": [py, os.path.join(MY_DIR, "makeStateTable.py"), xlsx] + (["--minimize"] if args.minimize_table else [])},
+        "tts": {"deps": [], "inputs": [xlsx, os.path.join(MY_DIR, "RobotSounds.py")],
+                "output": "RobotSounds.sh", "cmd": [py, os.path.join(MY_DIR, "RobotSounds.py"), "--xlsx", xlsx]},
+        "membudget": {"deps": ["statetable"],
+                      "inputs": [tableFname, os.path.join(MY_DIR, "memBudget.py"), os.path.join(MY_DIR, "parseRBGheaders.py")] +
+                                [os.path.join(MY_DIR, "RBG_SciFi", fname) for fname in sorted(os.listdir(os.path.join(MY_DIR, "RBG_SciFi")))
+                                 if fname.endswith((".h", ".ino", ".cpp"))],
+                      "output": "memBudget.txt",
+                      "cmd": [py, os.path.join(MY_DIR, "memBudget.py"), "--table", tableFname, "--ram_budget", str(args.ram_budget),
+                              "--code_bytes", str(args.code_bytes)]},
+    }
+    if args.sounds:
+        sounds = os.path.abspath(args.sounds)
+        wavs = wav_files(sounds)
+        targets["validate"] = {"deps": [], "inputs": wavs + [os.path.join(WAV_HDR_DIR, "WAV_hdr_YX5200.py")],
+                               "output": "wavCheck.txt", "cmd": ["WAV_hdr_YX5200", sounds],
+                               "action": lambda outfname: check_wavs(sounds, outfname)}
+        targets["cardlayout"] = {"deps": ["validate"], "inputs": wavs + [os.path.join(MY_DIR, "copyem.py")],
+                                 "output": "docopyem.sh",
+                                 "cmd": [py, os.path.join(MY_DIR, "copyem.py"), "-d", sounds, "-s", args.sd_disk,
+                                         "-f", args.fname_silence, "--windows" if args.windows else "--linux"]}
+    for name, target in targets.items():
+        target["output"] = os.path.join(os.path.abspath(args.outdir), target["output"])
+        if "action" not in target:
+            target["action"] = lambda outfname, cmd=target["cmd"]: run_tool(cmd, outfname)
+    return targets
+
+
+###################################################################################################
+# build(targets, stampfname, ...) - run what is out of date, dependencies first, independent targets together
+#
+# returns True if every target is up to date or was built
+#
+def build(targets, stampfname, force=False, numJobs=None):
+    try:
+        with open(stampfname, 'rt') as fobj:
+            stamps = json.load(fobj)
+    except (OSError, ValueError):
+        stamps = {}
+
+    def up_to_date(name):
+        target = targets[name]
+        old = stamps.get(name)
+        if force or (old is None) or (old["cmd"] != target["cmd"]):
+            return False
+        sigs = {path: file_sig(path, old["inputs"].get(path)) for path in target["inputs"]}
+        outSig = file_sig(target["output"], old["output"])
+        if (outSig is None) or (outSig[2] != old["output"][2]) or not same_content(sigs, old["inputs"]):
+            return False
+        old.update(inputs=sigs, output=outSig)  # remember new mtimes of touched-but-same files
+        return True
+
+    def run(name):
+        target = targets[name]
+        old = stamps.get(name, {"inputs": {}})
+        sigs = {path: file_sig(path, old["inputs"].get(path)) for path in target["inputs"]}
+        startTime = time.time()
+        note = target["action"](target["output"])
+        # inputs are fingerprinted before running, so a change made while the tool runs is seen next time
+        return {"cmd": target["cmd"], "inputs": sigs, "output": file_sig(target["output"], None)}, \
+            "%s (%.1f sec)" % (note, time.time() - startTime)
+
+    done = set()
+    failed = set()
+    running = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=numJobs) as executor:
+        while (len(done) + len(failed)) < len(targets):
+            for name, target in targets.items():
+                if (name in done) or (name in failed) or (name in running.values()):
+                    continue
+                if any(dep in failed for dep in target["deps"]):
+                    failed.add(name)
+                    sys.stderr.write("%-10s not built - a dependency failed\n" % name)
+                elif all(dep in done for dep in target["deps"]):
+                    if up_to_date(name):
+                        done.add(name)
+                        sys.stderr.write("%-10s up to date\n" % name)
+                    else:
+                        running[executor.submit(run, name)] = name
+            if not running:
+                continue
+            finished, pending = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    stamps[name], note = future.result()
+                    done.add(name)
+                    sys.stderr.write("%-10s built %s: %s\n" % (name, os.path.basename(targets[name]["output"]), note))
+                except Exception as err:  # anything a target raises fails just that target; the stamps are still saved
+                    stamps.pop(name, None)
+                    failed.add(name)
+                    if not isinstance(err, (RuntimeError, OSError)):
+                        err = "%s: %s" % (type(err).__name__, err)
+                    sys.stderr.write("%-10s FAILED: %s\n" % (name, err))
+
+    tmpfname = stampfname + ".tmp"
+    with open(tmpfname, 'wt') as fobj:
+        json.dump(stamps, fobj, indent=1, sort_keys=True)
+    os.replace(tmpfname, stampfname)
+    return 0 == len(failed)
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(prog='rbgBuild',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="build the RBG generated files (state table, espeak script, WAV check, SD card copy script)\n" +
+                    "   only targets whose inputs changed are rebuilt; independent targets run at the same time",
+        epilog="""Example:
+python rbgBuild.py
+python rbgBuild.py --sounds D:/svnNew/SoundsSciFi/SoundsRecordedMDO/secondCut --sd-disk H: statetable cardlayout
+""",
+        usage='%(prog)s [--outdir DIR] [--xlsx FILE] [--sounds DIR [--sd-disk SD] [--fname-silence FNAME] [--windows]] [--ram-budget BYTES] [--code-bytes BYTES] [--minimize-table] [--force] [--jobs N] [target ...]')
+    my_parser.add_argument('target', nargs='*', help='targets to build with their dependencies (default all)')
+    my_parser.add_argument('--outdir', type=str, default="build", help='directory for the generated files (default build)')
+    my_parser.add_argument('--xlsx', type=str, default=os.path.join(MY_DIR, "StateTable_minimal.xlsx"), help='state table spreadsheet')
+    my_parser.add_argument('--sounds', type=str, default=None, help='directory of ####_*.wav sounds (enables validate and cardlayout)')
+    my_parser.add_argument('--sd-disk', type=str, default="H:", help='SD card for docopyem.sh (default H:)')
+    my_parser.add_argument('--fname-silence', type=str, default="0069__mdo47__silence.wav", help='silence file for copyem.py gaps')
+    my_parser.add_argument('--windows', action='store_true', help='copy commands for Windows instead of Linux')
+    my_parser.add_argument('--ram-budget', type=int, default=1536, help='SRAM budget for memBudget.py (default 1536)')
+    my_parser.add_argument('--code-bytes', type=int, default=0, help='program code size for the memBudget.py flash check (default 0)')
+    my_parser.add_argument('--minimize-table', action='store_true', help='merge equivalent state table blocks (makeStateTable.py --minimize)')
+    my_parser.add_argument('--force', action='store_true', help='rebuild even if up to date')
+    my_parser.add_argument('--jobs', type=int, default=None, help='targets run at the same time (default from the thread pool)')
+    args = my_parser.parse_args()
+
+    os.makedirs(args.outdir, exist_ok=True)
+    targets = make_targets(args)
+    wanted = set(args.target or targets)
+    unknown = wanted - set(targets)
+    if unknown:
+        sys.stderr.write("unknown target(s) %s; known: %s\n" % (" ".join(sorted(unknown)), " ".join(targets)))
+        sys.exit(1)
+    while True:  # add dependencies of wanted targets
+        more = set(dep for name in wanted for dep in targets[name]["deps"]) - wanted
+        if not more:
+            break
+        wanted |= more
+    startTime = time.time()
+    allOk = build({name: targets[name] for name in targets if name in wanted},
+                  os.path.join(args.outdir, STAMP_FNAME), args.force, args.jobs)
+    sys.stderr.write("%.2f seconds\n" % (time.time() - startTime))
+    if not allOk:
+        sys.exit(1)
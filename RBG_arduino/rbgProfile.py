@@ -0,0 +1,139 @@
+# rbgProfile.py - optional timing, cProfile and tracemalloc for the RBG Python tools
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# A tool calls rbgProfile.setup("toolName") at the start of __main__ and rbgProfile.lap("phase name") where each
+#    phase begins ("xlsx load", "pass 1", "pass 2", "emit", ...); a phase ends where the next one starts or at exit.
+#    Nothing is measured unless profiling is switched on, and then lap() is a few microseconds.
+#
+# Switch it on with the environment variable or with a flag anywhere on the tool's command line
+#    (the flag is removed before the tool's own argument parsing sees it):
+#       RBG_PROFILE=1                        or  --rbg-profile          - per-phase wall and CPU time
+#       RBG_PROFILE=cprofile,tracemalloc     or  --rbg-profile=cprofile,tracemalloc
+#          cprofile    - also run cProfile; the top functions go in the summary and all stats to <tool>.prof
+#          tracemalloc - also the peak Python memory of each phase
+#          all         - both
+# At exit one line of JSON goes to stderr, starting with "RBG_PROFILE " so it is easy to grep out of a build log
+#    (stdout is left alone - most of the tools write their product there).
+#    RBG_PROFILE_OUT=file.jsonl appends the JSON line to that file instead.
+# The environment variable is inherited, so setting it for rbgBuild.py profiles every tool the build runs.
+#
+
+import atexit
+import json
+import os
+import sys
+import time
+
+ENV_VAR = "RBG_PROFILE"
+ENV_OUT = "RBG_PROFILE_OUT"
+FLAG = "--rbg-profile"
+PREFIX = "RBG_PROFILE "
+TOP_FUNCTIONS = 15
+
+_state = {"enabled": False}
+
+
+def _options(argv):
+    # options from the flag (removed from argv) or the environment; None if profiling is off
+    opts = None
+    for arg in list(argv[1:]):
+        if (FLAG == arg) or arg.startswith(FLAG + "="):
+            argv.remove(arg)
+            opts = arg[len(FLAG) + 1:] or "1"
+    if opts is None:
+        opts = os.environ.get(ENV_VAR, "")
+        if opts in ("", "0"):
+            return None
+    opts = set(opt.strip().lower() for opt in opts.split(","))
+    if "all" in opts:
+        opts |= {"cprofile", "tracemalloc"}
+    return opts
+
+def setup(tool, argv=None):
+    """setup - turn profiling on if asked for by flag or environment; call once at the start of __main__
+    :param tool: name used in the summary and for the .prof file
+    :param argv: argument list to take the flag out of (default sys.argv)
+    """
+    opts = _options(sys.argv if argv is None else argv)
+    if opts is None:
+        return
+    _state.update(enabled=True, tool=tool, argv=list(sys.argv[1:]), phases={}, order=[], current=None,
+                  startWall=time.perf_counter(), startCpu=time.process_time(), profiler=None, tracemalloc=None)
+    if "tracemalloc" in opts:
+        import tracemalloc
+        tracemalloc.start()
+        _state["tracemalloc"] = tracemalloc
+    if "cprofile" in opts:
+        import cProfile
+        _state["profiler"] = cProfile.Profile()
+        _state["profiler"].enable()
+    atexit.register(report)
+
+def enabled():
+    return _state["enabled"]
+
+def lap(name):
+    """lap - end the current phase (if any) and start phase name; phases with the same name add up"""
+    if not _state["enabled"]:
+        return
+    stop()
+    if name not in _state["phases"]:
+        _state["phases"][name] = {"phase": name, "calls": 0, "wall_s": 0.0, "cpu_s": 0.0}
+        _state["order"].append(name)
+    if _state["tracemalloc"] is not None:
+        _state["tracemalloc"].reset_peak()
+    _state["current"] = (name, time.perf_counter(), time.process_time())
+
+def stop():
+    """stop - end the current phase; time after this is not in any phase"""
+    if (not _state["enabled"]) or (_state["current"] is None):
+        return
+    name, startWall, startCpu = _state["current"]
+    phase = _state["phases"][name]
+    phase["calls"] += 1
+    phase["wall_s"] += time.perf_counter() - startWall
+    phase["cpu_s"] += time.process_time() - startCpu
+    if _state["tracemalloc"] is not None:
+        peakKb = _state["tracemalloc"].get_traced_memory()[1] / 1024.0
+        phase["peak_kb"] = round(max(phase.get("peak_kb", 0.0), peakKb), 1)
+    _state["current"] = None
+
+
+def summary():
+    """summary - dict of everything measured so far (what report() writes)"""
+    stop()
+    result = {"tool": _state["tool"], "argv": _state["argv"], "pid": os.getpid(),
+              "total_wall_s": round(time.perf_counter() - _state["startWall"], 6),
+              "total_cpu_s": round(time.process_time() - _state["startCpu"], 6),
+              "phases": [dict(_state["phases"][name], wall_s=round(_state["phases"][name]["wall_s"], 6),
+                              cpu_s=round(_state["phases"][name]["cpu_s"], 6)) for name in _state["order"]]}
+    if _state["tracemalloc"] is not None:
+        result["peak_kb"] = round(_state["tracemalloc"].get_traced_memory()[1] / 1024.0, 1)
+    if _state["profiler"] is not None:
+        import pstats
+        _state["profiler"].disable()
+        profName = "%s.prof" % _state["tool"]
+        _state["profiler"].dump_stats(profName)
+        stats = pstats.Stats(_state["profiler"])
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+        result["prof_file"] = os.path.abspath(profName)
+        result["top_cumulative"] = [{"function": "%s:%d(%s)" % (os.path.basename(func[0]), func[1], func[2]),
+                                     "ncalls": nc, "tottime_s": round(tt, 6), "cumtime_s": round(ct, 6)}
+                                    for func, (cc, nc, tt, ct, callers) in top]
+    return result
+
+def report():
+    # atexit: one JSON line to stderr or appended to RBG_PROFILE_OUT
+    if not _state["enabled"]:
+        return
+    line = json.dumps(summary())
+    _state["enabled"] = False
+    outfname = os.environ.get(ENV_OUT)
+    if outfname:
+        with open(outfname, 'at') as fobj:
+            fobj.write(line + "\n")
+    else:
+        sys.stderr.write(PREFIX + line + "\n")
+        sys.stderr.flush()
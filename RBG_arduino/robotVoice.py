@@ -0,0 +1,205 @@
+# robotVoice.py - the RobotSounds.py Audacity "robot voice" recipe done offline with NumPy
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# RobotSounds.py documents the steps done by hand in Audacity on each espeak output file:
+#    set to mono; duplicate the track
+#    reverse the duplicate and change its pitch -2 semitones
+#    echo both tracks (delay about 0.01 sec, decay factor about 0.5)
+#    reverse the duplicate back, mix the two tracks, save as 22050Hz mono signed 16-bit PCM WAV
+# This does the same to every raw_*.wav in a directory (RobotSounds.py --execute makes them), in parallel.
+#
+# Everything is whole-array NumPy:
+#    resampling is FFT-based on 50% overlapped Hann-windowed blocks, all blocks in one 2-D rfft/irfft
+#    pitch change (keeping the duration, as Audacity Change Pitch does) = resample, then a phase-vocoder
+#       time stretch back to the original length; the phase accumulation is a cumsum across frames
+#    echo is the Audacity comb filter y[n] = x[n] + decay * y[n - delay]; it is solved delay-sized rows at a time
+#       with a scaled cumsum, in chunks so the scaling cannot overflow
+# If the mix would clip it is scaled down to full scale (Audacity would clip it).
+#
+
+import argparse
+import concurrent.futures
+import fnmatch
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+OUT_RATE = 22050
+RESAMPLE_BLOCK = 4096    # samples per resampling block (before resampling)
+STFT_SIZE = 1024         # phase vocoder frame
+STFT_HOP = STFT_SIZE // 4
+ECHO_ROWS_PER_CHUNK = 32  # decay ** -32 still fits easily in a float64
+
+
+###################################################################################################
+# WAV file in and out - PCM 8/16/24/32 bit; returned as float64 mono in [-1, 1)
+#
+def pcm_to_float(raw, sampwidth):
+    # raw bytes from wave readframes() -> float64 samples (channels still interleaved)
+    if 1 == sampwidth:
+        return (np.frombuffer(raw, dtype=np.uint8).astype(np.float64) - 128.0) / 128.0
+    if 3 == sampwidth:
+        bytes3 = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        return ((bytes3[:, 0] | (bytes3[:, 1] << 8) | (bytes3[:, 2] << 16)) << 8 >> 8) / float(1 << 23)
+    dtype = {2: "<i2", 4: "<i4"}[sampwidth]
+    return np.frombuffer(raw, dtype=dtype).astype(np.float64) / float(1 << (8 * sampwidth - 1))
+
+def float_to_pcm16(data):
+    return np.clip(np.round(data * 32768.0), -32768, 32767).astype("<i2").tobytes()
+
+def read_wav_mono(fname):
+    with wave.open(fname, 'rb') as wobj:
+        channels, sampwidth, rate = wobj.getnchannels(), wobj.getsampwidth(), wobj.getframerate()
+        raw = wobj.readframes(wobj.getnframes())
+    return pcm_to_float(raw, sampwidth).reshape(-1, channels).mean(axis=1), rate
+
+def write_wav_16(fname, data, rate):
+    with wave.open(fname, 'wb') as wobj:
+        wobj.setnchannels(1)
+        wobj.setsampwidth(2)
+        wobj.setframerate(rate)
+        wobj.writeframes(float_to_pcm16(data))
+
+
+###################################################################################################
+# overlap_add(frames, hop) - sum frames (rows) spaced hop apart; frame length must be a multiple of hop
+#
+# frames that are (frame length / hop) apart do not overlap, so each of those interleaved sets is a plain reshape
+#
+def overlap_add(frames, hop):
+    numFrames, frameLen = frames.shape
+    out = np.zeros((numFrames - 1) * hop + frameLen)
+    step = frameLen // hop
+    for first in range(step):
+        group = frames[first::step]
+        out[first * hop:first * hop + group.size] += group.reshape(-1)
+    return out
+
+def resample(data, factor):
+    """resample - FFT resampling of 50% overlapped Hann blocks; len(result) is about len(data) * factor
+    :param data: 1-D float array
+    :param factor: output samples per input sample
+    """
+    blockIn = RESAMPLE_BLOCK
+    blockOut = 2 * max(1, int(round(blockIn * factor / 2)))  # even so the output hop is exact
+    hopIn, hopOut = blockIn // 2, blockOut // 2
+    numBlocks = max(1, int(np.ceil(len(data) / hopIn)) + 1)
+    padded = np.zeros((numBlocks + 1) * hopIn)
+    padded[hopIn:hopIn + len(data)] = data  # one hop of lead-in so the first samples get a full window sum
+    idx = np.arange(blockIn)[None, :] + hopIn * np.arange(numBlocks)[:, None]
+    blocks = padded[idx] * np.hanning(blockIn + 1)[:-1]  # periodic Hann: 50% overlap sums to 1
+    spec = np.fft.rfft(blocks, axis=1)
+    nKeep = min(spec.shape[1], blockOut // 2 + 1)
+    specOut = np.zeros((numBlocks, blockOut // 2 + 1), dtype=complex)
+    specOut[:, :nKeep] = spec[:, :nKeep]
+    out = overlap_add(np.fft.irfft(specOut, n=blockOut, axis=1) * (blockOut / blockIn), hopOut)
+    return out[hopOut:hopOut + int(round(len(data) * blockOut / blockIn))]
+
+def time_stretch(data, rate):
+    """time_stretch - phase vocoder; len(result) is about len(data) / rate, pitch unchanged"""
+    if len(data) < STFT_SIZE:
+        data = np.concatenate([data, np.zeros(STFT_SIZE - len(data))])
+    window = np.hanning(STFT_SIZE + 1)[:-1]
+    numFrames = 1 + (len(data) - STFT_SIZE) // STFT_HOP
+    idx = np.arange(STFT_SIZE)[None, :] + STFT_HOP * np.arange(numFrames)[:, None]
+    spec = np.fft.rfft(data[idx] * window, axis=1).T  # bins x frames
+    spec = np.concatenate([spec, np.zeros((spec.shape[0], 2), dtype=complex)], axis=1)
+
+    steps = np.arange(0, numFrames, rate)
+    left = np.floor(steps).astype(int)
+    frac = steps - left
+    mag = (1.0 - frac) * np.abs(spec[:, left]) + frac * np.abs(spec[:, left + 1])
+    expected = 2.0 * np.pi * STFT_HOP * np.arange(spec.shape[0]) / STFT_SIZE
+    dphase = np.angle(spec[:, left + 1]) - np.angle(spec[:, left]) - expected[:, None]
+    dphase -= 2.0 * np.pi * np.round(dphase / (2.0 * np.pi))
+    phase = np.angle(spec[:, :1]) + np.concatenate([np.zeros((spec.shape[0], 1)),
+                                                    np.cumsum(expected[:, None] + dphase, axis=1)[:, :-1]], axis=1)
+    frames = np.fft.irfft((mag * np.exp(1j * phase)).T, n=STFT_SIZE, axis=1) * window
+    out = overlap_add(frames, STFT_HOP)
+    norm = overlap_add(np.tile(window ** 2, (len(steps), 1)), STFT_HOP)
+    return out / np.maximum(norm, 1e-8)
+
+def pitch_shift(data, semitones):
+    # lower/raise the pitch, keeping the length: resample then stretch back
+    factor = 2.0 ** (-semitones / 12.0)  # -2 semitones: play 1.12x slower
+    shifted = time_stretch(resample(data, factor), factor)
+    out = np.zeros(len(data))
+    out[:min(len(data), len(shifted))] = shifted[:len(data)]
+    return out
+
+def echo(data, delay, decay):
+    """echo - y[n] = x[n] + decay * y[n - delay], same length as x (Audacity Echo)"""
+    if (delay <= 0) or (0 == decay) or (len(data) <= delay):
+        return data.copy()
+    numRows = int(np.ceil(len(data) / delay))
+    rows = np.zeros(numRows * delay)
+    rows[:len(data)] = data
+    rows = rows.reshape(numRows, delay)  # row k only feeds row k+1: y_k = x_k + decay * y_(k-1)
+    out = np.empty_like(rows)
+    carry = np.zeros(delay)
+    for start in range(0, numRows, ECHO_ROWS_PER_CHUNK):
+        chunk = rows[start:start + ECHO_ROWS_PER_CHUNK]
+        powers = decay ** np.arange(1, len(chunk) + 1)[:, None]
+        # y_k = decay^k * (carry + sum_{j<=k} x_j / decay^j) with k counted from 1 in the chunk
+        out[start:start + len(chunk)] = powers * (carry + np.cumsum(chunk / powers, axis=0))
+        carry = out[start + len(chunk) - 1]
+    return out.reshape(-1)[:len(data)]
+
+
+###################################################################################################
+# robot_voice(data, rate, ...) - the whole Audacity recipe; returns (data, rate)
+#
+def robot_voice(data, rate, semitones=-2.0, delaySec=0.01, decay=0.5, outRate=OUT_RATE):
+    delay = int(round(delaySec * rate))
+    straight = echo(data, delay, decay)
+    dup = echo(pitch_shift(data[::-1], semitones), delay, decay)[::-1]
+    mixed = straight + dup
+    peak = np.max(np.abs(mixed)) if len(mixed) else 0.0
+    if peak > 32767.0 / 32768.0:
+        mixed *= (32767.0 / 32768.0) / peak
+    if rate != outRate:
+        mixed = resample(mixed, outRate / float(rate))
+    return mixed, outRate
+
+def process_file(infname, outfname, semitones, delaySec, decay, outRate):
+    data, rate = read_wav_mono(infname)
+    data, rate = robot_voice(data, rate, semitones, delaySec, decay, outRate)
+    write_wav_16(outfname, data, rate)
+    return outfname
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(prog='robotVoice',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="apply the RobotSounds.py Audacity robot-voice recipe to every matching WAV in indir\n" +
+                    "   output is 22050Hz mono 16-bit PCM in outdir, named without the raw_ prefix",
+        epilog="""Example:
+python RobotSounds.py --execute --outdir raw
+python robotVoice.py raw robot
+""",
+        usage='%(prog)s [--pattern GLOB] [--semitones N] [--delay SEC] [--decay D] [--jobs N] indir outdir')
+    my_parser.add_argument('indir', type=str, help='directory of input WAV files')
+    my_parser.add_argument('outdir', type=str, help='directory for output WAV files')
+    my_parser.add_argument('--pattern', type=str, default="raw_*.wav", help='input file name pattern (default raw_*.wav)')
+    my_parser.add_argument('--semitones', type=float, default=-2.0, help='pitch change of the reversed copy (default -2)')
+    my_parser.add_argument('--delay', type=float, default=0.01, help='echo delay in seconds (default 0.01)')
+    my_parser.add_argument('--decay', type=float, default=0.5, help='echo decay factor (default 0.5)')
+    my_parser.add_argument('--rate', type=int, default=OUT_RATE, help='output sample rate (default %d)' % OUT_RATE)
+    my_parser.add_argument('--jobs', type=int, default=None, help='parallel jobs (default number of CPUs)')
+    args = my_parser.parse_args()
+
+    os.makedirs(args.outdir, exist_ok=True)
+    fnames = sorted(fname for fname in os.listdir(args.indir) if fnmatch.fnmatch(fname, args.pattern))
+    startTime = time.time()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [executor.submit(process_file, os.path.join(args.indir, fname),
+                                   os.path.join(args.outdir, fname[4:] if fname.startswith("raw_") else fname),
+                                   args.semitones, args.delay, args.decay, args.rate) for fname in fnames]
+        for future in concurrent.futures.as_completed(futures):
+            future.result()
+    sys.stderr.write("%d files in %.1f seconds\n" % (len(fnames), time.time() - startTime))
@@ -0,0 +1,295 @@
+# slotAlloc.py - choose SD card slot numbers for the RBG sounds so copyem.py needs the fewest silence fillers
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# copyem.py copies every slot from 001 up to the highest sound number, filling each gap with the silence file.
+# The EFFECT_MAP ranges in RBG_SciFi_StatesAndInputs.h decide what may go where:
+#    mEFCT_WIND_UP 0, mEFCT_SHOOT 10, ... mEFCT_WAIT 50 - EEPROM configurable; choice N of a type is slot type+N
+#       so each of these is packed to type+1, type+2, ... in its current order (and cfgMaxSoundForType follows)
+#    mEFCT_UNIQ 60 - 061 to 127, each sound is named by its own #define
+# No sound may be on a multiple of ten: EFCT_IS_EEP() treats those as "use the EEPROM choice for this type".
+# Some UNIQ sounds are also reached by arithmetic inside a decade, for instance
+#    myState.cfg_type = EEPOFFSET(mEFCT_UNIQ_CFG_WINDUP_DESCRIP)*10 then + type offset
+#    mEFCT_UNIQ_CFG_MGMT_01 - EFCT_TYPE_OFFSET(mEFCT_UNIQ_CFG_MGMT_01) then + choice
+# Every mEFCT_UNIQ_* the .ino uses inside EEPOFFSET() or EFCT_TYPE_OFFSET() marks its decade: the run of sounds
+#    from offset 1 of that decade is a block that moves as a whole and keeps its offsets.
+# The other UNIQ sounds are free and fill the holes after the blocks, lowest slot first.
+# Every order of the blocks is tried; the one with the lowest highest slot wins (fewest fillers and bytes),
+#    ties going to the one that renumbers the fewest sounds.
+#
+# The sounds come from the soundCatalog.py database: the Sounds sheet plus any numbered WAV files found.
+# Output
+#    a renaming plan CSV (old and new number and file name for every slot, fillers included)
+#    the matching #define lines and cfgMaxSoundForType to paste into RBG_SciFi_StatesAndInputs.h
+#    with --script, a shell script of two-phase mv commands that renumbers the ####_*.wav source files;
+#       only files in the catalog's files table whose #### is the sound's number and whose number changes
+#    with --filler_ms, a short silent WAV to use as the filler instead of the (longer) silence sound
+#
+
+import argparse
+import csv
+import itertools
+import os
+import re
+import sys
+import wave
+
+import parseRBGheaders
+import soundCatalog
+
+MAX_NUM = 127  # same as copyem.py maxNum
+EEP_TYPES = ("mEFCT_WIND_UP", "mEFCT_SHOOT", "mEFCT_OPEN_BARREL", "mEFCT_LOCK_LOAD", "mEFCT_PWRON", "mEFCT_WAIT")
+UNIQ_BASE = 60  # mEFCT_UNIQ
+FILLER_RATE = 22050
+WAV_HEADER_BYTES = 44
+PLAN_COLUMNS = ("new_num", "old_num", "type", "mnemonic", "old_fname", "new_fname", "bytes")
+
+RE_DECADE_ARITH = re.compile(r'(?:EEPOFFSET|EFCT_TYPE_OFFSET)\(\s*(mEFCT_UNIQ_\w+)\s*\)')
+RE_SOURCE_FNAME = re.compile(r'^(\d{4})_.*\.wav$', re.IGNORECASE)
+
+
+###################################################################################################
+# read_sounds(conn) - dict of old num -> sound dict from the catalog
+#
+# source is True if path is a ####_*.wav file whose #### is the sound's number - the only files --script renames
+#
+def is_source_file(path, num):
+    match = RE_SOURCE_FNAME.match(os.path.basename(path)) if path else None
+    return (match is not None) and (int(match.group(1)) == num)
+
+def read_sounds(conn):
+    sounds = {}
+    for row in conn.execute("SELECT num, mnemonic, fname AS sheet_fname, NULL AS path, NULL AS size FROM sounds "
+                            "UNION ALL SELECT num, NULL, NULL, path, size FROM files ORDER BY num"):
+        snd = sounds.setdefault(row["num"], {"num": row["num"], "mnemonic": None, "fname": None, "path": None, "size": None,
+                                             "source": False})
+        if row["mnemonic"] is not None:
+            snd["mnemonic"] = row["mnemonic"]
+        if (row["path"] is not None) and (snd["path"] is None or is_source_file(row["path"], row["num"])):
+            snd["path"], snd["size"] = row["path"], row["size"]  # prefer ####_*.wav over ###.wav for the renaming
+            snd["source"] = is_source_file(row["path"], row["num"])
+        if snd["fname"] is None:
+            snd["fname"] = row["sheet_fname"]
+    for snd in sounds.values():
+        if snd["path"] is not None:
+            snd["fname"] = os.path.basename(snd["path"])
+    return {num: snd for num, snd in sounds.items() if 0 < num <= MAX_NUM}
+
+def decade_anchors(inoname, defines):
+    # decades (as multiples of 10) whose sounds the firmware reaches by arithmetic
+    with open(inoname, 'rt', errors='replace') as fobj:
+        names = set(RE_DECADE_ARITH.findall(fobj.read()))
+    anchors = set()
+    for name in names:
+        if name in defines:
+            anchors.add(10 * (parseRBGheaders.eval_define(defines[name], defines) // 10))
+    return anchors
+
+
+###################################################################################################
+# allocation
+#
+def allocate_eep(sounds):
+    """allocate_eep - pack each EEPROM type to type+1, type+2, ... in the current order
+    :return: (dict old num -> new num, list of count per type)
+    """
+    newNums = {}
+    counts = []
+    for typeIdx in range(len(EEP_TYPES)):
+        base = 10 * typeIdx
+        members = sorted(num for num in sounds if base < num < base + 10)
+        for offset, num in enumerate(members, start=1):
+            newNums[num] = base + offset
+        counts.append(len(members))
+    return newNums, counts
+
+def uniq_blocks(sounds, anchors):
+    """uniq_blocks - split the UNIQ sounds into fixed-offset blocks and free sounds
+    :return: (list of blocks, each a list of old nums at offsets 1..n; list of free old nums)
+    """
+    blocks = []
+    free = []
+    for decade in range(UNIQ_BASE, MAX_NUM + 1, 10):
+        members = sorted(num for num in sounds if decade < num < decade + 10)
+        run = []
+        if decade in anchors:
+            while (decade + len(run) + 1) in members:
+                run.append(decade + len(run) + 1)
+            blocks.append(run)
+        free.extend(num for num in members if num not in run)
+    return blocks, free
+
+def place_uniq(blocks, free):
+    # one block order -> dict old num -> new num (or None if it does not fit below MAX_NUM)
+    newNums = {}
+    holes = []
+    decade = UNIQ_BASE
+    for block in blocks:
+        for offset, num in enumerate(block, start=1):
+            newNums[num] = decade + offset
+        holes.extend(range(decade + len(block) + 1, decade + 10))
+        decade += 10
+    slot = decade
+    for num in free:
+        if holes:
+            newNums[num] = holes.pop(0)
+        else:
+            slot += 1 if (slot + 1) % 10 else 2  # never a multiple of ten
+            newNums[num] = slot
+    if newNums and (max(newNums.values()) > MAX_NUM):
+        return None
+    return newNums
+
+def allocate_uniq(sounds, anchors):
+    """allocate_uniq - try every order of the fixed blocks, keep the best
+    :return: dict old num -> new num
+    """
+    blocks, free = uniq_blocks(sounds, anchors)
+    best = None
+    bestKey = None
+    for order in itertools.permutations(blocks):
+        newNums = place_uniq(order, free)
+        if newNums is None:
+            continue
+        key = (max(newNums.values(), default=0), len([num for num in newNums if newNums[num] != num]))
+        if (bestKey is None) or (key < bestKey):
+            best, bestKey = newNums, key
+    if best is None:
+        raise ValueError("UNIQ sounds do not fit below %d" % MAX_NUM)
+    return best
+
+def plan_slots(sounds, newNums, fillerFname, fillerBytes):
+    # list of plan row dicts, one per card slot 1..highest
+    byNew = {newNums[num]: sounds[num] for num in newNums}
+    plan = []
+    for slot in range(1, max(byNew) + 1):
+        if slot in byNew:
+            snd = byNew[slot]
+            newFname = "%04d%s" % (slot, snd["fname"][4:]) if snd["source"] else "%03d.wav" % slot
+            plan.append({"new_num": slot, "old_num": snd["num"], "type": type_name(slot), "mnemonic": snd["mnemonic"] or "",
+                         "old_fname": snd["fname"] or "", "new_fname": newFname,
+                         "bytes": "" if snd["size"] is None else snd["size"]})
+        else:
+            plan.append({"new_num": slot, "old_num": "", "type": "filler", "mnemonic": "", "old_fname": fillerFname,
+                         "new_fname": "%03d.wav" % slot, "bytes": "" if fillerBytes is None else fillerBytes})
+    return plan
+
+def type_name(num):
+    return EEP_TYPES[num // 10] if num < UNIQ_BASE else "mEFCT_UNIQ"
+
+def card_totals(plan):
+    # (slots, fillers, bytes or None if some size is unknown)
+    fillers = len([row for row in plan if "filler" == row["type"]])
+    sizes = [row["bytes"] for row in plan]
+    return len(plan), fillers, (None if "" in sizes else sum(sizes))
+
+
+###################################################################################################
+# outputs
+#
+def define_lines(sounds, newNums, defines, eepCounts):
+    lines = []
+    for num in sorted(newNums, key=lambda num: newNums[num]):
+        name = sounds[num]["mnemonic"]
+        if name:
+            note = "" if (name in defines) else " // not yet in RBG_SciFi_StatesAndInputs.h"
+            lines.append("#define %-32s %3d%s" % (name, newNums[num], note))
+    lines.append("static uint8_t cfgMaxSoundForType[EEPOFFSET(mEFCT_UNIQ)] = {")
+    lines.append("  %s // sound - %s" % (", ".join("%d" % count for count in eepCounts), " ".join(EEP_TYPES)))
+    lines.append("};")
+    return lines
+
+def mv_script(plan, sounds):
+    """mv_script - shell script renaming the ####_*.wav source files whose number changes
+    two phases so that renumbering A->B and B->A cannot clobber a file; sounds with no source file
+    (only a sheet file name or a ###.wav) are left out
+    :return: (list of lines, number of files renamed)
+    """
+    moves = [row for row in plan if ("filler" != row["type"]) and sounds[row["old_num"]]["source"] and
+             (row["old_num"] != row["new_num"])]
+    sources = [row["old_fname"] for row in moves]
+    twice = sorted(set(fname for fname in sources if sources.count(fname) > 1))
+    if twice:
+        raise ValueError("would move these files to more than one slot: %s" % " ".join(twice))
+    lines = ["#!/bin/sh", "# made by slotAlloc.py - run in the directory of the ####_*.wav sound files to renumber them"]
+    lines += ["mv '%s' '%s.slotAlloc'" % (row["old_fname"], row["old_fname"]) for row in moves]
+    lines += ["mv '%s.slotAlloc' '%s'" % (row["old_fname"], row["new_fname"]) for row in moves]
+    return lines, len(moves)
+
+def write_silence(fname, msec):
+    # silent PCM 16-bit mono WAV; returns its size in bytes
+    nframes = max(1, int(round(msec * FILLER_RATE / 1000.0)))
+    with wave.open(fname, 'wb') as wobj:
+        wobj.setnchannels(1)
+        wobj.setsampwidth(2)
+        wobj.setframerate(FILLER_RATE)
+        wobj.writeframes(b"\x00\x00" * nframes)
+    return WAV_HEADER_BYTES + 2 * nframes
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(prog='slotAlloc',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="choose slot numbers for the RBG sounds within the EFFECT_MAP ranges with the fewest silence fillers\n" +
+                    "   writes a renaming plan, the matching #defines and optionally a renumbering script",
+        epilog="""Example:
+python soundCatalog.py --sounds D:/svnNew/SoundsSciFi/SoundsRecordedMDO/secondCut
+python slotAlloc.py --plan slotPlan.csv --defines slotDefines.h --script renumber.sh --filler_ms 10
+""",
+        usage='%(prog)s [--db FILE] [--plan CSV] [--defines FILE] [--script FILE] [--filler_ms MS]')
+    my_parser.add_argument('--db', type=str, default=soundCatalog.DEFAULT_DB, help='soundCatalog.py database')
+    my_parser.add_argument('--plan', type=str, default="slotPlan.csv", help='renaming plan CSV (default slotPlan.csv)')
+    my_parser.add_argument('--defines', type=str, default="slotDefines.h", help='#define lines for the new numbers (default slotDefines.h)')
+    my_parser.add_argument('--script', type=str, default=None, help='also write a shell script of mv commands for the source files')
+    my_parser.add_argument('--filler_ms', type=float, default=None,
+                           help='write fillerSilence.wav of this many msec next to the plan and use it as the filler\n' +
+                                '   (default: the mEFCT_UNIQ_SILENCE sound)')
+    args = my_parser.parse_args()
+
+    conn = soundCatalog.open_catalog(args.db)
+    sounds = read_sounds(conn)
+    conn.close()
+    if not sounds:
+        sys.stderr.write("no sounds in %s - run soundCatalog.py first\n" % args.db)
+        sys.exit(1)
+    defines = parseRBGheaders.read_defines(parseRBGheaders.FNAME_STATES_H)
+    try:
+        newNums, eepCounts = allocate_eep(sounds)
+        newNums.update(allocate_uniq(sounds, decade_anchors(parseRBGheaders.FNAME_INO, defines)))
+    except ValueError as err:
+        sys.stderr.write("%s\n" % err)
+        sys.exit(1)
+
+    silence = [snd for snd in sounds.values() if "mEFCT_UNIQ_SILENCE" == snd["mnemonic"]]
+    fillerFname, fillerBytes = (silence[0]["fname"], silence[0]["size"]) if silence else ("", None)
+    oldPlan = plan_slots(sounds, {num: num for num in sounds}, fillerFname, fillerBytes)
+    if args.filler_ms is not None:
+        fillerFname = os.path.join(os.path.dirname(os.path.abspath(args.plan)), "fillerSilence.wav")
+        fillerBytes = write_silence(fillerFname, args.filler_ms)
+        fillerFname = os.path.basename(fillerFname)
+    plan = plan_slots(sounds, newNums, fillerFname, fillerBytes)
+
+    with open(args.plan, 'wt', newline='') as fobj:
+        writer = csv.DictWriter(fobj, fieldnames=PLAN_COLUMNS)
+        writer.writeheader()
+        writer.writerows(plan)
+    with open(args.defines, 'wt') as fobj:
+        fobj.write("\n".join(define_lines(sounds, newNums, defines, eepCounts)) + "\n")
+    numRenamed = None
+    if args.script:
+        try:
+            lines, numRenamed = mv_script(plan, sounds)
+        except ValueError as err:
+            sys.stderr.write("no %s written: %s\n" % (args.script, err))
+            sys.exit(1)
+        with open(args.script, 'wt', newline='\n') as fobj:
+            fobj.write("\n".join(lines) + "\n")
+
+    for label, thePlan in (("current", oldPlan), ("new", plan)):
+        slots, fillers, numBytes = card_totals(thePlan)
+        print("%-7s layout: %3d slots, %3d fillers, %s" % (label, slots, fillers,
+              "unknown bytes (no WAV files in catalog)" if numBytes is None else "%d bytes" % numBytes))
+    print("%d sounds renumbered" % len([num for num in newNums if newNums[num] != num]))
+    if numRenamed is not None:
+        print("%d source files renamed by %s (sounds with no ####_*.wav in the catalog are not)" % (numRenamed, args.script))
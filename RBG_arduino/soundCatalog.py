@@ -0,0 +1,276 @@
+# soundCatalog.py - SQLite catalog of the RBG sounds: spreadsheet, files, WAV headers, #defines and attributions
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# What we know about a sound is spread over
+#    the Sounds sheet of StateTable_minimal.xlsx (also read by RobotSounds.py readSounds())
+#    the ####_name.wav file names (copyem.py uses int(fname[:4])) and their WAV headers
+#    the mEFCT_* #defines in RBG_SciFi_StatesAndInputs.h
+#    Attributions.html (see attribs/get_attribs.py)
+# This keeps all of that in one SQLite file so tools can look a sound up instead of re-reading everything.
+#
+# Updates are incremental:
+#    the xlsx, html and .h are only re-read if their size or modification time changed
+#    a WAV file is only re-hashed and its header re-read if its size or modification time changed;
+#       files that went away are dropped, and so are all files of the old directory when --sounds changes
+#
+# Tables (indexes on sound number, mnemonic and file hash):
+#    sounds(num, usage, fname, description, license, who, url, mnemonic)     - Sounds sheet, up to the "END" row
+#    defines(mnemonic, num)                                                  - #define mEFCT_* from the .h
+#    files(path, num, fname, size, mtime_ns, sha256, channels, sampwidth, framerate, nframes, duration_ms)
+#    attributions(stem, freesound_id, tag, fname, url, who)                  - "File Name" table of Attributions.html
+#    sources(path, size, mtime_ns)                                           - for the incremental update
+#    view catalog - sounds joined with defines, files and attributions; one attribution per sound:
+#       the one whose stem is the file name, else the one with the freesound id before "__" in the file name
+#
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import wave
+
+import parseRBGheaders
+import soundFiles
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "attribs"))
+import get_attribs  # noqa: E402 (lives in attribs/)
+
+MY_DIR = os.path.dirname(os.path.realpath(__file__))
+DEFAULT_DB = os.path.join(MY_DIR, "soundCatalog.sqlite")
+DEFAULT_XLSX = os.path.join(MY_DIR, "StateTable_minimal.xlsx")
+DEFAULT_HTML = os.path.join(MY_DIR, "attribs", "Attributions.html")
+
+RE_MNEMONIC = re.compile(r'^mEFCT_\w+$')
+HASH_BLOCKSIZE = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sounds (num INTEGER PRIMARY KEY, usage TEXT, fname TEXT, description TEXT,
+    license TEXT, who TEXT, url TEXT, mnemonic TEXT);
+CREATE INDEX IF NOT EXISTS sounds_mnemonic ON sounds(mnemonic);
+CREATE TABLE IF NOT EXISTS defines (mnemonic TEXT PRIMARY KEY, num INTEGER);
+CREATE INDEX IF NOT EXISTS defines_num ON defines(num);
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, num INTEGER, fname TEXT, size INTEGER, mtime_ns INTEGER,
+    sha256 TEXT, channels INTEGER, sampwidth INTEGER, framerate INTEGER, nframes INTEGER, duration_ms REAL);
+CREATE INDEX IF NOT EXISTS files_num ON files(num);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files(sha256);
+CREATE TABLE IF NOT EXISTS attributions (stem TEXT PRIMARY KEY, freesound_id TEXT, tag TEXT, fname TEXT, url TEXT, who TEXT);
+CREATE INDEX IF NOT EXISTS attributions_id ON attributions(freesound_id);
+CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+DROP VIEW IF EXISTS catalog;
+CREATE VIEW catalog AS
+    SELECT s.num AS num, s.mnemonic AS mnemonic, d.num AS define_num, s.usage AS usage, s.fname AS sheet_fname,
+           f.path AS path, f.sha256 AS sha256, f.duration_ms AS duration_ms, f.framerate AS framerate,
+           f.channels AS channels, f.sampwidth AS sampwidth, a.tag AS license_tag, a.url AS attrib_url, a.who AS attrib_who,
+           s.description AS description
+    FROM sounds s
+    LEFT JOIN defines d ON d.mnemonic = s.mnemonic
+    LEFT JOIN files f ON f.num = s.num
+    LEFT JOIN attributions a ON a.stem = coalesce(
+        (SELECT stem FROM attributions WHERE stem = lower(substr(s.fname, 1, length(s.fname) - 4))),
+        (SELECT min(stem) FROM attributions WHERE freesound_id =
+            CASE WHEN instr(s.fname, '__') > 0 THEN substr(s.fname, 1, instr(s.fname, '__') - 1) END));
+"""
+
+
+###################################################################################################
+# open_catalog(dbname) - open (creating if needed) the catalog database
+#
+def open_catalog(dbname=DEFAULT_DB):
+    conn = sqlite3.connect(dbname)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+def _source_changed(conn, path):
+    # True (and remember the new stat) if path is new or changed since the last update
+    st = os.stat(path)
+    row = conn.execute("SELECT size, mtime_ns FROM sources WHERE path = ?", (path,)).fetchone()
+    if (row is not None) and (row["size"] == st.st_size) and (row["mtime_ns"] == st.st_mtime_ns):
+        return False
+    conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)", (path, st.st_size, st.st_mtime_ns))
+    return True
+
+def _text(value):
+    # spreadsheet cell to stripped text; empty cells become None
+    if value is None:
+        return None
+    value = str(value).strip()
+    return None if value in ("", "nan") else value
+
+
+###################################################################################################
+# the importers - each replaces its whole table
+#
+def import_sheet(conn, xlsx):
+    import pandas as pd  # only needed when the spreadsheet changed
+    df = pd.read_excel(xlsx, sheet_name="Sounds")
+    conn.execute("DELETE FROM sounds")
+    for row_num, row in df.iterrows():
+        num = _text(row["num"])
+        if "END" == num:
+            break
+        if num is None:
+            continue
+        conn.execute("INSERT OR REPLACE INTO sounds VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     (int(float(num)), _text(row["usage"]), _text(row["File Name"]), _text(row["Description"]),
+                      _text(row["License"]), _text(row["Who"]), _text(row["URL"]), _text(row["Mnemonic"])))
+
+def import_defines(conn, hname):
+    defines = parseRBGheaders.read_defines(hname)
+    conn.execute("DELETE FROM defines")
+    for name in defines:
+        if RE_MNEMONIC.match(name):
+            try:
+                conn.execute("INSERT INTO defines VALUES (?, ?)", (name, parseRBGheaders.eval_define(defines[name], defines)))
+            except ValueError:
+                pass  # function-like or non-numeric; not a sound number
+
+def import_attributions(conn, html):
+    numRows, byId, byStem = get_attribs.extract_attribs(html, {})
+    conn.execute("DELETE FROM attributions")
+    for stem, row in byStem.items():
+        match = get_attribs.RE_FREESOUND_ID.match(stem)
+        cells = (list(row) + [None] * 4)[:4]  # Tag, File Name, URL, Who
+        conn.execute("INSERT OR REPLACE INTO attributions VALUES (?, ?, ?, ?, ?, ?)",
+                     (stem, match.group(1) if match else None, cells[0], cells[1], cells[2], cells[3]))
+
+def _wav_info(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as fobj:
+        for block in iter(lambda: fobj.read(HASH_BLOCKSIZE), b""):
+            sha.update(block)
+    try:
+        with wave.open(path, 'rb') as wobj:
+            params = (wobj.getnchannels(), wobj.getsampwidth(), wobj.getframerate(), wobj.getnframes())
+    except (wave.Error, EOFError):
+        params = (None, None, None, None)
+    duration = 1000.0 * params[3] / params[2] if params[2] else None
+    return (sha.hexdigest(),) + params + (duration,)
+
+def update_files(conn, dirname):
+    """update_files - bring the files table up to date with dirname
+    :return: (number of files hashed, number of files dropped)
+    """
+    seen = set()
+    numHashed = 0
+    for fname in sorted(os.listdir(dirname)):
+        match = soundFiles.RE_CARD_FNAME.match(fname) or soundFiles.RE_SOURCE_FNAME.match(fname)
+        if match is None:
+            continue
+        path = os.path.abspath(os.path.join(dirname, fname))
+        seen.add(path)
+        st = os.stat(path)
+        row = conn.execute("SELECT size, mtime_ns FROM files WHERE path = ?", (path,)).fetchone()
+        if (row is not None) and (row["size"] == st.st_size) and (row["mtime_ns"] == st.st_mtime_ns):
+            continue
+        conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     (path, int(match.group(1)), fname, st.st_size, st.st_mtime_ns) + _wav_info(path))
+        numHashed += 1
+    # the catalog follows one sounds directory: drop everything not in it, including a previous --sounds directory
+    gone = [row["path"] for row in conn.execute("SELECT path FROM files") if row["path"] not in seen]
+    conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in gone])
+    return numHashed, len(gone)
+
+
+###################################################################################################
+# update_catalog(conn, soundsDir, xlsx, html, hname) - re-read whatever changed
+#
+# soundsDir - None uses the directory from the last update (if any)
+#
+def update_catalog(conn, soundsDir=None, xlsx=DEFAULT_XLSX, html=DEFAULT_HTML, hname=parseRBGheaders.FNAME_STATES_H):
+    done = []
+    for path, importer in ((xlsx, import_sheet), (hname, import_defines), (html, import_attributions)):
+        if os.path.exists(path) and _source_changed(conn, path):
+            importer(conn, path)
+            done.append(os.path.basename(path))
+    if soundsDir is None:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'soundsDir'").fetchone()
+        soundsDir = row["value"] if row is not None else None
+    if soundsDir is not None:
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('soundsDir', ?)", (soundsDir,))
+        numHashed, numGone = update_files(conn, soundsDir)
+        if numHashed or numGone:
+            done.append("%d wav files hashed, %d dropped" % (numHashed, numGone))
+    conn.commit()
+    return done
+
+def lookup(conn, num=None, mnemonic=None, sha256=None):
+    """lookup - rows of the catalog view by sound number, mnemonic or file hash (indexed lookups)
+    :return: list of dict
+    """
+    if num is not None:
+        rows = conn.execute("SELECT * FROM catalog WHERE num = ?", (num,))
+    elif mnemonic is not None:
+        rows = conn.execute("SELECT * FROM catalog WHERE num IN (SELECT num FROM sounds WHERE mnemonic = ? "
+                            "UNION SELECT num FROM defines WHERE mnemonic = ?)", (mnemonic, mnemonic))
+    elif sha256 is not None:
+        rows = conn.execute("SELECT * FROM catalog WHERE num IN (SELECT num FROM files WHERE sha256 = ?)", (sha256,))
+    else:
+        rows = conn.execute("SELECT * FROM catalog ORDER BY num")
+    return [dict(row) for row in rows]
+
+def check_catalog(conn):
+    """check_catalog - consistency problems: a sound number with more than one file or more than one catalog row
+    :return: list of strings, empty if all is well
+    """
+    problems = ["sound %d has %d files: %s" % (row[0], row[1], row[2]) for row in conn.execute(
+        "SELECT num, count(*), group_concat(path, ' ') FROM files GROUP BY num HAVING count(*) > 1 ORDER BY num")]
+    problems += ["sound %d has %d catalog rows" % tuple(row) for row in conn.execute(
+        "SELECT num, count(*) FROM catalog GROUP BY num HAVING count(*) > 1 ORDER BY num")]
+    return problems
+
+def duplicates(conn):
+    """duplicates - files with the same contents under more than one sound number
+    :return: list of (sha256, "num,num,...")
+    """
+    return [tuple(row) for row in conn.execute(
+        "SELECT sha256, group_concat(num) FROM (SELECT DISTINCT sha256, num FROM files ORDER BY num) "
+        "GROUP BY sha256 HAVING count(*) > 1")]
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(prog='soundCatalog',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="SQLite catalog of RBG sounds from the Sounds sheet, the WAV files, the mEFCT_* #defines and Attributions.html\n" +
+                    "   updates only what changed, then prints the lookup (all sounds if no lookup given)",
+        epilog="""Example:
+python soundCatalog.py --sounds D:/svnNew/SoundsSciFi/SoundsRecordedMDO/secondCut
+python soundCatalog.py --mnemonic mEFCT_UNIQ_CFG_CREDITS
+python soundCatalog.py --duplicates
+python soundCatalog.py --sounds H: --check
+""",
+        usage='%(prog)s [--db FILE] [--sounds DIR] [--num N | --mnemonic NAME | --hash SHA256 | --duplicates | --check]')
+    my_parser.add_argument('--db', type=str, default=DEFAULT_DB, help='catalog file (default soundCatalog.sqlite next to this script)')
+    my_parser.add_argument('--sounds', type=str, default=None, help='directory of ###.wav or ####_*.wav (remembered for later runs)')
+    my_parser.add_argument('--xlsx', type=str, default=DEFAULT_XLSX, help='spreadsheet with the Sounds sheet')
+    my_parser.add_argument('--html', type=str, default=DEFAULT_HTML, help='Attributions.html')
+    my_parser.add_argument('--num', type=int, default=None, help='look up by sound number')
+    my_parser.add_argument('--mnemonic', type=str, default=None, help='look up by mnemonic, for instance mEFCT_UNIQ_SILENCE')
+    my_parser.add_argument('--hash', type=str, default=None, help='look up by sha256 of the WAV file')
+    my_parser.add_argument('--duplicates', action='store_true', help='list files with identical contents under different numbers')
+    my_parser.add_argument('--check', action='store_true', help='list sound numbers with more than one file or catalog row; exit 1 if any')
+    args = my_parser.parse_args()
+
+    conn = open_catalog(args.db)
+    for what in update_catalog(conn, args.sounds, args.xlsx, args.html):
+        sys.stderr.write("updated: %s\n" % what)
+    if args.check:
+        problems = check_catalog(conn)
+        for problem in problems:
+            print(problem)
+        conn.close()
+        sys.exit(1 if problems else 0)
+    if args.duplicates:
+        for sha, nums in duplicates(conn):
+            print("%s %s" % (sha, nums))
+    else:
+        for row in lookup(conn, args.num, args.mnemonic, args.hash):
+            print("%4s %-34s %-8s %8s %-50s %s" % (row["num"], row["mnemonic"] or "", row["usage"] or "",
+                  "%.0fms" % row["duration_ms"] if row["duration_ms"] is not None else "-",
+                  row["path"] or row["sheet_fname"] or "", row["license_tag"] or ""))
+    conn.close()
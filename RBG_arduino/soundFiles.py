@@ -0,0 +1,61 @@
+# soundFiles.py - find the RBG sound files by number and get their WAV lengths
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# Two naming forms are understood (see copyem.py):
+#    ####_anything.wav - source directory; #### is the sound number
+#    ###.wav           - SD card image; ### is the sound number used by myDFPlayer.play()
+# copyem.py fills the gaps with the silence file so the two numberings are the same.
+#
+
+import os
+import re
+import wave
+
+RE_CARD_FNAME = re.compile(r'^(\d{3})\.wav$', re.IGNORECASE)
+RE_SOURCE_FNAME = re.compile(r'^(\d{4}).*\.wav$', re.IGNORECASE)
+
+
+def find_sound_files(dirname):
+    """find_sound_files - map sound number to WAV path for a source directory or SD card image
+    :param dirname: directory with ###.wav and/or ####_*.wav files
+    :return: dict of int sound number -> path; ###.wav wins if both forms are present
+    """
+    sounds = {}
+    for fname in sorted(os.listdir(dirname)):
+        match = RE_SOURCE_FNAME.match(fname)
+        if match and (int(match.group(1)) not in sounds):
+            sounds[int(match.group(1))] = os.path.join(dirname, fname)
+    for fname in sorted(os.listdir(dirname)):
+        match = RE_CARD_FNAME.match(fname)
+        if match:
+            sounds[int(match.group(1))] = os.path.join(dirname, fname)
+    return sounds
+
+
+def wav_duration_ms(path):
+    """wav_duration_ms - length of a PCM WAV file in milliseconds
+    :param path: path to *.wav
+    :return: float milliseconds, or None if the file cannot be read as PCM WAV
+    """
+    try:
+        with wave.open(path, 'rb') as wobj:
+            return 1000.0 * wobj.getnframes() / wobj.getframerate()
+    except (wave.Error, EOFError, OSError):
+        return None
+
+
+def sound_durations_ms(dirname):
+    """sound_durations_ms - WAV length for every numbered sound in a directory
+    :param dirname: directory with ###.wav and/or ####_*.wav files; None gives an empty dict
+    :return: dict of int sound number -> float milliseconds (unreadable files are left out)
+    """
+    durations = {}
+    if dirname is None:
+        return durations
+    for num, path in find_sound_files(dirname).items():
+        msec = wav_duration_ms(path)
+        if msec is not None:
+            durations[num] = msec
+    return durations
@@ -0,0 +1,276 @@
+# soundPrint.py - find duplicate and near-duplicate sounds (re-cuts of the same source) by spectral fingerprint
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# soundCatalog.py --duplicates only finds byte-identical files. Re-cuts of one source (another trim, fade or gain,
+#    another sample rate, the several _mdo47 variants) each take a card slot and copy time; this finds those too.
+#
+# Fingerprint: each clip is read in chunks (see loudnessNorm.wav_chunks) and cut into FRAME_MS frames every
+#    FRAME_MS / HOP_DIV. The energy in NUM_BANDS + 1 log-spaced bands from BAND_LO_HZ to BAND_HI_HZ gives one
+#    32-bit word per frame: bit m is set if the energy difference between bands m and m+1 grew since the last frame.
+#    The words do not change with gain or sample rate and change little with re-encoding; frames more than
+#    SILENT_DB below the clip's loudest are marked silent and not used. 4 bytes per 11.6 ms frame.
+# Index: each half (16 bits) of each word -> (clip, frame) for every non-silent frame; a re-cut with a fifth of its
+#    bits different still has a few percent of its halves exactly the same, where whole words almost never are.
+#    A clip's halves are looked up in the index; a clip that shares halves at the same frame offset (votes)
+#    is compared word by word at the best few offsets. The similarity is
+#    1 - (fraction of differing bits), over the frames where both are not silent; the overlap is those frames
+#    as a fraction of the shorter clip. Unrelated clips are near 0.5 similarity, re-cuts 0.8 and more.
+# Clips that are similar enough over enough overlap are joined into clusters, one line per member.
+#
+# Fingerprints are made in parallel (process pool) and, with --cache, kept in a .npz file so only new or
+#    changed files (size or modification time) are done again.
+#
+
+import argparse
+import concurrent.futures
+import json
+import math
+import os
+import re
+import sys
+import wave
+
+import numpy as np
+
+import loudnessNorm
+import rbgProfile
+
+FRAME_MS = 92.9     # 4096 samples at 44100 Hz
+HOP_DIV = 8         # frames start every FRAME_MS / HOP_DIV
+NUM_BANDS = 32      # bits per word; NUM_BANDS + 1 bands
+BAND_LO_HZ = 300.0
+BAND_HI_HZ = 5000.0
+SILENT_DB = 40.0    # frames this far below the loudest frame of the clip are silent
+MAX_POSTINGS = 500  # halves found in more frames than this (near-silence, hum) are left out of the index
+
+RE_WAV = re.compile(r'\.wav$', re.IGNORECASE)
+
+
+###################################################################################################
+# fingerprint_file(path) - streaming STFT of one clip into per-frame 32-bit words
+#
+# returns dict path, rate, duration_ms, words (uint32 array), loud (bool array: frame is not silent); or path, error
+#
+def band_matrix(nfft, rate):
+    # rfft bin power -> band energy; bands above Nyquist stay empty
+    edges = np.geomspace(BAND_LO_HZ, BAND_HI_HZ, NUM_BANDS + 2)
+    band = np.searchsorted(edges, np.fft.rfftfreq(nfft, 1.0 / rate), side='right') - 1
+    matrix = np.zeros((nfft // 2 + 1, NUM_BANDS + 1))
+    inside = (band >= 0) & (band <= NUM_BANDS)
+    matrix[np.flatnonzero(inside), band[inside]] = 1.0
+    return matrix
+
+def fingerprint_file(path):
+    result = {"path": path}
+    try:
+        with wave.open(path, 'rb') as wobj:
+            rate = wobj.getframerate()
+        nfft = 1 << int(round(math.log2(rate * FRAME_MS / 1000.0)))
+        hop = nfft // HOP_DIV
+        window = np.hanning(nfft)
+        bands = band_matrix(nfft, rate)
+        energies = []
+        carry = np.zeros(0)
+        numSamples = 0
+        for chunk in loudnessNorm.wav_chunks(path):
+            numSamples += len(chunk)
+            buf = np.concatenate((carry, chunk.mean(axis=1)))
+            numFrames = (len(buf) - nfft) // hop + 1 if len(buf) >= nfft else 0
+            if numFrames > 0:
+                frames = np.lib.stride_tricks.sliding_window_view(buf, nfft)[::hop][:numFrames]
+                energies.append((np.abs(np.fft.rfft(frames * window, axis=1)) ** 2) @ bands)
+            carry = buf[numFrames * hop:]
+    except (wave.Error, EOFError, OSError, KeyError, ValueError) as err:
+        result["error"] = "cannot read: %s" % (err or err.__class__.__name__)
+        return result
+    energy = np.concatenate(energies) if energies else np.zeros((0, NUM_BANDS + 1))
+    diff = energy[:, :-1] - energy[:, 1:]
+    bits = (diff[1:] - diff[:-1]) > 0
+    words = (bits.astype(np.uint64) << np.arange(NUM_BANDS, dtype=np.uint64)).sum(axis=1).astype(np.uint32)
+    level = 10.0 * np.log10(energy.sum(axis=1) + 1e-20)
+    loud = (level[1:] > max(level.max() - SILENT_DB, -200.0)) if len(level) else np.zeros(0, dtype=bool)  # all-zero is silent
+    result.update(rate=rate, duration_ms=1000.0 * numSamples / rate, words=words, loud=loud)
+    return result
+# end fingerprint_file()
+
+
+###################################################################################################
+# load_cache(fname) / save_cache(fname, prints) - fingerprints keyed by path, with the size and mtime they were made from
+#
+def load_cache(fname):
+    prints = {}
+    if (fname is None) or (not os.path.exists(fname)):
+        return prints
+    with np.load(fname) as data:
+        info = json.loads(str(data["info"]))
+        words, loud = data["words"], data["loud"]
+        for entry in info:
+            start, end = entry.pop("start"), entry.pop("end")
+            prints[entry["path"]] = dict(entry, words=words[start:end], loud=loud[start:end])
+    return prints
+
+def save_cache(fname, prints):
+    info = []
+    start = 0
+    for path in sorted(prints):
+        entry = {key: val for key, val in prints[path].items() if key not in ("words", "loud")}
+        info.append(dict(entry, start=start, end=start + len(prints[path]["words"])))
+        start += len(prints[path]["words"])
+    good = [prints[path] for path in sorted(prints)]
+    tmpfname = "%s.%d.tmp" % (fname, os.getpid())
+    with open(tmpfname, 'wb') as fobj:
+        np.savez(fobj, info=np.array(json.dumps(info)),
+                 words=np.concatenate([p["words"] for p in good]) if good else np.zeros(0, dtype=np.uint32),
+                 loud=np.concatenate([p["loud"] for p in good]) if good else np.zeros(0, dtype=bool))
+    os.replace(tmpfname, fname)
+
+
+def fingerprint_library(dirnames, cacheFname=None, numJobs=None):
+    """fingerprint_library - fingerprints for every *.wav in dirnames, from the cache where it is still current
+    :return: (list of fingerprint dicts sorted by path, list of (path, error))
+    """
+    paths = sorted(os.path.abspath(os.path.join(dirname, fname)) for dirname in dirnames
+                   for fname in os.listdir(dirname) if RE_WAV.search(fname))
+    cache = load_cache(cacheFname)
+    prints = {}
+    todo = []
+    for path in paths:
+        st = os.stat(path)
+        cached = cache.get(path)
+        if (cached is not None) and (cached["size"] == st.st_size) and (cached["mtime_ns"] == st.st_mtime_ns):
+            prints[path] = cached
+        else:
+            todo.append((path, st))
+    errors = []
+    if todo:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=numJobs) as executor:
+            for (path, st), result in zip(todo, executor.map(fingerprint_file, [path for path, st in todo], chunksize=4)):
+                if "error" in result:
+                    errors.append((path, result["error"]))
+                else:
+                    prints[path] = dict(result, size=st.st_size, mtime_ns=st.st_mtime_ns)
+    if (cacheFname is not None) and (todo or (len(cache) != len(prints))):
+        save_cache(cacheFname, prints)
+    return [prints[path] for path in sorted(prints)], errors
+
+
+###################################################################################################
+# find_similar(prints, minSimilarity, minOverlap, minVotes) - pairs of clips that are (nearly) the same sound
+#
+# returns list of (clip index a, clip index b, similarity, overlap, frame offset of b in a), a < b
+#
+def popcount(words):
+    return np.unpackbits(words.view(np.uint8)).reshape(len(words), -1).sum(axis=1)
+
+def compare(printA, printB, offset):
+    # similarity and overlap with frame i of A lined up with frame i - offset of B
+    startA = max(0, offset)
+    numFrames = min(len(printA["words"]) - startA, len(printB["words"]) - (startA - offset))
+    if numFrames <= 0:
+        return 0.0, 0.0
+    sliceA, sliceB = slice(startA, startA + numFrames), slice(startA - offset, startA - offset + numFrames)
+    both = printA["loud"][sliceA] & printB["loud"][sliceB]
+    numBoth = int(both.sum())
+    if 0 == numBoth:
+        return 0.0, 0.0
+    diffBits = int(popcount(printA["words"][sliceA][both] ^ printB["words"][sliceB][both]).sum())
+    shorter = min(int(printA["loud"].sum()), int(printB["loud"].sum()))
+    return 1.0 - diffBits / (32.0 * numBoth), numBoth / float(shorter)
+
+def half_keys(word):
+    # index keys for the low and high 16 bits of a word; bit 16 tells them apart
+    return int(word) & 0xFFFF, (int(word) >> 16) | 0x10000
+
+def find_similar(prints, minSimilarity, minOverlap, minVotes=3):
+    index = {}
+    for clip, fp in enumerate(prints):
+        for frame in np.flatnonzero(fp["loud"]):
+            for key in half_keys(fp["words"][frame]):
+                index.setdefault(key, []).append((clip, int(frame)))
+    rbgProfile.lap("match")
+    pairs = []
+    for clipA, fp in enumerate(prints):
+        votes = {}
+        for frame in np.flatnonzero(fp["loud"]):
+            for postings in [index[key] for key in half_keys(fp["words"][frame])]:
+                if len(postings) > MAX_POSTINGS:
+                    continue
+                for clipB, frameB in postings:
+                    if clipB > clipA:
+                        key = (clipB, int(frame) - frameB)
+                        votes[key] = votes.get(key, 0) + 1
+        offsets = {}  # clipB -> up to 3 offsets with the most votes
+        for (clipB, offset), numVotes in sorted(votes.items(), key=lambda item: -item[1]):
+            if (numVotes >= minVotes) and (len(offsets.setdefault(clipB, [])) < 3):
+                offsets[clipB].append(offset)
+        for clipB in sorted(offsets):
+            if 0 == len(offsets[clipB]):
+                continue
+            similarity, overlap, offset = max(compare(fp, prints[clipB], offset) + (offset,) for offset in offsets[clipB])
+            if (similarity >= minSimilarity) and (overlap >= minOverlap):
+                pairs.append((clipA, clipB, similarity, overlap, offset))
+    return pairs
+# end find_similar()
+
+
+def clusters(numClips, pairs):
+    # union-find over the pairs; returns lists of clip indexes with more than one member, in clip order
+    parent = list(range(numClips))
+
+    def root(clip):
+        while parent[clip] != clip:
+            parent[clip] = parent[parent[clip]]
+            clip = parent[clip]
+        return clip
+    for clipA, clipB, similarity, overlap, offset in pairs:
+        parent[max(root(clipA), root(clipB))] = min(root(clipA), root(clipB))
+    groups = {}
+    for clip in range(numClips):
+        groups.setdefault(root(clip), []).append(clip)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def report(prints, pairs, fobj=sys.stdout):
+    hopMs = FRAME_MS / HOP_DIV
+    groups = clusters(len(prints), pairs)
+    for count, members in enumerate(groups, 1):
+        fobj.write("cluster %d: %d clips\n" % (count, len(members)))
+        for clip in members:
+            fobj.write("   %8.0fms %s\n" % (prints[clip]["duration_ms"], prints[clip]["path"]))
+        for clipA, clipB, similarity, overlap, offset in pairs:
+            if clipA in members:
+                fobj.write("      %s ~ %s similarity %.2f overlap %.2f offset %+.0fms\n" % (
+                    os.path.basename(prints[clipA]["path"]), os.path.basename(prints[clipB]["path"]),
+                    similarity, overlap, offset * hopMs))
+    fobj.write("%d clips, %d near-duplicate pairs in %d clusters\n" % (len(prints), len(pairs), len(groups)))
+
+
+if __name__ == "__main__":
+    rbgProfile.setup("soundPrint")
+    my_parser = argparse.ArgumentParser(prog='soundPrint',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="find duplicate and near-duplicate sounds (re-cuts of the same source) by spectral fingerprint\n" +
+                    "   prints clusters of similar clips so they can be pruned before copyem.py",
+        epilog="""Example:
+python soundPrint.py D:/svnNew/SoundsSciFi/SoundsRecordedMDO/secondCut
+python soundPrint.py --cache soundPrint.npz --min_similarity 0.85 ./secondCut ./unused
+""",
+        usage='%(prog)s [--cache FILE] [--min_similarity S] [--min_overlap F] [--jobs N] directory [directory ...]')
+    my_parser.add_argument('directory', type=str, nargs='+', help='directories of *.wav sounds')
+    my_parser.add_argument('--cache', type=str, default=None, help='.npz file to keep fingerprints in between runs')
+    my_parser.add_argument('--min_similarity', type=float, default=0.75, help='1 - fraction of differing bits to count as the same sound (default 0.75)')
+    my_parser.add_argument('--min_overlap', type=float, default=0.5, help='fraction of the shorter clip that must line up (default 0.5)')
+    my_parser.add_argument('--jobs', type=int, default=None, help='parallel jobs (default number of CPUs)')
+    args = my_parser.parse_args()
+
+    rbgProfile.lap("fingerprint")
+    thePrints, theErrors = fingerprint_library(args.directory, args.cache, args.jobs)
+    for path, error in theErrors:
+        sys.stderr.write("%s: %s\n" % (path, error))
+    rbgProfile.lap("index")
+    thePairs = find_similar(thePrints, args.min_similarity, args.min_overlap)
+    rbgProfile.lap("report")
+    report(thePrints, thePairs)
+    rbgProfile.stop()
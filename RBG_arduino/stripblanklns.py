@@ -4,29 +4,74 @@
 # This trivial code strips out blank lines, leaving a blank line only before
 #    a line that begins with "--"
 #
+# It is built as a pipeline of generator stages; each stage takes and yields batches (lists) of lines.
+#    Input is read in large blocks and output is written one batch at a time (see mdoUniq.py),
+#    so this keeps up with multi-gigabyte serial captures. Use "-" for stdin.
+#
+# Optional stages, in pipeline order:
+#    --include REGEX / --exclude REGEX - keep only / drop lines matching
+#    --uniq START END [--window N]     - mdoUniq dedupe comparing between START and END strings
+#    section markers ("--" lines get a blank line before them) are always last
+#
 
 import argparse
+import re
+
+import mdoUniq
+import rbgProfile
+
+def stage_strip_blank(batches):
+  # strip each line and drop the blank ones
+  for batch in batches:
+    yield [ln for ln in (ln.strip() for ln in batch) if ln]
+
+def stage_regex(batches, include=None, exclude=None):
+  # keep lines matching include (if given) and not matching exclude (if given)
+  inc = re.compile(include).search if include else None
+  exc = re.compile(exclude).search if exclude else None
+  for batch in batches:
+    if inc:
+      batch = [ln for ln in batch if inc(ln)]
+    if exc:
+      batch = [ln for ln in batch if not exc(ln)]
+    yield batch
+
+def stage_section_markers(batches, marker="--"):
+  # put a blank line (" ") before each line that starts with marker
+  for batch in batches:
+    out = []
+    for ln in batch:
+      if ln.startswith(marker):
+        out.append(" ")
+      out.append(ln)
+    yield out
 
-def stripblanklns(infile):
-  fptr = open(infile, "rt")
-  ln = fptr.readline()
-  while ln:
-    ln = ln.strip()
-    if 0 != len(ln):
-      if (2 <= len(ln)) and ("--" == ln[:2]):
-         print(" ")
-      print("%s" % ln)
-    ln = fptr.readline()
+def stripblanklns(infile, include=None, exclude=None, uniq=None, window=1):
+  rbgProfile.lap("pipeline")
+  batches = stage_strip_blank(mdoUniq.read_line_batches(infile))
+  if include or exclude:
+    batches = stage_regex(batches, include, exclude)
+  if uniq:
+    batches = mdoUniq.uniq_batches(batches, uniq[0], uniq[1], window)
+  batches = stage_section_markers(batches)
+  mdoUniq.write_line_batches(batches)
+  rbgProfile.stop()
 
 if __name__ == "__main__":
+    rbgProfile.setup("stripblanklns")
     my_parser = argparse.ArgumentParser(prog='stripblanklns',
         formatter_class=argparse.RawTextHelpFormatter,
         description="stdout receives input file with blank lines removed.\n  Lines that start with -- will be preceeded by blank line",
         epilog="""Example:
 python stripblanklns.py file.txt > noblanks.txt
+python stripblanklns.py --exclude "^  - " --uniq RBG_waitForInput loopCount --window 20 - < serial.log > short.log
 """,
-        usage='%(prog)s infile')
-    my_parser.add_argument('infile',type=str,help='path to infile.txt')
+        usage='%(prog)s [--include REGEX] [--exclude REGEX] [--uniq START END [--window N]] infile')
+    my_parser.add_argument('infile',type=str,help='path to infile.txt; - for stdin')
+    my_parser.add_argument('--include',type=str,default=None,help='keep only lines matching this regular expression')
+    my_parser.add_argument('--exclude',type=str,default=None,help='drop lines matching this regular expression')
+    my_parser.add_argument('--uniq',type=str,nargs=2,default=None,metavar=('START','END'),help='drop repeated lines as in mdoUniq.py, comparing between START and END')
+    my_parser.add_argument('--window',type=int,default=1,help='with --uniq: drop line if seen within the last N lines (default 1)')
     args = my_parser.parse_args()
 
-    stripblanklns(args.infile)
+    stripblanklns(args.infile, args.include, args.exclude, args.uniq, args.window)
@@ -0,0 +1,362 @@
+# timingSim.py - discrete-event simulation of RBG_SciFi timing from trigger press to shot
+#
+# Rubber Band Gun - https://github.com/Mark-MDO47/RubberBandGun
+# RBG - A high-tech imagining of the rubber band gun
+#
+# loop() only runs the state machine when (timerNow - timerPrevState) >= 40, so a trigger press waits for the next tick,
+#    then the wind-up sound plays (ONETIME: we move on when the YX5200 busy pin says the sound ended), then the shot.
+#    The solenoid/motor is released based on DLYSOLENOID_MIN/_MAX and the trigger; mVINP_SOUNDACTV comes from
+#    the busy pin plus timerForceSoundActv (mDELAY_SOUNDACTV after each play() to cover YX5200 busy-pin glitches).
+#
+# This runs the real state table (read from RBG_SciFi_StatesAndInputs.h by parseRBGheaders.py) with host copies of
+#    loop(), getButtonInput(), RBG_processStateTable(), RBG_waitForInput(), RBG_specialProcessing() (SHOOT and SOLENOID)
+#    and RBG_startEffectSound(). Sound lengths come from the WAV files (SD card ###.wav or source ####_*.wav).
+#    The EEPROM starts at factory settings (see eepromModel.py) or from a raw EEPROM dump; as on the gun, each shot
+#    moves dynamicMode to the next configuration unless --static.
+#
+# The simulated user waits with the barrel locked until the code is in a row that accepts the trigger,
+#    waits a random idle time, then presses the trigger for a random hold time.
+#
+# Reported for each configuration (latency measured from the trigger press):
+#    windup sound - wind-up sound audible (play() + --audio_start_ms)
+#    solenoid on  - DPIN_SOLENOID goes HIGH
+#    shoot sound  - shoot sound audible
+#    solenoid len - how long DPIN_SOLENOID was HIGH
+#    plus the number of presses that did nothing, because either
+#       the trigger was released between ticks, or
+#       the edge was seen on the tick that starts a row (RBG_processStateTable() only starts the row on that tick,
+#          and getButtonInput() gives one edge per press, so the press is lost)
+#
+# NOTE: like the .ino, the SOLENOID handler tests (1 == (nowVinputRBG & mVINP_TRIG_STATE)) which is never true,
+#    so with SOLENOID_IF_NONZERO == 0 the motor is only stopped from loop() (trigger released or DLYSOLENOID_MAX)
+#
+
+import argparse
+import heapq
+import math
+import random
+import sys
+
+import eepromModel
+import parseRBGheaders
+import soundFiles
+
+HDR = {}    # numbers from the *.h files
+TABLE = []  # myStateTable rows as dicts
+
+# event kinds; lower number is handled first if two events have the same time
+EVT_TRIG_DOWN = 0
+EVT_TRIG_UP = 1
+EVT_SOLENOID_MAX = 2
+EVT_TICK = 3
+
+PERCENTILES = (0, 50, 95, 100)
+
+
+###################################################################################################
+# load_header_values() - get the state table and timing numbers from the *.h files
+#
+def load_header_values():
+    defines = parseRBGheaders.read_all_defines()
+    for name in ("mNONE", "mBLOCKEND", "mSPCL_HANDLER", "mSPCL_HANDLER_SHOOT", "mSPCL_HANDLER_SOLENOID",
+                 "mSPCL_EFCT_ONETIME", "mSPCL_EFCT_CONTINUOUS", "mSPCL_EFCT_CONFIGURE",
+                 "mINP_TRIG", "mINP_BANY", "mINP_B07", "mINP_OPEN", "mINP_LOCK",
+                 "mVINP_TRIG_EDGE", "mVINP_LOCK", "mVINP_OPEN", "mVINP_SOUNDACTV", "mVINP_TRIG_STATE", "mVINP_TRUESOUNDACTV",
+                 "mDELAY_SOUNDACTV", "SOLENOID_IF_NONZERO", "DLYSOLENOID_MIN", "DLYSOLENOID_MAX",
+                 "mMASK_EFCT_SND_NUM", "mEFCT_WIND_UP", "mEFCT_SHOOT", "mEFCT_LAST_EEP_CONFIG", "EEPROM_START_SOUND_CONFIGS"):
+        HDR[name] = parseRBGheaders.eval_define(defines[name], defines)
+    TABLE[:] = parseRBGheaders.read_state_table(parseRBGheaders.FNAME_STATES_H, defines)
+    eepromModel.load_header_values()
+# end load_header_values()
+
+
+###################################################################################################
+# trigger_rows() - rows where a trigger press by itself (no buttons) moves us on: the "ready to shoot" rows
+#
+def trigger_rows():
+    ready = set()
+    for start in range(len(TABLE)):
+        for idx in range(start, len(TABLE)):
+            inp = TABLE[idx]["inputRBG"]
+            if (HDR["mNONE"] != inp) and (0 != (inp & HDR["mINP_TRIG"])) and (0 == (inp & (HDR["mINP_BANY"] | HDR["mINP_B07"]))):
+                ready.add(start)
+                break
+            if 0 != (TABLE[idx]["blkFlags"] & HDR["mBLOCKEND"]):
+                break
+    return ready
+# end trigger_rows()
+
+
+###################################################################################################
+# the simulated gun - state is in the dict from new_gun(); functions are named after the .ino routines
+#
+
+def new_gun(args, durations):
+    return {
+        "args": args, "durations": durations,
+        "timerNow": 0, "timerPrevState": 0, "timerForceSoundActv": 0,
+        "timerMinForceSolenoidLow": 0, "timerMaxForceSolenoidLow": 0,
+        "tableRow": 0, "prevRow": HDR["mNONE"], "nowVinputRBG": 0, "prevTrigstate": 0,
+        "trigDown": False, "busyStart": 0, "busyEnd": 0,
+        "solenoidHigh": False, "solenoidOnAt": None,
+        "events": [], "seq": 0, "shot": None,
+    }
+
+def schedule(gun, when, kind):
+    gun["seq"] += 1
+    heapq.heappush(gun["events"], (when, kind, gun["seq"]))
+
+def next_loop_time_after(gun, when):
+    # loop() iterations happen every --loop_ms; first iteration strictly after when
+    loop_ms = gun["args"].loop_ms
+    return (math.floor(when / loop_ms) + 1) * loop_ms
+
+def getButtonInput(gun):
+    returnInpMask = HDR["mVINP_LOCK"]  # the simulated user keeps the barrel locked
+    if gun["trigDown"]:
+        returnInpMask |= HDR["mVINP_TRIG_STATE"]
+        if 0 == gun["prevTrigstate"]:
+            gun["prevTrigstate"] = 1
+            returnInpMask |= HDR["mVINP_TRIG_EDGE"]
+            if gun["shot"] is not None:
+                gun["shot"]["edgeSeen"] = True
+    else:
+        gun["prevTrigstate"] = 0
+    if gun["busyStart"] <= gun["timerNow"] < gun["busyEnd"]:  # DPIN_AUDIO_BUSY is LOW
+        returnInpMask |= HDR["mVINP_SOUNDACTV"] | HDR["mVINP_TRUESOUNDACTV"]
+    if gun["timerNow"] < gun["timerForceSoundActv"]:
+        returnInpMask |= HDR["mVINP_SOUNDACTV"]
+    return returnInpMask
+
+def RBG_startEffectSound(gun, tmpEfctSound):
+    # only the EEPROM-configurable and fixed sounds; the configuration-menu sounds are not on the shooting path
+    mySound = tmpEfctSound & HDR["mMASK_EFCT_SND_NUM"]
+    if HDR["mNONE"] == mySound:
+        return
+    effectType = mySound
+    if (0 == mySound % 10) and (mySound <= HDR["mEFCT_LAST_EEP_CONFIG"]):
+        mySound += eepromModel.EEPROM_RAMcopy[eepromModel.EEPOFFSET(mySound) + HDR["EEPROM_START_SOUND_CONFIGS"]]
+    # myDFPlayer.play(mySound): a new play ends the previous sound; busy pin goes LOW after the YX5200 starts
+    args = gun["args"]
+    now = gun["timerNow"]
+    gun["busyStart"] = now + args.audio_start_ms
+    gun["busyEnd"] = gun["busyStart"] + gun["durations"].get(mySound, args.default_sound_ms)
+    gun["timerForceSoundActv"] = now + args.force_soundactv_ms
+    shot = gun["shot"]
+    if shot is not None:
+        if (HDR["mEFCT_WIND_UP"] == effectType) and ("windup" not in shot):
+            shot["windup"] = gun["busyStart"] - shot["trigDown"]
+            shot["windupSound"] = mySound
+        elif (HDR["mEFCT_SHOOT"] == effectType) and ("shoot" not in shot):
+            shot["shoot"] = gun["busyStart"] - shot["trigDown"]
+            shot["shootSound"] = mySound
+
+def RBG_specialProcShoot(gun):
+    gun["solenoidHigh"] = True
+    gun["solenoidOnAt"] = gun["timerNow"]
+    gun["timerMinForceSolenoidLow"] = gun["timerNow"] + gun["args"].dly_min
+    gun["timerMaxForceSolenoidLow"] = gun["timerMinForceSolenoidLow"] + gun["args"].dly_max - gun["args"].dly_min
+    schedule(gun, next_loop_time_after(gun, gun["timerMaxForceSolenoidLow"]), EVT_SOLENOID_MAX)
+    if gun["shot"] is not None:
+        gun["shot"]["solenoidOn"] = gun["timerNow"] - gun["shot"]["trigDown"]
+
+def RBG_specialProcStopShoot(gun):
+    if gun["solenoidHigh"] and (gun["shot"] is not None) and ("solenoidLen" not in gun["shot"]):
+        gun["shot"]["solenoidLen"] = gun["timerNow"] - gun["solenoidOnAt"]
+    gun["solenoidHigh"] = False
+    gun["timerMaxForceSolenoidLow"] = 0
+    gun["timerMinForceSolenoidLow"] = 0
+
+def RBG_specialProcessing(gun, tmpSpecial):
+    mySpec = tmpSpecial & (HDR["mSPCL_HANDLER"] - 1)
+    if HDR["mSPCL_HANDLER_SHOOT"] == mySpec:
+        RBG_specialProcShoot(gun)
+    elif HDR["mSPCL_HANDLER_SOLENOID"] == mySpec:
+        if HDR["mNONE"] != eepromModel.dynamicMode:
+            eepromModel.dynamicMode = (eepromModel.dynamicMode + 1) % eepromModel.HDR["NUM_EEPROM_CONFIGURATIONS"]
+            eepromModel.copy_eeprom_to_ram_running_config(eepromModel.dynamicMode)
+        if gun["timerNow"] > gun["timerMinForceSolenoidLow"]:
+            if HDR["SOLENOID_IF_NONZERO"] or (1 == (gun["nowVinputRBG"] & HDR["mVINP_TRIG_STATE"])):
+                RBG_specialProcStopShoot(gun)
+    return HDR["mNONE"]  # other handlers are configuration menu only
+
+def RBG_waitForInput(gun, tmpVinputRBG):
+    for idx in range(gun["tableRow"], len(TABLE)):
+        waitRow = TABLE[idx]
+        special, inp = waitRow["SPECIAL"], waitRow["inputRBG"]
+        if (HDR["mNONE"] != special) and (0 != (special & HDR["mSPCL_HANDLER"])):
+            thisReturn = RBG_specialProcessing(gun, special)
+            return waitRow["gotoWithoutInput"] if HDR["mNONE"] == thisReturn else thisReturn
+        elif (0 != (special & HDR["mSPCL_EFCT_ONETIME"])) and (0 == (tmpVinputRBG & HDR["mVINP_SOUNDACTV"])):
+            return waitRow["gotoWithoutInput"]
+        elif (HDR["mNONE"] != inp) and (0 != (inp & HDR["mINP_TRIG"])) and (0 != (tmpVinputRBG & HDR["mVINP_TRIG_EDGE"])):
+            if ((0 != (inp & HDR["mINP_BANY"])) and (0 != (inp & HDR["mINP_B07"] & tmpVinputRBG))) or \
+               ((tmpVinputRBG & HDR["mINP_B07"]) == (inp & HDR["mINP_B07"])):
+                if gun["shot"] is not None:
+                    gun["shot"]["accepted"] = True  # this press moved the state machine
+                return waitRow["gotoOnInput"]
+        elif (HDR["mNONE"] != inp) and (0 != (inp & HDR["mINP_OPEN"])) and (0 != (tmpVinputRBG & HDR["mVINP_OPEN"])):
+            return waitRow["gotoOnInput"]
+        elif (HDR["mNONE"] != inp) and (0 != (inp & HDR["mINP_LOCK"])) and (0 != (tmpVinputRBG & HDR["mVINP_LOCK"])):
+            return waitRow["gotoOnInput"]
+        if 0 != (waitRow["blkFlags"] & HDR["mBLOCKEND"]):
+            break
+    return HDR["mNONE"]
+
+def RBG_processStateTable(gun, tmpVinputRBG):
+    procRow = TABLE[gun["tableRow"]]
+    if gun["prevRow"] != gun["tableRow"]:
+        RBG_startEffectSound(gun, procRow["efctSound"])  # RBG_startRow(); LEDs are not modeled
+        gun["prevRow"] = gun["tableRow"]
+    else:
+        foundInputRow = RBG_waitForInput(gun, tmpVinputRBG)
+        if HDR["mNONE"] != foundInputRow:
+            gun["tableRow"] = foundInputRow
+        elif (HDR["mNONE"] != procRow["SPECIAL"]) and \
+             (0 != (procRow["SPECIAL"] & (HDR["mSPCL_EFCT_CONTINUOUS"] | HDR["mSPCL_EFCT_CONFIGURE"]))) and \
+             (0 == (tmpVinputRBG & HDR["mVINP_SOUNDACTV"])):
+            RBG_startEffectSound(gun, procRow["efctSound"])  # restart a continuous sound
+
+def loop_tick(gun):
+    # the part of loop() inside if ((timerNow-timerPrevState) >= tick)
+    gun["nowVinputRBG"] = getButtonInput(gun)
+    if gun["timerMaxForceSolenoidLow"] > 0:
+        if (HDR["SOLENOID_IF_NONZERO"] or (0 == (HDR["mVINP_TRIG_STATE"] & gun["nowVinputRBG"]))) and \
+           (gun["timerNow"] > gun["timerMinForceSolenoidLow"]):
+            RBG_specialProcStopShoot(gun)
+    RBG_processStateTable(gun, gun["nowVinputRBG"])
+    gun["timerPrevState"] = gun["timerNow"]
+
+
+###################################################################################################
+# simulate(args, durations) - run until args.shots shots are recorded
+#
+# returns (list of shot dicts, dict of missed press counts)
+# raises RuntimeError if --stall_s simulated seconds go by without a shot (the table never gets back to a row
+#    that accepts the trigger, for instance) or nothing is left to simulate
+#
+def simulate(args, durations):
+    rng = random.Random(args.seed)
+    gun = new_gun(args, durations)
+    eepromModel.reset_model(open(args.eeprom, 'rb').read() if args.eeprom else None)
+    eepromModel.power_on()
+    if args.static:
+        eepromModel.dynamicMode = HDR["mNONE"]
+    readyRows = trigger_rows()
+    shots = []
+    missed = {"between ticks": 0, "edge lost": 0}
+    pendingPress = False
+    schedule(gun, next_loop_time_after(gun, args.tick_ms - args.loop_ms), EVT_TICK)
+    lastShotTime = 0.0
+    while len(shots) < args.shots:
+        if not gun["events"]:
+            raise RuntimeError("nothing left to simulate after %d shots, in tableRow %d" % (len(shots), gun["tableRow"]))
+        when, kind, dummy = heapq.heappop(gun["events"])
+        if when - lastShotTime > 1000.0 * args.stall_s:
+            raise RuntimeError("no shot for %g simulated seconds after %d shots, stuck near tableRow %d (see --stall_s)" %
+                               (args.stall_s, len(shots), gun["tableRow"]))
+        gun["timerNow"] = when
+        if EVT_TICK == kind:
+            if gun["timerMaxForceSolenoidLow"] > 0 and gun["timerNow"] > gun["timerMinForceSolenoidLow"] and \
+               gun["timerNow"] > gun["timerMaxForceSolenoidLow"]:
+                RBG_specialProcStopShoot(gun)  # top of loop() runs every iteration, including this one
+            loop_tick(gun)
+            shot = gun["shot"]
+            if (shot is not None) and (not gun["trigDown"]) and (not gun["solenoidHigh"]) and ("solenoidLen" in shot):
+                shots.append(shot)
+                gun["shot"] = None
+                lastShotTime = gun["timerNow"]
+            elif (shot is None) and (not pendingPress) and (gun["tableRow"] in readyRows) and (gun["prevRow"] == gun["tableRow"]):
+                pendingPress = True
+                schedule(gun, gun["timerNow"] + rng.uniform(args.idle_ms[0], args.idle_ms[1]), EVT_TRIG_DOWN)
+            schedule(gun, gun["timerNow"] + args.loop_ms * math.ceil(args.tick_ms / args.loop_ms), EVT_TICK)
+        elif EVT_SOLENOID_MAX == kind:
+            if gun["timerMaxForceSolenoidLow"] > 0 and gun["timerNow"] > gun["timerMinForceSolenoidLow"] and \
+               gun["timerNow"] > gun["timerMaxForceSolenoidLow"]:
+                RBG_specialProcStopShoot(gun)
+        elif EVT_TRIG_DOWN == kind:
+            pendingPress = False
+            gun["trigDown"] = True
+            gun["shot"] = {"trigDown": when, "config": eepromModel.dynamicMode, "edgeSeen": False}
+            schedule(gun, when + rng.uniform(args.hold_ms[0], args.hold_ms[1]), EVT_TRIG_UP)
+        elif EVT_TRIG_UP == kind:
+            gun["trigDown"] = False
+            shot = gun["shot"]
+            if (shot is not None) and not shot.get("accepted", False):
+                if shot["edgeSeen"]:
+                    missed["edge lost"] += 1  # edge came on a row-start tick; only one edge per press
+                else:
+                    missed["between ticks"] += 1  # released before any tick saw it
+                gun["shot"] = None
+    return shots, missed
+# end simulate()
+
+
+###################################################################################################
+# report(shots, missed) - latency distributions per configuration
+#
+def pct(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, (percent * len(values)) // 100)]
+
+def report(shots, missed, args):
+    print("tick %g ms, loop %g ms, audio start %g ms, force SOUNDACTV %g ms, DLYSOLENOID_MIN %d MAX %d, SOLENOID_IF_NONZERO %d" %
+          (args.tick_ms, args.loop_ms, args.audio_start_ms, args.force_soundactv_ms, args.dly_min, args.dly_max, HDR["SOLENOID_IF_NONZERO"]))
+    print("%d shots, presses missed: %d released between ticks, %d edge lost on a row-start tick" %
+          (len(shots), missed["between ticks"], missed["edge lost"]))
+    header = "%-8s %-14s %6s" % ("config", "measure (ms)", "shots") + "".join(" %8s" % ("p%d" % p) for p in PERCENTILES)
+    for config in sorted(set(shot["config"] for shot in shots)):
+        these = [shot for shot in shots if shot["config"] == config]
+        name = "static" if HDR["mNONE"] == config else str(config)
+        sounds = sorted(set("%s/%s" % (shot.get("windupSound", "-"), shot.get("shootSound", "-")) for shot in these))
+        print("")
+        print("configuration %s   windup/shoot sounds %s" % (name, " ".join(sounds)))
+        print(header)
+        for key, label in (("windup", "windup sound"), ("solenoidOn", "solenoid on"), ("shoot", "shoot sound"), ("solenoidLen", "solenoid len")):
+            values = [shot[key] for shot in these if key in shot]
+            if 0 != len(values):
+                print("%-8s %-14s %6d" % (name, label, len(values)) + "".join(" %8.0f" % pct(values, p) for p in PERCENTILES))
+# end report()
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(prog='timingSim',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="discrete-event simulation of RBG_SciFi trigger-to-solenoid and trigger-to-sound latency\n" +
+                    "   uses the state table and timing #defines from the *.h files and the WAV lengths of the sounds",
+        epilog="""Example:
+python timingSim.py --sounds ../sounds --shots 400
+python timingSim.py --sounds /media/sdcard --tick_ms 20 --static
+""",
+        usage='%(prog)s [--sounds DIR] [--shots N] [--tick_ms MS] [options]')
+    my_parser.add_argument('--sounds', type=str, default=None, help='directory with ###.wav (SD card) or ####_*.wav (source) sounds')
+    my_parser.add_argument('--default_sound_ms', type=float, default=2000.0, help='length of sounds not found in --sounds (default 2000)')
+    my_parser.add_argument('--shots', type=int, default=400, help='number of shots to simulate (default 400)')
+    my_parser.add_argument('--seed', type=int, default=47, help='random seed (default 47)')
+    my_parser.add_argument('--tick_ms', type=float, default=40.0, help='state machine period, the 40 in loop() (default 40)')
+    my_parser.add_argument('--loop_ms', type=float, default=1.0, help='time for one pass through loop() (default 1)')
+    my_parser.add_argument('--audio_start_ms', type=float, default=30.0, help='play() until the YX5200 is audible and busy (default 30)')
+    my_parser.add_argument('--force_soundactv_ms', type=float, default=None, help='timerForceSoundActv after play() (default mDELAY_SOUNDACTV)')
+    my_parser.add_argument('--dly_min', type=int, default=None, help='DLYSOLENOID_MIN (default from .h)')
+    my_parser.add_argument('--dly_max', type=int, default=None, help='DLYSOLENOID_MAX (default from .h)')
+    my_parser.add_argument('--idle_ms', type=float, nargs=2, default=[300.0, 3000.0], metavar=('MIN', 'MAX'), help='wait before pressing trigger (default 300 3000)')
+    my_parser.add_argument('--hold_ms', type=float, nargs=2, default=[30.0, 2500.0], metavar=('MIN', 'MAX'), help='how long trigger is held (default 30 2500)')
+    my_parser.add_argument('--eeprom', type=str, default=None, help='raw 1024 byte EEPROM dump to start from (default factory settings)')
+    my_parser.add_argument('--static', action='store_true', help='static mode: do not move to the next configuration after each shot')
+    my_parser.add_argument('--stall_s', type=float, default=600.0, help='give up after this many simulated seconds without a shot (default 600)')
+    args = my_parser.parse_args()
+
+    load_header_values()
+    if args.force_soundactv_ms is None:
+        args.force_soundactv_ms = HDR["mDELAY_SOUNDACTV"]
+    if args.dly_min is None:
+        args.dly_min = HDR["DLYSOLENOID_MIN"]
+    if args.dly_max is None:
+        args.dly_max = HDR["DLYSOLENOID_MAX"]
+    durations = soundFiles.sound_durations_ms(args.sounds)
+    try:
+        shots, missed = simulate(args, durations)
+    except RuntimeError as err:
+        sys.stderr.write("timingSim: %s\n" % err)
+        sys.exit(1)
+    report(shots, missed, args)
@@ -46,6 +46,14 @@ import sys
 import os
 import argparse
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "RBG_arduino"))
+try:
+    import rbgProfile # optional timing; see RBG_arduino/rbgProfile.py
+except ImportError:
+    class rbgProfile: # this script was copied on its own; no timing
+        setup = lap = staticmethod(lambda *args, **kwargs: None)
+        stop = staticmethod(lambda: None)
+
 
 ###################################################################################
 # little_endian_to_big_int - convert little-endian bytes to big-endian integer
@@ -90,14 +98,17 @@ def do_WAV_hdr_YX5200(wavFname):
     goodSampleRates = [22050, 44100, 48000] # work with YX5200
 
     
+    rbgProfile.lap("read header")
     try:
         fobj = open(wavFname, 'rb')
         header = fobj.read(36)
         fobj.close()
     except:
         sys.stderr.write("ERROR - could not open/read %s\n" % os.path.realpath(wavFname))
+        rbgProfile.stop()
         return
 
+    rbgProfile.lap("check")
     noGood = False
     for i in range(len(wav_fmt)):
         fmt = wav_fmt[i]
@@ -117,6 +128,7 @@ def do_WAV_hdr_YX5200(wavFname):
     if wav_values["SampleRate"] not in goodSampleRates:
         noGood = True
         print("ERROR in %s: expecting WAV header SampleRate to be one of %s not %s" % (wavFname, goodSampleRates,wav_values["SampleRate"]))
+    rbgProfile.lap("emit")
     if noGood:
         print("\nERROR in %s: WAV file not usable with YX5200 Audio Module\n" % wavFname)
     else:
@@ -124,6 +136,7 @@ def do_WAV_hdr_YX5200(wavFname):
     for i in range(len(wav_fmt)):
         fmt = wav_fmt[i]
         print("%s: %s" % (fmt[5], wav_values[fmt[5]]))
+    rbgProfile.stop()
 
 ###################################################################################
 # "__main__" processing for WAV_hdr_YX5200
@@ -132,6 +145,7 @@ def do_WAV_hdr_YX5200(wavFname):
 # python WAV_hdr_YX5200.py -h to see what the arguments are
 #
 if __name__ == "__main__":
+    rbgProfile.setup("WAV_hdr_YX5200")
     my_parser = argparse.ArgumentParser(prog='WAV_hdr_YX5200',
         formatter_class=argparse.RawTextHelpFormatter,
         description="read and check WAV/RIFF header for use on YX5200",